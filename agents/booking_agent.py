@@ -1,25 +1,84 @@
+from contextlib import contextmanager
+
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 
 from agents.utils import nodes
+from agents.utils.preparser import PreParser
 from agents.utils.state import BookingState, Intent
 from ai.langauge_model import LanguageModel
+from observability import metrics, tracing
 from services.booking_service import BookingService
+from services.prefetch import AvailabilityPrefetcher, EarlyReads
+
+
+@contextmanager
+def _measure(name: str):
+    with metrics.NODE_SECONDS.time(node=name), tracing.span(f"node.{name}"):
+        try:
+            yield
+        except Exception:
+            metrics.NODE_ERRORS.inc(node=name)
+            raise
+
+
+def _node(name: str, func, afunc=None, **kwargs) -> RunnableLambda:
+    # Sync implementation runs under graph.invoke, async one under graph.ainvoke
+    def run(state: BookingState) -> BookingState:
+        with _measure(name):
+            return func(state, **kwargs)
+
+    async def arun(state: BookingState) -> BookingState:
+        with _measure(name):
+            if afunc is None:
+                return func(state, **kwargs)
+            return await afunc(state, **kwargs)
+
+    return RunnableLambda(run, afunc=arun, name=name)
 
 
 class BookingAgent:
-    def __init__(self, booking_service: BookingService, llm: LanguageModel):
+    def __init__(
+            self,
+            booking_service: BookingService,
+            llm: LanguageModel,
+            preparser: PreParser | None = None,
+            prefetcher: AvailabilityPrefetcher | None = None,
+            early_reads: EarlyReads | None = None,
+        ):
+        self.booking_service = booking_service
+        self.llm = llm
+        self.prefetcher = prefetcher if prefetcher is not None else AvailabilityPrefetcher(booking_service)
+        self.early_reads = early_reads if early_reads is not None else EarlyReads()
+        # Deterministic rules answer trivial messages without an LLM round trip
+        self.preparser = preparser if preparser is not None else PreParser()
         graph_builder = StateGraph(BookingState)
 
         # Nodes
-        graph_builder.add_node("parse_intent", lambda s: nodes.parse_intent(s, llm))
-        graph_builder.add_node("ask_again", nodes.ask_again)
-        graph_builder.add_node("missing_field", nodes.ask_for_missing_field)
-
-        graph_builder.add_node("make_booking", lambda s: nodes.make_booking(s, booking_service))
-        graph_builder.add_node("check_availability", lambda s: nodes.check_availability(s, booking_service))
-        graph_builder.add_node("get_booking_details", lambda s: nodes.get_booking_details(s, booking_service))
-        graph_builder.add_node("update_booking", lambda s: nodes.update_booking(s, booking_service))
-        graph_builder.add_node("cancel_booking", lambda s: nodes.cancel_booking(s, booking_service))
+        graph_builder.add_node("parse_intent", _node(
+            "parse_intent", nodes.parse_intent, nodes.aparse_intent,
+            llm=llm, preparser=self.preparser, booking_service=booking_service, early_reads=self.early_reads,
+        ))
+        graph_builder.add_node("ask_again", _node("ask_again", nodes.ask_again))
+        graph_builder.add_node("missing_field", _node(
+            "missing_field", nodes.ask_for_missing_field, nodes.aask_for_missing_field, prefetcher=self.prefetcher
+        ))
+
+        graph_builder.add_node("make_booking", _node(
+            "make_booking", nodes.make_booking, nodes.amake_booking,
+            booking_service=booking_service, prefetcher=self.prefetcher,
+        ))
+        graph_builder.add_node("check_availability", _node(
+            "check_availability", nodes.check_availability, nodes.acheck_availability,
+            booking_service=booking_service, early_reads=self.early_reads,
+        ))
+        graph_builder.add_node("get_booking_details", _node(
+            "get_booking_details", nodes.get_booking_details, nodes.aget_booking_details,
+            booking_service=booking_service, early_reads=self.early_reads,
+        ))
+        graph_builder.add_node("update_booking", _node("update_booking", nodes.update_booking, nodes.aupdate_booking, booking_service=booking_service))
+        graph_builder.add_node("find_nearest_slot", _node("find_nearest_slot", nodes.find_nearest_slot, nodes.afind_nearest_slot, booking_service=booking_service))
+        graph_builder.add_node("cancel_booking", _node("cancel_booking", nodes.cancel_booking, nodes.acancel_booking, booking_service=booking_service))
 
         # Edges
         graph_builder.add_edge(START, "parse_intent")
@@ -44,6 +103,8 @@ class BookingAgent:
                 return "update_booking"
             case Intent.CANCEL_BOOKING:
                 return "cancel_booking"
+            case Intent.FIND_NEAREST_SLOT:
+                return "find_nearest_slot"
             case _:
                 return "ask_again"
 
@@ -0,0 +1,98 @@
+import json
+
+
+class JsonFieldStream:
+    # Reads the top-level fields of a JSON object as its text arrives, each once its value is complete
+    def __init__(self):
+        self.fields: dict = {}
+        # Fields whose values could not be decoded, which are left out rather than failing the whole object
+        self.invalid: list[str] = []
+        self.complete = False
+        self._state = "start"
+        self._key = []
+        self._value = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+
+    def feed(self, text: str) -> dict:
+        # Returns the fields completed by this chunk
+        completed = {}
+        for char in text:
+            if self._state == "value":
+                self._value_char(char, completed)
+            elif self._state == "key":
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._state = "colon"
+                    continue
+                self._key.append(char)
+            elif self._state == "start":
+                # Anything before the object, such as a markdown fence, is skipped
+                if char == "{":
+                    self._state = "object"
+            elif self._state == "object":
+                if char == '"':
+                    self._state = "key"
+                    self._key = []
+                elif char == "}":
+                    self._close()
+            elif self._state == "colon":
+                if char == ":":
+                    self._state = "value"
+                    self._value = []
+        return completed
+
+
+    def close(self) -> dict:
+        # A completion cut short still yields the fields it finished, and a last value missing only its brace
+        if self._state == "value" and self._depth == 0 and not self._in_string:
+            self._complete_value({})
+        self._state = "done"
+        return self.fields
+
+
+    # Helper Functions
+    def _value_char(self, char: str, completed: dict):
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+        elif char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]" and self._depth > 0:
+            self._depth -= 1
+        elif self._depth == 0 and char in ",}":
+            self._complete_value(completed)
+            if char == "}":
+                self._close()
+            else:
+                self._state = "object"
+            return
+        self._value.append(char)
+
+
+    def _complete_value(self, completed: dict):
+        key = "".join(self._key)
+        try:
+            key = json.loads(f'"{key}"')
+            value = json.loads("".join(self._value))
+        except ValueError:
+            self.invalid.append(key)
+        else:
+            self.fields[key] = completed[key] = value
+        self._state = "object"
+
+
+    def _close(self):
+        self._state = "done"
+        self.complete = True
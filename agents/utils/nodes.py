@@ -1,27 +1,51 @@
-from datetime import date, time
-import json
+from datetime import date, time, timedelta
+import logging
+import time as timer
+from typing import Any, Awaitable, Hashable
 
+from langgraph.config import get_config, get_stream_writer
+from pydantic import ValidationError
+
+from agents.utils.json_stream import JsonFieldStream
+from agents.utils.preparser import PreParser
 from agents.utils.state import BookingState, Intent
+from ai.cascade_llm import drafts
 from ai.langauge_model import LanguageModel
 from client.model.customer import Customer
+from client.resilience import CircuitOpenError, is_upstream_failure
 from client.model.cancallation_reason import CancellationReason
 from services.booking_service import BookingService
+from services.prefetch import AvailabilityPrefetcher, EarlyReads
 from services import exceptions
+from observability import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# The booking API's circuit is open, or it kept failing after the client's retries ran out
+UNAVAILABLE_RESPONSE = "Sorry, our booking system is not responding right now. Please try again shortly."
+AVAILABILITY_FAILED_RESPONSE = "Sorry, I could not check availability just now. Please try again."
+
 
+def _progress(message: str):
+    # Surfaces as a "custom" event to graph.astream callers; a no-op under invoke
+    get_stream_writer()({"progress": message})
 
-def _extract_json_braces(text: str) -> str:
-    start = text.find('{')
-    end = text.rfind('}')
-    if start == -1 or end == -1:
-        raise ValueError("No JSON object found in the text")
-    return text[start:end+1]
 
+def _session_id() -> str | None:
+    # The web routes pass the session through the graph config; the command line loop has none
+    return get_config().get("configurable", {}).get("session_id")
 
-def parse_intent(state: BookingState, llm: LanguageModel) -> BookingState:
-    prompt = f"""
+
+def _parse_intent_prompt(state: BookingState) -> str:
+    return f"""
         You are a booking assistant. Today is {date.today().strftime("%A %d %B %Y")}.
         For additional context, your previous response was: {state.response}.
-        Detect the intent and extract fields from this user message:
+        Detect the intent and extract fields from this user message.
+        If the user asks about a range of dates, such as this weekend or this week,
+        visit_date is the first day and visit_date_end is the last day of the range.
+        If the user asks for the closest or earliest table, the intent is FIND_NEAREST_SLOT
+        and visit_time is the time they would like to be closest to:
         
         {state.message}
 
@@ -32,6 +56,7 @@ def parse_intent(state: BookingState, llm: LanguageModel) -> BookingState:
         {{
             "intent": <intent> | null,
             "visit_date": "YYYY-MM-DD" | null,
+            "visit_date_end": "YYYY-MM-DD" | null,
             "visit_time": "HH:MM:SS" | null,
             "party_size": int | null,
             "special_requests": str | null,
@@ -45,28 +70,293 @@ def parse_intent(state: BookingState, llm: LanguageModel) -> BookingState:
             "booking_reference": str | null,
         }}
     """
-    response = llm.chat(prompt)
-    extracted_json = _extract_json_braces(response)
-    print(extracted_json)
+
+
+# JSON shapes of the fields a follow-up question can ask for
+SLOT_SCHEMAS = {
+    "visit_date": '"YYYY-MM-DD" | null',
+    "visit_date_end": '"YYYY-MM-DD" | null',
+    "visit_time": '"HH:MM:SS" | null',
+    "party_size": "int | null",
+    "booking_reference": "str | null",
+}
+
+
+def _slot_fields(state: BookingState, pending_field: str | None) -> list[str]:
+    if state.intent is None or pending_field not in SLOT_SCHEMAS:
+        return []
+    # Replies often answer the next question too, e.g. "4 of us at 7pm"
+    fields = [pending_field] + [
+        field for field in required_fields_map.get(state.intent, [])
+        if field != pending_field and getattr(state, field) is None
+    ]
+    if "visit_date" in fields:
+        fields.insert(fields.index("visit_date") + 1, "visit_date_end")
+    return fields
+
+
+def _slot_prompt(state: BookingState, fields: list[str]) -> str:
+    schema = ",\n            ".join(f'"{field}": {SLOT_SCHEMAS[field]}' for field in fields)
+    return f"""
+        You are a booking assistant. Today is {date.today().strftime("%A %d %B %Y")}.
+        You asked: {state.response}
+        Extract the answer from this reply:
+
+        {state.message}
+
+        If the reply asks for something else instead of answering, respond with {{}}.
+        Respond in raw JSON for it to be parsed by Python json.loads:
+        {{
+            {schema}
+        }}
+    """
+
+
+def _recovered(stream: JsonFieldStream) -> dict:
+    # Keeps the fields that decoded, rather than losing the turn to one bad value or a cut-off completion
+    parsed = stream.close()
+    if stream.invalid or not stream.complete:
+        logger.debug("Recovered %s from partial JSON; undecodable: %s", list(parsed), stream.invalid)
+    return parsed
+
+
+def _parse_object(response: str) -> dict:
+    stream = JsonFieldStream()
+    stream.feed(response)
+    return _recovered(stream)
+
+
+def _apply_slot_response(state: BookingState, response: str, fields: list[str]) -> bool:
+    parsed = _parse_object(response)
+    parsed = {field: value for field, value in parsed.items() if field in fields and value is not None}
+    if not parsed:
+        # Nothing answered the question, so the user has changed topic and needs the full prompt
+        return False
+    logger.debug("Parsed slot JSON: %s", parsed)
+    _apply_parsed(state, parsed)
+    return True
+
+
+def _apply_parsed_response(state: BookingState, response: str) -> BookingState:
+    parsed = _parse_object(response)
+    logger.debug("Parsed intent JSON: %s", parsed)
+    return _apply_parsed(state, parsed)
+
+
+# What the prompts ask the model to extract, as opposed to conversation bookkeeping
+EXTRACTED_FIELDS = frozenset(BookingState.model_fields) - {"restaurant_name", "pending_field", "message", "response"}
+
+
+def extraction_problem(response: str) -> str | None:
+    # Why a completion of the parse prompts cannot be used, so a model cascade knows to escalate. It is read
+    # as leniently as the nodes read it, so slips they recover from, such as a trailing comma, do not escalate
+    stream = JsonFieldStream()
+    stream.feed(response)
+    parsed = stream.close()
+    if not stream.complete or stream.invalid:
+        return "invalid_json"
+    # Slot prompts leave intent out; only the full prompt asks for it
+    if "intent" in parsed and parsed["intent"] is None:
+        return "no_intent"
     try:
-        parsed = json.loads(extracted_json)
-    except json.JSONDecodeError:
-        parsed = {}
+        BookingState.model_validate({
+            field: value for field, value in parsed.items() if field in EXTRACTED_FIELDS and value is not None
+        })
+    except ValidationError:
+        return "invalid_fields"
+    return None
+
+
+def _apply_parsed(state: BookingState, parsed: dict) -> BookingState:
     for field, value in parsed.items():
         if value is not None and getattr(state, field, None) is None:
-            if field == "visit_date":
-                value = date.fromisoformat(value)
-            elif field == "visit_time":
-                value = time.fromisoformat(value)
-            elif field == "customer":
-                value = Customer(**value)
+            try:
+                if field in ("visit_date", "visit_date_end"):
+                    value = date.fromisoformat(value)
+                elif field == "visit_time":
+                    value = time.fromisoformat(value)
+                elif field == "customer":
+                    value = Customer(**value)
+            except (TypeError, ValueError):
+                # One malformed value is asked for again, instead of failing the turn
+                logger.debug("Ignoring malformed %s: %r", field, value)
+                continue
             setattr(state, field, value)
 
     return state
 
 
+def _count_intent(state: BookingState) -> BookingState:
+    # Parsed values are not validated until the graph rebuilds the state, so bound the label set here
+    try:
+        intent = Intent(state.intent).name if state.intent else "NONE"
+    except ValueError:
+        intent = "UNKNOWN"
+    metrics.INTENTS.inc(intent=intent)
+    return state
+
+
+def _preparse(state: BookingState, preparser: PreParser | None, pending_field: str | None) -> dict | None:
+    if preparser is None or state.message is None:
+        return None
+    return preparser.parse(state.message, state.intent, pending_field or next_missing_field(state))
+
+
+def _record_llm_call(preparser: PreParser | None, start: float):
+    if preparser is not None:
+        preparser.record_llm_call(timer.perf_counter() - start)
+
+
+# Fields that decide the arguments of the booking API read a parsed intent routes to
+EARLY_READ_FIELDS = {
+    Intent.GET_BOOKING_DETAILS: ("booking_reference",),
+    Intent.CHECK_AVAILABILITY: ("visit_date", "visit_date_end", "party_size"),
+}
+
+
+def _read_key(state: BookingState) -> Hashable:
+    if state.intent == Intent.GET_BOOKING_DETAILS:
+        return state.intent, state.restaurant_name, state.booking_reference
+    return state.intent, state.restaurant_name, state.visit_date, state.visit_date_end if _is_range(state) else None, state.party_size
+
+
+def _read(state: BookingState, booking_service: BookingService) -> Awaitable[Any]:
+    if state.intent == Intent.GET_BOOKING_DETAILS:
+        return booking_service.aget_booking_details(state.booking_reference, restaurant_name=state.restaurant_name)
+    if _is_range(state):
+        return booking_service.acheck_availability_range(
+            state.visit_date, state.visit_date_end, state.party_size, restaurant_name=state.restaurant_name
+        )
+    return booking_service.acheck_availability(state.visit_date, state.party_size, restaurant_name=state.restaurant_name)
+
+
+async def _aread(state: BookingState, booking_service: BookingService, early_reads: EarlyReads | None) -> Any:
+    # Joins the read parse_intent started while the completion was still streaming, if it is the one needed
+    task = None if early_reads is None else early_reads.take(_session_id(), _read_key(state))
+    if task is not None:
+        return await task
+    return await _read(state, booking_service)
+
+
+def _start_early_read(
+        state: BookingState,
+        fields: dict,
+        booking_service: BookingService,
+        early_reads: EarlyReads,
+        started: Hashable | None,
+    ) -> Hashable | None:
+    # Only reads are started early, and only once every field deciding the route and its arguments is known.
+    # Returns the key of the read the fields decide, or of the one already started if they decide none
+    candidate = _apply_parsed(state.model_copy(), fields)
+    try:
+        candidate.intent = Intent(candidate.intent)
+    except ValueError:
+        return started
+    decisive = EARLY_READ_FIELDS.get(candidate.intent)
+    if decisive is None or any(getattr(state, field) is None and field not in fields for field in decisive):
+        return started
+    if is_field_missing(candidate):
+        return started
+    key = _read_key(candidate)
+    if key != started:
+        early_reads.start(_session_id(), key, lambda: _read(candidate, booking_service))
+    return key
+
+
+async def _astream_parsed(
+        state: BookingState,
+        llm: LanguageModel,
+        booking_service: BookingService | None,
+        early_reads: EarlyReads | None,
+    ) -> dict:
+    stream = JsonFieldStream()
+    draft = JsonFieldStream()
+    started = None
+
+    def start(fields: dict):
+        nonlocal started
+        if booking_service is not None and early_reads is not None:
+            started = _start_early_read(state, fields, booking_service, early_reads, started)
+
+    def on_draft(chunk: str):
+        # A cascade holds its small model's answer back until it has judged it whole, but shows it here as it
+        # streams. Starting a read on a draft that is then escalated is harmless: the node only takes the read
+        # matching the answer it settles on, and an answer that agrees with the draft reuses it
+        if draft.feed(chunk):
+            start(draft.fields)
+
+    with drafts(on_draft):
+        async for chunk in llm.astream(_parse_intent_prompt(state)):
+            if stream.feed(chunk):
+                start(stream.fields)
+    parsed = _recovered(stream)
+    logger.debug("Parsed intent JSON: %s", parsed)
+    return parsed
+
+
+def parse_intent(
+        state: BookingState,
+        llm: LanguageModel,
+        preparser: PreParser | None = None,
+        booking_service: BookingService | None = None,
+        early_reads: EarlyReads | None = None,
+    ) -> BookingState:
+    # Reads are only started early under graph.ainvoke, which has an event loop to run them on
+    _progress("Reading your message…")
+    pending_field, state.pending_field = state.pending_field, None
+    parsed = _preparse(state, preparser, pending_field)
+    if parsed is not None:
+        metrics.PARSE_PATHS.inc(path="rules")
+        return _count_intent(_apply_parsed(state, parsed))
+
+    fields = _slot_fields(state, pending_field)
+    if fields:
+        start = timer.perf_counter()
+        response = llm.chat(_slot_prompt(state, fields))
+        _record_llm_call(preparser, start)
+        if _apply_slot_response(state, response, fields):
+            metrics.PARSE_PATHS.inc(path="slot")
+            return _count_intent(state)
+
+    start = timer.perf_counter()
+    response = llm.chat(_parse_intent_prompt(state))
+    _record_llm_call(preparser, start)
+    metrics.PARSE_PATHS.inc(path="llm")
+    return _count_intent(_apply_parsed_response(state, response))
+
+
+async def aparse_intent(
+        state: BookingState,
+        llm: LanguageModel,
+        preparser: PreParser | None = None,
+        booking_service: BookingService | None = None,
+        early_reads: EarlyReads | None = None,
+    ) -> BookingState:
+    _progress("Reading your message…")
+    pending_field, state.pending_field = state.pending_field, None
+    parsed = _preparse(state, preparser, pending_field)
+    if parsed is not None:
+        metrics.PARSE_PATHS.inc(path="rules")
+        return _count_intent(_apply_parsed(state, parsed))
+
+    fields = _slot_fields(state, pending_field)
+    if fields:
+        start = timer.perf_counter()
+        response = await llm.achat(_slot_prompt(state, fields))
+        _record_llm_call(preparser, start)
+        if _apply_slot_response(state, response, fields):
+            metrics.PARSE_PATHS.inc(path="slot")
+            return _count_intent(state)
+
+    # Streamed, so the read the turn routes to can start before the last token
+    start = timer.perf_counter()
+    parsed = await _astream_parsed(state, llm, booking_service, early_reads)
+    _record_llm_call(preparser, start)
+    metrics.PARSE_PATHS.inc(path="llm")
+    return _count_intent(_apply_parsed(state, parsed))
+
+
 def ask_again(state: BookingState) -> BookingState:
-    print("ASK AGAIN")
     state.response = "How can I help?"
     return state
 
@@ -77,9 +367,17 @@ required_fields_map = {
         Intent.GET_BOOKING_DETAILS: ["booking_reference"],
         Intent.MAKE_BOOKING: ["visit_date", "visit_time", "party_size"],
         Intent.UPDATE_BOOKING: ["booking_reference"],
+        Intent.FIND_NEAREST_SLOT: ["party_size"],
     }
 
 
+def next_missing_field(state: BookingState) -> str | None:
+    for field in required_fields_map.get(state.intent, []):
+        if getattr(state, field) is None:
+            return field
+    return None
+
+
 def is_field_missing(state: BookingState):
     required_fields = required_fields_map.get(state.intent, [])
     for field in required_fields:
@@ -97,12 +395,48 @@ def is_field_missing(state: BookingState):
     return False
 
 
-def ask_for_missing_field(state: BookingState) -> BookingState:
-    print("ASK FOR MISSING FIELD")
+def _awaits_visit_time(state: BookingState) -> bool:
+    return state.intent == Intent.MAKE_BOOKING and state.pending_field == "visit_time"
+
+
+def _visit_time_question(state: BookingState, availability: dict | None) -> str:
+    times = _available_times(availability) if availability is not None else None
+    if not times:
+        return state.response
+    return f"Please provide visit time. Available times on {state.visit_date} are: {", ".join(times)}."
+
+
+def ask_for_missing_field(state: BookingState, prefetcher: AvailabilityPrefetcher | None = None) -> BookingState:
+    state = _ask_for_missing_field(state)
+    if prefetcher is not None and _awaits_visit_time(state):
+        # Prefetching needs the event loop, so under graph.invoke only an earlier search can help
+        availability = prefetcher.cached(state.visit_date, state.party_size, state.restaurant_name)
+        state.response = _visit_time_question(state, availability)
+    return state
+
+
+async def aask_for_missing_field(
+        state: BookingState,
+        prefetcher: AvailabilityPrefetcher | None = None,
+    ) -> BookingState:
+    state = _ask_for_missing_field(state)
+    if prefetcher is not None and _awaits_visit_time(state):
+        # The search keeps running after a short wait, so the booking turn finds its answer cached
+        session_id = _session_id()
+        prefetcher.prefetch(session_id, state.visit_date, state.party_size, state.restaurant_name)
+        availability = await prefetcher.availability(
+            session_id, state.visit_date, state.party_size, state.restaurant_name
+        )
+        state.response = _visit_time_question(state, availability)
+    return state
+
+
+def _ask_for_missing_field(state: BookingState) -> BookingState:
     required_fields = required_fields_map.get(state.intent, [])
 
     if state.intent == Intent.UPDATE_BOOKING:
         if not state.booking_reference:
+            state.pending_field = "booking_reference"
             state.response = "What is your booking reference?"
             return state
         if not any([
@@ -119,6 +453,7 @@ def ask_for_missing_field(state: BookingState) -> BookingState:
     
     for field in required_fields:
         if getattr(state, field) is None:
+            state.pending_field = field
             state.response = f"Please provide {field.replace("_", " ")}."
             return state
 
@@ -126,65 +461,344 @@ def ask_for_missing_field(state: BookingState) -> BookingState:
     return state
 
 
-def check_availability(state: BookingState, booking_service: BookingService) -> BookingState:
-    print("CHECK AVAILABILITY")
+def _available_times(response: dict) -> list[str]:
+    return [item.get("time") for item in response.get("available_slots", []) if item.get("available")]
+
+
+def _availability_response(state: BookingState, response: dict) -> str:
+    times = _available_times(response)
+    return f"The restaurant has availability on {state.visit_date} at the times: {", ".join(times)}"
+
+
+def _is_range(state: BookingState) -> bool:
+    return state.visit_date_end is not None and state.visit_date_end > state.visit_date
+
+
+def _availability_range_response(state: BookingState, response: dict) -> str:
+    times_by_date = {}
+    for item in response.get("available_slots", []):
+        if item.get("available"):
+            times_by_date.setdefault(item.get("visit_date"), []).append(item.get("time"))
+    if not times_by_date:
+        return f"The restaurant has no availability between {state.visit_date} and {state.visit_date_end}."
+    days = [f"on {visit_date} at {", ".join(times)}" for visit_date, times in times_by_date.items()]
+    return f"The restaurant has availability {"; ".join(days)}."
+
+
+def check_availability(
+        state: BookingState,
+        booking_service: BookingService,
+        early_reads: EarlyReads | None = None,
+    ) -> BookingState:
+    _progress("Checking availability…")
     try:
-        response = booking_service.check_availability(state.visit_date, state.party_size)
-        times = [item.get("time") for item in response.get("available_slots", []) if item.get("available")]
-        state.response = f"The restaurant has availability on {state.visit_date} at the times: {", ".join(times)}"
-    except:
+        if _is_range(state):
+            response = booking_service.check_availability_range(
+                state.visit_date,
+                state.visit_date_end,
+                state.party_size,
+                restaurant_name=state.restaurant_name,
+            )
+            state.response = _availability_range_response(state, response)
+        else:
+            response = booking_service.check_availability(
+                state.visit_date, state.party_size, restaurant_name=state.restaurant_name
+            )
+            state.response = _availability_response(state, response)
+    except Exception as e:
+        # Not a bare except, which in the async node would swallow the turn's cancellation
+        logger.warning("Availability search failed: %r", e)
         response = None
-        state.response = str(response)
-    print(response)
+        state.response = UNAVAILABLE_RESPONSE if _is_unavailable(e) else AVAILABILITY_FAILED_RESPONSE
+    logger.debug("Booking API response: %s", response)
     return state
 
 
-def make_booking(state: BookingState, booking_service: BookingService) -> BookingState:
-    print("MAKE BOOKING")
-    response = booking_service.make_booking(
-        visit_date=state.visit_date,
-        visit_time=state.visit_time,
-        party_size=state.party_size,
+async def acheck_availability(
+        state: BookingState,
+        booking_service: BookingService,
+        early_reads: EarlyReads | None = None,
+    ) -> BookingState:
+    _progress("Checking availability…")
+    try:
+        response = await _aread(state, booking_service, early_reads)
+        if _is_range(state):
+            state.response = _availability_range_response(state, response)
+        else:
+            state.response = _availability_response(state, response)
+    except Exception as e:
+        # Not a bare except, which in the async node would swallow the turn's cancellation
+        logger.warning("Availability search failed: %r", e)
+        response = None
+        state.response = UNAVAILABLE_RESPONSE if _is_unavailable(e) else AVAILABILITY_FAILED_RESPONSE
+    logger.debug("Booking API response: %s", response)
+    return state
+
+
+# How far ahead "earliest table" looks when no dates are given
+SLOT_SEARCH_DAYS = 7
+
+
+def _slot_search_dates(state: BookingState) -> tuple[date, date]:
+    if state.visit_date is None:
+        return date.today(), date.today() + timedelta(days=SLOT_SEARCH_DAYS - 1)
+    if _is_range(state):
+        return state.visit_date, state.visit_date_end
+    return state.visit_date, state.visit_date
+
+
+def _wants_nearest_times(state: BookingState) -> bool:
+    # "closest time to 8pm on Friday"; otherwise "earliest table this week", near a time if one is given
+    return state.visit_date is not None and state.visit_time is not None and not _is_range(state)
+
+
+def _nearest_times_response(state: BookingState, times: list[time]) -> str:
+    if not times:
+        return f"Sorry, there are no tables for {state.party_size} on {state.visit_date}."
+    return (
+        f"The closest times to {state.visit_time} on {state.visit_date} for {state.party_size} are: "
+        f"{", ".join(str(slot_time) for slot_time in times)}."
     )
-    print(response)
+
+
+def _earliest_slot_response(state: BookingState, start: date, end: date, found: tuple[date, time] | None) -> str:
+    if found is None:
+        return f"Sorry, there are no tables for {state.party_size} between {start} and {end}."
+    return f"The earliest table for {state.party_size} is on {found[0]} at {found[1]}."
+
+
+def find_nearest_slot(state: BookingState, booking_service: BookingService) -> BookingState:
+    _progress("Finding the nearest table…")
+    try:
+        if _wants_nearest_times(state):
+            times = booking_service.nearest_slots(
+                state.visit_date, state.party_size, state.visit_time, restaurant_name=state.restaurant_name
+            )
+            state.response = _nearest_times_response(state, times)
+        else:
+            start, end = _slot_search_dates(state)
+            found = booking_service.earliest_slot(
+                start, end, state.party_size, state.visit_time, restaurant_name=state.restaurant_name
+            )
+            state.response = _earliest_slot_response(state, start, end, found)
+    except Exception as e:
+        logger.warning("Slot search failed: %r", e)
+        if _is_unavailable(e):
+            state.response = UNAVAILABLE_RESPONSE
+        else:
+            state.response = "Sorry, I could not search for tables just now. Please try again."
+    return state
+
+
+async def afind_nearest_slot(state: BookingState, booking_service: BookingService) -> BookingState:
+    _progress("Finding the nearest table…")
+    try:
+        if _wants_nearest_times(state):
+            times = await booking_service.anearest_slots(
+                state.visit_date, state.party_size, state.visit_time, restaurant_name=state.restaurant_name
+            )
+            state.response = _nearest_times_response(state, times)
+        else:
+            start, end = _slot_search_dates(state)
+            found = await booking_service.aearliest_slot(
+                start, end, state.party_size, state.visit_time, restaurant_name=state.restaurant_name
+            )
+            state.response = _earliest_slot_response(state, start, end, found)
+    except Exception as e:
+        logger.warning("Slot search failed: %r", e)
+        if _is_unavailable(e):
+            state.response = UNAVAILABLE_RESPONSE
+        else:
+            state.response = "Sorry, I could not search for tables just now. Please try again."
+    return state
+
+
+def _is_unavailable(error: Exception) -> bool:
+    # The service reports every HTTP error on a reference as not found, so a 502 is told apart by its cause
+    if isinstance(error, exceptions.BookingNotFoundError) and error.__cause__ is not None:
+        error = error.__cause__
+    return isinstance(error, CircuitOpenError) or is_upstream_failure(error)
+
+
+def _reference_failure_response(error: Exception) -> str:
+    if _is_unavailable(error):
+        logger.warning("Booking API call failed: %r", error)
+        return UNAVAILABLE_RESPONSE
+    if isinstance(error, exceptions.BookingNotFoundError):
+        return "The booking reference was not found."
+    raise error
+
+
+def _make_booking_response(response: dict) -> str:
     if response.get("status") == "confirmed":
-        state.response = f"Your booking has been confirmed. The booking reference is {response.get("booking_reference")}."
+        return f"Your booking has been confirmed. The booking reference is {response.get("booking_reference")}."
+    return str(response)
+
+
+def _reject_unavailable_time(state: BookingState, availability: dict | None) -> bool:
+    # Checked against a search the customer has already waited for, so this costs no round trip
+    if availability is None or state.visit_time is None:
+        return False
+    times = _available_times(availability)
+    if state.visit_time.isoformat() in times:
+        return False
+    if times:
+        state.response = (
+            f"Sorry, {state.visit_time} is not available on {state.visit_date}. "
+            f"Available times are: {", ".join(times)}."
+        )
+        state.visit_time = None
+        state.pending_field = "visit_time"
     else:
-        state.response = str(response)
+        state.response = f"Sorry, there is no availability on {state.visit_date}. Please choose another date."
+        state.visit_date = None
+        state.visit_time = None
+        state.pending_field = "visit_date"
+    return True
+
+
+def make_booking(
+        state: BookingState,
+        booking_service: BookingService,
+        prefetcher: AvailabilityPrefetcher | None = None,
+    ) -> BookingState:
+    _progress("Making your booking…")
+    if prefetcher is not None:
+        availability = prefetcher.cached(state.visit_date, state.party_size, state.restaurant_name)
+        if _reject_unavailable_time(state, availability):
+            return state
+    try:
+        response = booking_service.make_booking(
+            visit_date=state.visit_date,
+            visit_time=state.visit_time,
+            party_size=state.party_size,
+            restaurant_name=state.restaurant_name,
+        )
+    except Exception as e:
+        if not _is_unavailable(e):
+            raise
+        logger.warning("Booking failed: %r", e)
+        state.response = UNAVAILABLE_RESPONSE
+        return state
+    logger.debug("Booking API response: %s", response)
+    state.response = _make_booking_response(response)
+    return state
+
+
+async def amake_booking(
+        state: BookingState,
+        booking_service: BookingService,
+        prefetcher: AvailabilityPrefetcher | None = None,
+    ) -> BookingState:
+    _progress("Making your booking…")
+    if prefetcher is not None:
+        availability = await prefetcher.availability(
+            _session_id(), state.visit_date, state.party_size, state.restaurant_name
+        )
+        if _reject_unavailable_time(state, availability):
+            return state
+        prefetcher.cancel(_session_id())
+    try:
+        response = await booking_service.amake_booking(
+            visit_date=state.visit_date,
+            visit_time=state.visit_time,
+            party_size=state.party_size,
+            restaurant_name=state.restaurant_name,
+        )
+    except Exception as e:
+        if not _is_unavailable(e):
+            raise
+        logger.warning("Booking failed: %r", e)
+        state.response = UNAVAILABLE_RESPONSE
+        return state
+    logger.debug("Booking API response: %s", response)
+    state.response = _make_booking_response(response)
+    return state
+
+
+def get_booking_details(
+        state: BookingState,
+        booking_service: BookingService,
+        early_reads: EarlyReads | None = None,
+    ) -> BookingState:
+    _progress("Looking up your booking…")
+    try:
+        response = booking_service.get_booking_details(
+            state.booking_reference, restaurant_name=state.restaurant_name
+        )
+    except Exception as e:
+        response = _reference_failure_response(e)
+    logger.debug("Booking API response: %s", response)
+    state.response = str(response)
     return state
 
 
-def get_booking_details(state: BookingState, booking_service: BookingService) -> BookingState:    
-    print("GET BOOKING DETAILS")
+async def aget_booking_details(
+        state: BookingState,
+        booking_service: BookingService,
+        early_reads: EarlyReads | None = None,
+    ) -> BookingState:
+    _progress("Looking up your booking…")
     try:
-        response = booking_service.get_booking_details(state.booking_reference)
-    except exceptions.BookingNotFoundError:
-        response = "The booking reference was not found."
-    print(response)
+        response = await _aread(state, booking_service, early_reads)
+    except Exception as e:
+        response = _reference_failure_response(e)
+    logger.debug("Booking API response: %s", response)
     state.response = str(response)
     return state
 
 
 def update_booking(state: BookingState, booking_service: BookingService) -> BookingState:
-    print("UPDATE BOOKING")
+    _progress("Updating your booking…")
     try:
-        response = booking_service.update_booking(state.booking_reference)
-    except exceptions.BookingNotFoundError:
-        response = "The booking reference was not found."
-    print(response)
+        response = booking_service.update_booking(
+            state.booking_reference, restaurant_name=state.restaurant_name
+        )
+    except Exception as e:
+        response = _reference_failure_response(e)
+    logger.debug("Booking API response: %s", response)
+    state.response = str(response)
+    return state
+
+
+async def aupdate_booking(state: BookingState, booking_service: BookingService) -> BookingState:
+    _progress("Updating your booking…")
+    try:
+        response = await booking_service.aupdate_booking(
+            state.booking_reference, restaurant_name=state.restaurant_name
+        )
+    except Exception as e:
+        response = _reference_failure_response(e)
+    logger.debug("Booking API response: %s", response)
     state.response = str(response)
     return state
 
 
 def cancel_booking(state: BookingState, booking_service: BookingService) -> BookingState:
-    print("CANCEL BOOKING")
+    _progress("Cancelling your booking…")
     try:
         response = booking_service.cancel_booking(
             state.booking_reference,
-            CancellationReason.CUSTOMER_REQUEST
+            CancellationReason.CUSTOMER_REQUEST,
+            restaurant_name=state.restaurant_name,
+        )
+    except Exception as e:
+        response = _reference_failure_response(e)
+    logger.debug("Booking API response: %s", response)
+    state.response = str(response)
+    return state
+
+
+async def acancel_booking(state: BookingState, booking_service: BookingService) -> BookingState:
+    _progress("Cancelling your booking…")
+    try:
+        response = await booking_service.acancel_booking(
+            state.booking_reference,
+            CancellationReason.CUSTOMER_REQUEST,
+            restaurant_name=state.restaurant_name,
         )
-    except exceptions.BookingNotFoundError:
-        response = "The booking reference was not found."
-    print(response)
+    except Exception as e:
+        response = _reference_failure_response(e)
+    logger.debug("Booking API response: %s", response)
     state.response = str(response)
     return state
@@ -0,0 +1,208 @@
+from collections import Counter
+from datetime import date, timedelta
+import re
+
+from agents.utils.state import Intent
+
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+# A count, not the hour of "for 7pm" or "for 19:00"
+NUMBER = rf"(\d{{1,2}}|{"|".join(NUMBER_WORDS)})\b(?![:.]\d|\s*[ap]m\b)"
+
+# Words that carry no information of their own once the rules below have matched
+FILLER_WORDS = {
+    "a", "am", "an", "and", "any", "are", "at", "booking", "can", "could", "do", "for", "guests",
+    "have", "i", "id", "in", "is", "it", "like", "me", "my", "number", "of", "ok", "okay", "on",
+    "people", "persons", "please", "ref", "reference", "reservation", "table", "thanks", "thank",
+    "that", "the", "there", "this", "to", "us", "want", "we", "what", "would", "you", "yes",
+    "s", "d", "m",
+}
+
+INTENT_RULES = [
+    # Checked in order, so "cancel booking" is not taken for a new booking
+    ("intent_cancel", Intent.CANCEL_BOOKING, re.compile(r"\bcancel(?:led|lation)?\b")),
+    ("intent_update", Intent.UPDATE_BOOKING, re.compile(r"\b(?:change|update|modify|move|reschedule)\b")),
+    ("intent_details", Intent.GET_BOOKING_DETAILS, re.compile(r"\b(?:details|look ?up|show my|check my|find my)\b")),
+    ("intent_nearest", Intent.FIND_NEAREST_SLOT, re.compile(r"\b(?:closest|nearest|earliest|soonest|first available)\b")),
+    ("intent_availability", Intent.CHECK_AVAILABILITY, re.compile(r"\b(?:availability|available|free|check)\b")),
+    ("intent_book", Intent.MAKE_BOOKING, re.compile(r"\b(?:book|reserve)\b")),
+]
+
+GREETING = re.compile(r"^\s*(?:hi|hello|hey|good (?:morning|afternoon|evening))\b[\s!.]*$")
+BOOKING_REFERENCE = re.compile(r"\b(?=[A-Z0-9]*\d)(?=[A-Z0-9]*[A-Z])[A-Z0-9]{6,8}\b")
+PARTY_SIZE = re.compile(rf"\b(?:(?:party|table|group) of|for)\s+{NUMBER}|\b{NUMBER}\s+(?:people|persons|guests|adults|pax|of us)\b")
+BARE_NUMBER = re.compile(rf"^\s*{NUMBER}\s*$")
+# Only taken for a reference when one was asked for, since customers type them in any case
+BARE_REFERENCE = re.compile(r"^\s*((?=[a-z0-9]*\d)(?=[a-z0-9]*[a-z])[a-z0-9]{6,8})[\s.!]*$")
+ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+RELATIVE_DAY = re.compile(r"\b(today|tonight|tomorrow|day after tomorrow)\b")
+WEEKDAY = re.compile(rf"\b(?:(next|this|on)\s+)?({"|".join(WEEKDAYS)})\b")
+CLOCK_TIME = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b|\b(noon|midday)\b")
+
+
+class PreParser:
+    def __init__(self):
+        self.messages = 0
+        self.fast_path = 0
+        self.rule_hits = Counter()
+        # Rules that took part in messages answered without the LLM, which is where the time is saved
+        self.rule_fast_path = Counter()
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+
+    def parse(
+            self,
+            message: str,
+            intent: Intent | None = None,
+            pending_field: str | None = None,
+            today: date | None = None,
+        ) -> dict | None:
+        # Returns the extracted fields in the LLM's JSON shape, or None when the LLM is needed
+        self.messages += 1
+        today = today or date.today()
+        text = message.lower()
+        parsed = {}
+        spans = []
+        rules = []
+
+        if GREETING.match(text):
+            self._hit("greeting", rules)
+            self._fast_path(rules)
+            return {}
+
+        for name, rule_intent, pattern in INTENT_RULES:
+            matches = list(pattern.finditer(text))
+            if matches:
+                self._hit(name, rules)
+                parsed["intent"] = rule_intent.name
+                spans.extend(match.span() for match in matches)
+                break
+
+        match = BOOKING_REFERENCE.search(message)
+        if match:
+            self._hit("booking_reference", rules)
+            parsed["booking_reference"] = match.group(0)
+            spans.append(match.span())
+        elif pending_field == "booking_reference" and (match := BARE_REFERENCE.match(text)):
+            self._hit("booking_reference", rules)
+            parsed["booking_reference"] = match.group(1).upper()
+            spans.append(match.span())
+
+        match = PARTY_SIZE.search(text) or (pending_field == "party_size" and BARE_NUMBER.match(text))
+        if match:
+            self._hit("party_size", rules)
+            parsed["party_size"] = _number(next(group for group in match.groups() if group))
+            spans.append(match.span())
+
+        visit_date, span = _visit_date(text, today)
+        if visit_date is not None:
+            self._hit("visit_date", rules)
+            parsed["visit_date"] = visit_date.isoformat()
+            spans.append(span)
+
+        match = CLOCK_TIME.search(text)
+        if match:
+            visit_time = _visit_time(match)
+            if visit_time is not None:
+                self._hit("visit_time", rules)
+                parsed["visit_time"] = visit_time
+                spans.append(match.span())
+
+        if not self._is_confident(text, spans, parsed, intent):
+            return None
+        self._fast_path(rules)
+        return parsed
+
+
+    def record_llm_call(self, seconds: float):
+        self.llm_calls += 1
+        self.llm_seconds += seconds
+
+
+    def stats(self) -> dict:
+        mean_llm_seconds = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+        return {
+            "messages": self.messages,
+            "fast_path": self.fast_path,
+            "fast_path_rate": self.fast_path / self.messages if self.messages else 0.0,
+            "rule_hits": dict(self.rule_hits),
+            "rule_hit_rates": {
+                rule: hits / self.messages for rule, hits in self.rule_hits.items()
+            },
+            "llm_calls": self.llm_calls,
+            "estimated_seconds_saved": self.fast_path * mean_llm_seconds,
+            # A message answered by several rules counts towards each of them
+            "rule_seconds_saved": {
+                rule: answered * mean_llm_seconds for rule, answered in self.rule_fast_path.items()
+            },
+        }
+
+
+    def _hit(self, rule: str, rules: list[str]):
+        self.rule_hits[rule] += 1
+        rules.append(rule)
+
+
+    def _fast_path(self, rules: list[str]):
+        self.fast_path += 1
+        self.rule_fast_path.update(rules)
+
+
+    def _is_confident(self, text: str, spans: list, parsed: dict, intent: Intent | None) -> bool:
+        if not parsed or (intent is None and "intent" not in parsed):
+            return False
+        # Anything left unexplained (names, special requests, questions) goes to the LLM
+        remainder = list(text)
+        for start, end in spans:
+            remainder[start:end] = " " * (end - start)
+        words = re.findall(r"[a-z0-9]+", "".join(remainder))
+        return all(word in FILLER_WORDS for word in words)
+
+
+def _number(value: str) -> int:
+    return NUMBER_WORDS.get(value) or int(value)
+
+
+def _visit_date(text: str, today: date) -> tuple[date | None, tuple[int, int] | None]:
+    match = ISO_DATE.search(text)
+    if match:
+        try:
+            return date.fromisoformat(match.group(1)), match.span()
+        except ValueError:
+            return None, None
+
+    match = RELATIVE_DAY.search(text)
+    if match:
+        offset = {"today": 0, "tonight": 0, "tomorrow": 1, "day after tomorrow": 2}[match.group(1)]
+        return today + timedelta(days=offset), match.span()
+
+    match = WEEKDAY.search(text)
+    if match:
+        days_ahead = (WEEKDAYS.index(match.group(2)) - today.weekday()) % 7
+        if match.group(1) == "next" and days_ahead == 0:
+            days_ahead = 7
+        return today + timedelta(days=days_ahead), match.span()
+
+    return None, None
+
+
+def _visit_time(match: re.Match) -> str | None:
+    hour, minute, meridiem, hour_24, minute_24, midday = match.groups()
+    if midday:
+        return "12:00:00"
+    if meridiem:
+        hour, minute = int(hour), int(minute or 0)
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    else:
+        hour, minute = int(hour_24), int(minute_24)
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}:00"
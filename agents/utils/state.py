@@ -12,18 +12,23 @@ class Intent(Enum):
     GET_BOOKING_DETAILS = "GET_BOOKING_DETAILS"
     UPDATE_BOOKING = "UPDATE_BOOKING"
     CANCEL_BOOKING = "CANCEL_BOOKING"
+    FIND_NEAREST_SLOT = "FIND_NEAREST_SLOT"
 
 
 class BookingState(BaseModel):
+    restaurant_name: str | None = None
     intent: Intent | None = None
 
     visit_date: date | None = None
+    visit_date_end: date | None = None
     visit_time: time | None = None
     party_size: int | None = None
     special_requests: str | None = None
     is_leave_time_confirmed: bool | None = None
     customer: Customer | None = None
     booking_reference: str | None = None
+    # The field the last response asked for, so the reply can be parsed for just that field
+    pending_field: str | None = None
 
     message: str | None = None
     response: str | None = None
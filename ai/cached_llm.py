@@ -0,0 +1,217 @@
+import asyncio
+from collections import OrderedDict
+from datetime import date
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+from typing import AsyncIterator, Iterator
+
+from ai.langauge_model import LanguageModel
+
+logger = logging.getLogger(__name__)
+
+class CachedLanguageModel(LanguageModel):
+    def __init__(self, llm: LanguageModel, max_size: int = 1024, db_path: str | None = None):
+        self.llm = llm
+        self.max_size = max_size
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._day = None
+        self._db = None
+        # Guards the connection, which worker threads share; held apart from the memory tier's lock
+        self._db_lock = threading.Lock()
+        self._db_day = None
+        if db_path is not None:
+            # Workers may share the file; WAL lets them read while one writes, and a short busy timeout
+            # turns a contended write into a miss rather than a stalled turn
+            self._db = sqlite3.connect(db_path, timeout=1.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, day TEXT, response TEXT)"
+            )
+            self._db.commit()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.disk_errors = 0
+        self.misses = 0
+
+
+    def chat(self, prompt: str) -> str:
+        key = self._key(prompt)
+        response = self._get(key)
+        if response is None:
+            response = self.llm.chat(prompt)
+            self._set(key, response)
+        return response
+
+
+    async def achat(self, prompt: str) -> str:
+        key = self._key(prompt)
+        response = await self._aget(key)
+        if response is None:
+            response = await self.llm.achat(prompt)
+            await self._aset(key, response)
+        return response
+
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        key = self._key(prompt)
+        response = self._get(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        for chunk in self.llm.stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self._set(key, "".join(chunks))
+
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        key = self._key(prompt)
+        response = await self._aget(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        async for chunk in self.llm.astream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        await self._aset(key, "".join(chunks))
+
+
+    async def awarm(self):
+        await self.llm.awarm()
+
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "disk_errors": self.disk_errors,
+            "misses": self.misses,
+        }
+
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        self.llm.close()
+
+
+    # Helper Functions
+    def _key(self, prompt: str) -> str:
+        # Keyed by day as well as prompt, so relative dates are never answered from yesterday
+        normalised = re.sub(r"\s+", " ", prompt).strip()
+        digest = hashlib.sha256(normalised.encode()).hexdigest()
+        return f"{date.today().isoformat()}:{digest}"
+
+
+    def _get(self, key: str) -> str | None:
+        response = self._from_memory(key)
+        if response is None and self._db is not None:
+            response = self._from_disk(key)
+        return self._counted(response)
+
+
+    async def _aget(self, key: str) -> str | None:
+        # The disk tier runs in a worker thread, so a busy database never stalls the event loop
+        response = self._from_memory(key)
+        if response is None and self._db is not None:
+            response = await asyncio.to_thread(self._from_disk, key)
+        return self._counted(response)
+
+
+    def _set(self, key: str, response: str):
+        day = self._to_memory(key, response)
+        if self._db is not None:
+            self._to_disk(key, day, response)
+
+
+    async def _aset(self, key: str, response: str):
+        day = self._to_memory(key, response)
+        if self._db is not None:
+            await asyncio.to_thread(self._to_disk, key, day, response)
+
+
+    def _counted(self, response: str | None) -> str | None:
+        if response is None:
+            with self._lock:
+                self.misses += 1
+        return response
+
+
+    def _from_memory(self, key: str) -> str | None:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return response
+
+
+    def _from_disk(self, key: str) -> str | None:
+        try:
+            with self._db_lock:
+                if self._db is None:
+                    return None
+                row = self._db.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            # The cache is optional, so a locked or broken database only costs a model call
+            self._disk_failed(e)
+            return None
+        if row is None:
+            return None
+        with self._lock:
+            self._remember(key, row[0])
+            self.disk_hits += 1
+        return row[0]
+
+
+    def _to_memory(self, key: str, response: str) -> str:
+        day = key.split(":", 1)[0]
+        with self._lock:
+            if day != self._day:
+                self._day = day
+                for stale in [stale for stale in self._entries if not stale.startswith(day)]:
+                    del self._entries[stale]
+            self._remember(key, response)
+        return day
+
+
+    def _to_disk(self, key: str, day: str, response: str):
+        try:
+            with self._db_lock:
+                if self._db is None:
+                    return
+                if day != self._db_day:
+                    self._db.execute("DELETE FROM completions WHERE day < ?", (day,))
+                    self._db_day = day
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, day, response) VALUES (?, ?, ?)",
+                    (key, day, response),
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            self._disk_failed(e)
+
+
+    def _disk_failed(self, error: sqlite3.Error):
+        logger.warning("LLM cache database error: %s", error)
+        with self._lock:
+            self.disk_errors += 1
+
+
+    def _remember(self, key: str, response: str):
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
@@ -0,0 +1,162 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator
+
+from ai.langauge_model import LanguageModel
+from observability import metrics
+
+
+# Shown the small model's chunks as they stream, before the cascade has judged the whole answer
+_draft_listener: ContextVar[Callable[[str], None] | None] = ContextVar("cascade_draft_listener", default=None)
+
+
+@contextmanager
+def drafts(listener: Callable[[str], None]) -> Iterator[None]:
+    # For callers that can act on an answer that may yet be replaced, such as by starting a read
+    token = _draft_listener.set(listener)
+    try:
+        yield
+    finally:
+        _draft_listener.reset(token)
+
+
+class CascadingLanguageModel(LanguageModel):
+    # Asks the small model first, and the large one only when problem() finds fault with the answer
+    def __init__(
+            self,
+            small: LanguageModel,
+            large: LanguageModel,
+            problem: Callable[[str], str | None],
+        ):
+        self.small = small
+        self.large = large
+        self.problem = problem
+        self._lock = threading.Lock()
+        self.served = {"small": 0, "large": 0}
+        self.escalations: dict[str, int] = {}
+        self.seconds = {"small": 0.0, "large": 0.0}
+
+
+    def chat(self, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            response = self.small.chat(prompt)
+            reason = self.problem(response)
+        except Exception:
+            reason = "error"
+        if reason is None:
+            self._record("small", start)
+            return response
+        self._escalate(reason)
+        response = self.large.chat(prompt)
+        self._record("large", start)
+        return response
+
+
+    async def achat(self, prompt: str) -> str:
+        start = time.perf_counter()
+        try:
+            response = await self.small.achat(prompt)
+            reason = self.problem(response)
+        except Exception:
+            reason = "error"
+        if reason is None:
+            self._record("small", start)
+            return response
+        self._escalate(reason)
+        response = await self.large.achat(prompt)
+        self._record("large", start)
+        return response
+
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # The small model's answer is checked whole before any of it is passed on
+        start = time.perf_counter()
+        try:
+            response = "".join(self._drafted(self.small.stream(prompt)))
+            reason = self.problem(response)
+        except Exception:
+            reason = "error"
+        if reason is None:
+            self._record("small", start)
+            yield response
+            return
+        self._escalate(reason)
+        yield from self.large.stream(prompt)
+        self._record("large", start)
+
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        try:
+            response = "".join([chunk async for chunk in self._adrafted(self.small.astream(prompt))])
+            reason = self.problem(response)
+        except Exception:
+            reason = "error"
+        if reason is None:
+            self._record("small", start)
+            yield response
+            return
+        self._escalate(reason)
+        async for chunk in self.large.astream(prompt):
+            yield chunk
+        self._record("large", start)
+
+
+    async def awarm(self):
+        await asyncio.gather(self.small.awarm(), self.large.awarm())
+
+
+    def close(self):
+        self.small.close()
+        self.large.close()
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = sum(self.served.values())
+            return {
+                "calls": calls,
+                "served": dict(self.served),
+                "escalations": dict(self.escalations),
+                "escalation_rate": self.served["large"] / calls if calls else 0.0,
+                "mean_seconds": {
+                    tier: self.seconds[tier] / self.served[tier] if self.served[tier] else 0.0
+                    for tier in self.served
+                },
+            }
+
+
+    # Helper Functions
+    def _drafted(self, chunks: Iterator[str]) -> Iterator[str]:
+        listener = _draft_listener.get()
+        for chunk in chunks:
+            if listener is not None:
+                listener(chunk)
+            yield chunk
+
+
+    async def _adrafted(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        listener = _draft_listener.get()
+        async for chunk in chunks:
+            if listener is not None:
+                listener(chunk)
+            yield chunk
+
+
+    def _escalate(self, reason: str):
+        with self._lock:
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        metrics.LLM_ESCALATIONS.inc(reason=reason)
+
+
+    def _record(self, tier: str, start: float):
+        # An escalated call's latency includes the small model's failed attempt
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.served[tier] += 1
+            self.seconds[tier] += seconds
+        metrics.LLM_CASCADE_SECONDS.observe(seconds, tier=tier)
@@ -0,0 +1,223 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+import heapq
+import itertools
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator
+
+from ai.langauge_model import LanguageModel
+from observability import tracing
+
+
+class LLMBusyError(Exception):
+    pass
+
+
+class Priority(IntEnum):
+    # Lower values are admitted first
+    HIGH = 0
+    NORMAL = 1
+
+
+_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.NORMAL)
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    # Context variables follow the call into graph nodes, tasks and to_thread workers
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Waiter:
+    def __init__(self, priority: Priority, seq: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.seq = seq
+        self.wake = wake
+        self.state = "waiting"
+
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class GatedLanguageModel(LanguageModel):
+    def __init__(
+            self,
+            llm: LanguageModel,
+            max_in_flight: int = 16,
+            max_queue: int = 64,
+            max_wait: float | None = 30.0,
+        ):
+        self.llm = llm
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejections = {"queue_full": 0, "evicted": 0, "timeout": 0}
+        self.wait_seconds = 0.0
+
+
+    def chat(self, prompt: str) -> str:
+        with self._slot():
+            return self.llm.chat(prompt)
+
+
+    async def achat(self, prompt: str) -> str:
+        async with self._aslot():
+            return await self.llm.achat(prompt)
+
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # The slot is held until the last chunk, since that is how long the provider is busy
+        with self._slot():
+            yield from self.llm.stream(prompt)
+
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        async with self._aslot():
+            async for chunk in self.llm.astream(prompt):
+                yield chunk
+
+
+    async def awarm(self):
+        await self.llm.awarm()
+
+
+    def close(self):
+        self.llm.close()
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejections": dict(self.rejections),
+                "wait_seconds": self.wait_seconds,
+            }
+
+
+    # Helper Functions
+    def _enqueue(self, wake: Callable[[], None]) -> _Waiter | None:
+        # Returns None when a slot is free now, else the waiter a release will wake
+        priority = _priority.get()
+        evicted = None
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                self.admitted += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                # A full queue sheds its newest, least urgent waiter for a more urgent arrival
+                worst = max(self._waiters)
+                if worst.priority <= priority:
+                    self.rejections["queue_full"] += 1
+                    raise LLMBusyError("The language model queue is full")
+                self._waiters.remove(worst)
+                heapq.heapify(self._waiters)
+                worst.state = "evicted"
+                self.rejections["evicted"] += 1
+                evicted = worst
+            waiter = _Waiter(priority, next(self._seq), wake)
+            heapq.heappush(self._waiters, waiter)
+            self.queued += 1
+        if evicted is not None:
+            evicted.wake()
+        return waiter
+
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        # Returns True if the waiter was granted a slot before it gave up, which it then owns
+        with self._lock:
+            if waiter.state == "waiting":
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                waiter.state = "abandoned"
+                return False
+            return waiter.state == "granted"
+
+
+    def _admitted(self, waiter: _Waiter, start: float):
+        if waiter.state == "evicted":
+            raise LLMBusyError("The language model queue is full")
+        with self._lock:
+            self.admitted += 1
+            self.wait_seconds += time.perf_counter() - start
+
+
+    def _timed_out(self) -> LLMBusyError:
+        with self._lock:
+            self.rejections["timeout"] += 1
+        return LLMBusyError("Timed out waiting for the language model")
+
+
+    def _release(self):
+        with self._lock:
+            if not self._waiters:
+                self._in_flight -= 1
+                return
+            # The slot passes straight to the most urgent waiter, so in_flight is unchanged
+            waiter = heapq.heappop(self._waiters)
+            waiter.state = "granted"
+        waiter.wake()
+
+
+    @contextmanager
+    def _slot(self):
+        start = time.perf_counter()
+        event = threading.Event()
+        waiter = self._enqueue(event.set)
+        if waiter is not None:
+            with tracing.span("llm.queue", priority=waiter.priority.name):
+                if not event.wait(self.max_wait) and not self._abandon(waiter):
+                    raise self._timed_out()
+                self._admitted(waiter, start)
+        try:
+            yield
+        finally:
+            self._release()
+
+
+    @asynccontextmanager
+    async def _aslot(self):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(wake)
+        if waiter is not None:
+            with tracing.span("llm.queue", priority=waiter.priority.name):
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+                except asyncio.TimeoutError:
+                    if not self._abandon(waiter):
+                        raise self._timed_out()
+                except asyncio.CancelledError:
+                    if self._abandon(waiter):
+                        self._release()
+                    raise
+                self._admitted(waiter, start)
+        try:
+            yield
+        finally:
+            self._release()
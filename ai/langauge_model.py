@@ -1,7 +1,27 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Iterator
 
 
 class LanguageModel(ABC):
     @abstractmethod
     def chat(self, prompt: str) -> str:
         pass
+
+    async def achat(self, prompt: str) -> str:
+        return await asyncio.to_thread(self.chat, prompt)
+
+    # Models without native streaming produce the whole completion as one chunk
+    def stream(self, prompt: str) -> Iterator[str]:
+        yield self.chat(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        yield await self.achat(prompt)
+
+    # Opens connections ahead of the first real call; a no-op for models without any
+    async def awarm(self):
+        pass
+
+    # Releases files and connections; a no-op for models without any
+    def close(self):
+        pass
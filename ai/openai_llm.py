@@ -1,12 +1,67 @@
+import time
+from typing import AsyncIterator, Iterator
+
 from langchain_openai import ChatOpenAI
 
 from ai.langauge_model import LanguageModel
+from observability import metrics, tracing
 
 
 class OpenAILanguageModel(LanguageModel):
     def __init__(self, model_name="gpt-4o", temperature=0.0):
-        self.client = ChatOpenAI(model=model_name, temperature=temperature)
+        self.model_name = model_name
+        self.client = ChatOpenAI(model=model_name, temperature=temperature, stream_usage=True)
     
     def chat(self, prompt: str) -> str:
-        response = self.client.invoke(prompt)
+        start = time.perf_counter()
+        with tracing.span("llm.chat", model=self.model_name):
+            response = self.client.invoke(prompt)
+            self._record(start, response.usage_metadata)
+        return response.content
+
+    async def achat(self, prompt: str) -> str:
+        start = time.perf_counter()
+        with tracing.span("llm.chat", model=self.model_name):
+            response = await self.client.ainvoke(prompt)
+            self._record(start, response.usage_metadata)
         return response.content
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        start = time.perf_counter()
+        # Not made current, since the caller runs between chunks
+        span = tracing.start_span("llm.stream", model=self.model_name)
+        usage = None
+        try:
+            for chunk in self.client.stream(prompt):
+                usage = chunk.usage_metadata or usage
+                yield chunk.content
+        finally:
+            self._record(start, usage, span)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        start = time.perf_counter()
+        span = tracing.start_span("llm.stream", model=self.model_name)
+        usage = None
+        try:
+            async for chunk in self.client.astream(prompt):
+                usage = chunk.usage_metadata or usage
+                yield chunk.content
+        finally:
+            self._record(start, usage, span)
+
+    async def awarm(self):
+        # Listing models is free, and leaves a connection in the pool that completions then share
+        await self.client.root_async_client.models.list()
+
+    def _record(self, start: float, usage: dict | None, span: tracing.Span | None = None):
+        metrics.LLM_SECONDS.observe(time.perf_counter() - start, model=self.model_name)
+        if usage:
+            metrics.LLM_TOKENS.inc(usage.get("input_tokens", 0), model=self.model_name, kind="prompt")
+            metrics.LLM_TOKENS.inc(usage.get("output_tokens", 0), model=self.model_name, kind="completion")
+            tokens = {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+            if span is None:
+                tracing.annotate(**tokens)
+            else:
+                span.attributes.update(tokens)
+        if span is not None:
+            span.finish()
@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+from collections import Counter
+from datetime import date, timedelta
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import sys
+import threading
+import time
+
+from fastapi import FastAPI
+import httpx
+import uvicorn
+
+from agents.booking_agent import BookingAgent
+from ai.cached_llm import CachedLanguageModel
+from ai.gated_llm import GatedLanguageModel
+from ai.langauge_model import LanguageModel
+from benchmarks.scripted_llm import ScriptedLanguageModel
+from benchmarks.stub_api import create_stub_api, seeded_reference
+from client.booking_client import BookingClient
+from services.booking_service import BookingService
+import web.main
+from web.routes import DEFAULT_RESTAURANT_NAME
+
+
+DAYS_AHEAD = 14
+PARTY_SIZES = range(2, 7)
+REFERENCES = 50
+# Relative weight of each conversation in the generated traffic
+CONVERSATIONS = {"availability": 4, "booking": 3, "details": 2, "cancel": 1}
+
+
+def build_script(today: date) -> dict[str, str]:
+    # Every message the conversations can send, with the JSON the real model would extract from it
+    script = {"At 19:00 please": {"visit_time": "19:00:00"}}
+    for days in range(1, DAYS_AHEAD + 1):
+        visit_date = (today + timedelta(days=days)).isoformat()
+        script[f"How about {visit_date}?"] = {"visit_date": visit_date}
+        for party_size in PARTY_SIZES:
+            script[f"Is there a table for {party_size} on {visit_date}?"] = {
+                "intent": "CHECK_AVAILABILITY", "visit_date": visit_date, "party_size": party_size,
+            }
+    for party_size in PARTY_SIZES:
+        script[f"I'd like to book a table for {party_size} people"] = {
+            "intent": "MAKE_BOOKING", "party_size": party_size,
+        }
+    for index in range(REFERENCES):
+        reference = seeded_reference(index)
+        script[f"Can you show me booking {reference}?"] = {
+            "intent": "GET_BOOKING_DETAILS", "booking_reference": reference,
+        }
+        script[f"Please cancel booking {reference}"] = {
+            "intent": "CANCEL_BOOKING", "booking_reference": reference,
+        }
+    return {message: json.dumps(completion) for message, completion in script.items()}
+
+
+def conversation(rng: random.Random, today: date) -> list[str]:
+    visit_date = (today + timedelta(days=rng.randint(1, DAYS_AHEAD))).isoformat()
+    party_size = rng.choice(PARTY_SIZES)
+    reference = seeded_reference(rng.randrange(REFERENCES))
+    match rng.choices(list(CONVERSATIONS), weights=list(CONVERSATIONS.values()))[0]:
+        case "availability":
+            return [f"Is there a table for {party_size} on {visit_date}?"]
+        case "booking":
+            return [f"I'd like to book a table for {party_size} people", f"How about {visit_date}?", "At 19:00 please"]
+        case "details":
+            return [f"Can you show me booking {reference}?"]
+        case "cancel":
+            return [f"Please cancel booking {reference}"]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(app: FastAPI) -> tuple[uvicorn.Server, str]:
+    # Failed turns are counted in the report rather than logged with a traceback each
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="critical"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS; ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def create_app(stub_url: str, llm: LanguageModel):
+    client = BookingClient(stub_url, "benchmark", DEFAULT_RESTAURANT_NAME)
+    app = web.main.create_app(agent=BookingAgent(BookingService(client), llm), prewarm=False)
+    return app, app.state.sessions
+
+
+async def run_session(
+        http: httpx.AsyncClient,
+        session_id: str,
+        messages: list[str],
+        latencies: list[float],
+        failures: list[str],
+    ):
+    headers = {"Cookie": f"session_id={session_id}"}
+    for message in messages:
+        start = time.perf_counter()
+        try:
+            response = await http.post("/chat/turn", data={"message": message}, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            failures.append(f"HTTP {e.response.status_code}")
+        except httpx.HTTPError as e:
+            failures.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def drive(app_url: str, sessions: int, concurrency: int, seed: int) -> tuple[list[float], list[str], float]:
+    rng = random.Random(seed)
+    today = date.today()
+    latencies: list[float] = []
+    failures: list[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def session(index: int, messages: list[str]):
+        async with semaphore:
+            await run_session(http, f"bench-{seed}-{index}", messages, latencies, failures)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=60.0) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(session(index, conversation(rng, today)) for index in range(sessions)))
+        duration = time.perf_counter() - start
+    return latencies, failures, duration
+
+
+def report(
+        latencies: list[float],
+        failures: list[str],
+        duration: float,
+        sessions: int,
+        llm: ScriptedLanguageModel,
+        store_stats: dict,
+        rss_growth: int,
+    ) -> dict:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "failures": dict(Counter(failures)),
+        "duration_seconds": round(duration, 3),
+        "throughput_turns_per_second": round(len(latencies) / duration, 2),
+        "latency_seconds": {
+            "p50": round(cuts[49], 4),
+            "p95": round(cuts[94], 4),
+            "p99": round(cuts[98], 4),
+            "max": round(max(latencies), 4),
+        },
+        "llm_calls": llm.calls,
+        "stored_bytes_per_session": round(store_stats["bytes"] / max(store_stats["sessions"], 1)),
+        "rss_bytes_per_session": round(rss_growth / sessions),
+    }
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description="Drive concurrent chat sessions against a stubbed booking stack.")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per scripted LLM call")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="mean seconds per booking API call")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="fraction of booking API calls that fail with 503")
+    parser.add_argument("--no-llm-cache", action="store_true", help="send every prompt to the scripted LLM")
+    parser.add_argument("--llm-max-in-flight", type=int, help="limit concurrent LLM calls, as production does")
+    parser.add_argument("--llm-max-queue", type=int, default=64, help="LLM calls that may wait for a slot")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    stub_server, stub_url = serve(create_stub_api(args.api_latency, args.api_error_rate, REFERENCES, args.seed))
+    scripted = ScriptedLanguageModel(build_script(date.today()), latency=args.llm_latency)
+    llm = scripted
+    if args.llm_max_in_flight:
+        llm = GatedLanguageModel(llm, max_in_flight=args.llm_max_in_flight, max_queue=args.llm_max_queue)
+    app, session_store = create_app(stub_url, llm if args.no_llm_cache else CachedLanguageModel(llm))
+    app_server, app_url = serve(app)
+
+    rss_before = _rss_bytes()
+    latencies, failures, duration = asyncio.run(drive(app_url, args.sessions, args.concurrency, args.seed))
+    rss_growth = max(_rss_bytes() - rss_before, 0)
+
+    app_server.should_exit = True
+    stub_server.should_exit = True
+
+    result = report(latencies, failures, duration, args.sessions, scripted, session_store.stats(), rss_growth)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
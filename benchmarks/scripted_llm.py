@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+from ai.langauge_model import LanguageModel
+
+
+class ScriptedLanguageModel(LanguageModel):
+    # Answers with the scripted completion for whichever known user message appears in the prompt
+    def __init__(self, script: dict[str, str], latency: float = 0.5, default: str = "{}"):
+        self.script = script
+        self.latency = latency
+        self.default = default
+        self.calls = 0
+
+
+    def chat(self, prompt: str) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._completion(prompt)
+
+
+    async def achat(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._completion(prompt)
+
+
+    def _completion(self, prompt: str) -> str:
+        for message, completion in self.script.items():
+            if message in prompt:
+                return completion
+        return self.default
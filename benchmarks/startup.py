@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load import _free_port
+
+
+def _import_seconds(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", "import time; start = time.perf_counter(); import web.main; print(time.perf_counter() - start)"],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output)
+
+
+def _wait_for_port(port: int, deadline: float):
+    while time.perf_counter() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError("uvicorn did not bind in time")
+
+
+def _wait_until_ready(port: int, deadline: float, interval: float = 0.05):
+    # Polling harder only steals the GIL from the agent being built
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if client.get("/healthz").status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(interval)
+    raise TimeoutError("the agent was not ready in time")
+
+
+def measure(env: dict, timeout: float = 60.0) -> dict:
+    # Cold start of a fresh interpreter, as an autoscaled pod sees it: spawn -> bound -> agent ready
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "web.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port, start + timeout)
+        bound = time.perf_counter()
+        _wait_until_ready(port, start + timeout)
+        ready = time.perf_counter()
+    finally:
+        server.terminate()
+        server.wait()
+    return {"bind_seconds": bound - start, "ready_seconds": ready - start}
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "median": round(statistics.median(samples), 3),
+        "min": round(min(samples), 3),
+        "max": round(max(samples), 3),
+    }
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the web app.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--prewarm", action="store_true", help="pre-warm connections as production does")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    env = {
+        "OPENAI_API_KEY": "benchmark",
+        # Nothing listens here, so pre-warming fails fast rather than reaching a real API
+        "BOOKING_API_BASE_URL": "http://127.0.0.1:9",
+        **os.environ,
+        "PREWARM": "1" if args.prewarm else "0",
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])),
+    }
+    imports = [_import_seconds(env) for _ in range(args.runs)]
+    starts = [measure(env) for _ in range(args.runs)]
+
+    result = {
+        "runs": args.runs,
+        "import_seconds": _summary(imports),
+        "bind_seconds": _summary([start["bind_seconds"] for start in starts]),
+        "ready_seconds": _summary([start["ready_seconds"] for start in starts]),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
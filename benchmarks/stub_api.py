@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime
+import random
+import string
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+PREFIX = "/api/ConsumerApi/v1/Restaurant/{restaurant_name}"
+SLOT_TIMES = [f"{hour:02d}:{minute:02d}:00" for hour in range(12, 22) for minute in (0, 30)]
+
+
+def seeded_reference(index: int) -> str:
+    return f"S{index:06d}"
+
+
+def create_stub_api(
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        seed_bookings: int = 100,
+        seed: int = 0,
+    ) -> FastAPI:
+    # Mimics the ConsumerApi endpoints used by BookingClient, with injected latency and failures
+    app = FastAPI()
+    rng = random.Random(seed)
+    bookings: dict[str, dict] = {}
+    for index in range(seed_bookings):
+        bookings[seeded_reference(index)] = {
+            "booking_reference": seeded_reference(index),
+            "booking_id": index + 1,
+            "restaurant": "TheHungryUnicorn",
+            "visit_date": "2030-01-01",
+            "visit_time": "19:00:00",
+            "party_size": 2,
+            "special_requests": None,
+            "status": "confirmed",
+            "created_at": datetime.now().isoformat(),
+        }
+
+    async def upstream():
+        if latency:
+            await asyncio.sleep(rng.uniform(0.5 * latency, 1.5 * latency))
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse({"detail": "Service unavailable"}, status_code=503)
+        return None
+
+    def reference() -> str:
+        return "".join(rng.choices(string.ascii_uppercase + string.digits, k=7))
+
+    @app.post(f"{PREFIX}/AvailabilitySearch")
+    async def availability_search(restaurant_name: str, request: Request):
+        if error := await upstream():
+            return error
+        form = await request.form()
+        party_size = int(form["PartySize"])
+        taken = {
+            booking["visit_time"] for booking in bookings.values()
+            if booking["visit_date"] == form["VisitDate"] and booking["status"] != "cancelled"
+        }
+        slots = [
+            {
+                "time": slot_time,
+                "available": slot_time not in taken and party_size <= 8,
+                "max_party_size": 8,
+                "current_bookings": int(slot_time in taken),
+            }
+            for slot_time in SLOT_TIMES
+        ]
+        return {
+            "restaurant": restaurant_name,
+            "restaurant_id": 1,
+            "visit_date": form["VisitDate"],
+            "party_size": party_size,
+            "channel_code": form.get("ChannelCode"),
+            "available_slots": slots,
+            "total_slots": len(slots),
+        }
+
+    @app.post(f"{PREFIX}/BookingWithStripeToken")
+    async def make_booking(restaurant_name: str, request: Request):
+        if error := await upstream():
+            return error
+        form = await request.form()
+        booking = {
+            "booking_reference": reference(),
+            "booking_id": len(bookings) + 1,
+            "restaurant": restaurant_name,
+            "visit_date": form["VisitDate"],
+            "visit_time": form["VisitTime"],
+            "party_size": int(form["PartySize"]),
+            "special_requests": form.get("SpecialRequests"),
+            "status": "confirmed",
+            "created_at": datetime.now().isoformat(),
+        }
+        bookings[booking["booking_reference"]] = booking
+        return booking
+
+    @app.get(f"{PREFIX}/Booking/{{booking_reference}}")
+    async def get_booking(restaurant_name: str, booking_reference: str):
+        if error := await upstream():
+            return error
+        if booking_reference not in bookings:
+            return JSONResponse({"detail": "Booking not found"}, status_code=404)
+        return bookings[booking_reference]
+
+    @app.patch(f"{PREFIX}/Booking/{{booking_reference}}")
+    async def update_booking(restaurant_name: str, booking_reference: str, request: Request):
+        if error := await upstream():
+            return error
+        if booking_reference not in bookings:
+            return JSONResponse({"detail": "Booking not found"}, status_code=404)
+        form = await request.form()
+        fields = {
+            "VisitDate": "visit_date",
+            "VisitTime": "visit_time",
+            "PartySize": "party_size",
+            "SpecialRequests": "special_requests",
+        }
+        updates = {field: form[key] for key, field in fields.items() if key in form}
+        bookings[booking_reference].update(updates)
+        return {
+            "booking_reference": booking_reference,
+            "updates": updates,
+            "status": "updated",
+            "updated_at": datetime.now().isoformat(),
+        }
+
+    @app.post(f"{PREFIX}/Booking/{{booking_reference}}/Cancel")
+    async def cancel_booking(restaurant_name: str, booking_reference: str):
+        if error := await upstream():
+            return error
+        if booking_reference not in bookings:
+            return JSONResponse({"detail": "Booking not found"}, status_code=404)
+        bookings[booking_reference]["status"] = "cancelled"
+        return {
+            "booking_reference": booking_reference,
+            "status": "cancelled",
+            "cancelled_at": datetime.now().isoformat(),
+        }
+
+    app.state.bookings = bookings
+    return app
@@ -1,13 +1,53 @@
+import asyncio
+from collections import OrderedDict, defaultdict
 from datetime import date, time
+import logging
+import re
+import threading
+import time as timer
+from typing import Any, Callable
 
+import httpx
 import requests
 
 from client.model.cancallation_reason import CancellationReason
 from client.model.customer import Customer
+from client.resilience import (
+    DEFAULT_TIMEOUTS,
+    CircuitBreaker,
+    LatencyTracker,
+    RetryPolicy,
+    Timeout,
+    is_transient,
+)
+from client.single_flight import SingleFlight
+from observability import metrics, tracing
+
+
+logger = logging.getLogger(__name__)
+
+# Microsite names are interpolated into the booking API path; anchored so pydantic fields can share it
+RESTAURANT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class UnexpectedNotModifiedError(Exception):
+    pass
 
 
 class BookingClient:
-    def __init__(self, base_url: str, bearer_token: str, restaurant_name: str):
+    def __init__(
+            self,
+            base_url: str,
+            bearer_token: str,
+            restaurant_name: str,
+            max_connections: int = 100,
+            timeouts: dict[str, Timeout] | None = None,
+            retry_policy: RetryPolicy | None = None,
+            circuit_breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+            hedge_quantile: float | None = 0.95,
+            max_validated: int = 1024,
+        ):
+        # Default microsite; every call may name another one and still share the same connection pool
         self.restaurant_name = restaurant_name
         self.base_url = base_url
         headers = {
@@ -16,23 +56,376 @@ class BookingClient:
         }
         self.session = requests.Session()
         self.session.headers.update(headers)
+        self.async_session = httpx.AsyncClient(
+            headers=headers,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        # Identical concurrent reads share one upstream request
+        self.single_flight = SingleFlight()
+
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._httpx_timeouts = {endpoint: timeout.httpx() for endpoint, timeout in self.timeouts.items()}
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        # One circuit per restaurant, so one microsite failing does not fail calls to the others
+        self.circuit_breaker_factory = circuit_breaker_factory
+        self.circuit_breakers: dict[str, CircuitBreaker] = {}
+        self._circuit_lock = threading.Lock()
+        # Async GETs slower than this quantile of recent latency race a duplicate request
+        self.hedge_quantile = hedge_quantile
+        self.latencies: defaultdict[str, LatencyTracker] = defaultdict(LatencyTracker)
+        # URL -> (conditional request headers, body) for GETs answered with an ETag or Last-Modified
+        self.max_validated = max_validated
+        self._validated: OrderedDict[str, tuple[dict, Any]] = OrderedDict()
+        self._validated_lock = threading.Lock()
+        self.not_modified = 0
+
+
+    def check_availability(self, visit_date: date, party_size: int, restaurant_name: str | None = None):
+        url, data = self._check_availability_request(visit_date, party_size, restaurant_name)
+
+        def request():
+            return self._send("AvailabilitySearch", "post", url, data, restaurant_name, retry=True)
+
+        return self.single_flight.do(("POST", url, frozenset(data.items())), request)
+
+
+    def make_booking(
+            self,
+            visit_date: date,
+            visit_time: time,
+            party_size: int,
+            special_requests: str | None = None,
+            is_leave_time_confirmed: bool = None,
+            customer: Customer | None = None,
+            restaurant_name: str | None = None,
+        ):
+        url, data = self._make_booking_request(
+            visit_date,
+            visit_time,
+            party_size,
+            special_requests,
+            is_leave_time_confirmed,
+            customer,
+            restaurant_name,
+        )
+        return self._send("BookingWithStripeToken", "post", url, data, restaurant_name)
+
+
+    def get_booking_details(self, booking_reference: str, restaurant_name: str | None = None):
+        url = self._booking_url(booking_reference, restaurant_name)
+
+        def request():
+            return self._send("Booking", "get", url, restaurant_name=restaurant_name, retry=True)
+
+        return self.single_flight.do(("GET", url), request)
+
+
+    def update_booking(
+        self,
+        booking_reference: str,
+        visit_date: date | None = None,
+        visit_time: time | None = None,
+        party_size: int | None = None,
+        special_requests: str | None = None,
+        is_leave_time_confirmed: bool | None = None,
+        restaurant_name: str | None = None,
+    ):
+        url, data = self._update_booking_request(
+            booking_reference,
+            visit_date,
+            visit_time,
+            party_size,
+            special_requests,
+            is_leave_time_confirmed,
+            restaurant_name,
+        )
+        return self._send("UpdateBooking", "patch", url, data, restaurant_name)
+
+
+    def cancel_booking(
+            self,
+            booking_reference: str,
+            cancellation_reason: CancellationReason,
+            restaurant_name: str | None = None,
+        ):
+        url, data = self._cancel_booking_request(booking_reference, cancellation_reason, restaurant_name)
+        return self._send("Cancel", "post", url, data, restaurant_name)
+
+
+    # Async API, sharing one pooled keep-alive connection set across requests
+    async def acheck_availability(self, visit_date: date, party_size: int, restaurant_name: str | None = None):
+        url, data = self._check_availability_request(visit_date, party_size, restaurant_name)
+
+        async def request():
+            return await self._asend("AvailabilitySearch", "post", url, data, restaurant_name, retry=True)
+
+        return await self.single_flight.ado(("POST", url, frozenset(data.items())), request)
+
+
+    async def amake_booking(
+            self,
+            visit_date: date,
+            visit_time: time,
+            party_size: int,
+            special_requests: str | None = None,
+            is_leave_time_confirmed: bool = None,
+            customer: Customer | None = None,
+            restaurant_name: str | None = None,
+        ):
+        url, data = self._make_booking_request(
+            visit_date,
+            visit_time,
+            party_size,
+            special_requests,
+            is_leave_time_confirmed,
+            customer,
+            restaurant_name,
+        )
+        return await self._asend("BookingWithStripeToken", "post", url, data, restaurant_name)
 
 
-    def check_availability(self, visit_date: date, party_size: int):
-        url = f"{self.base_url}/api/ConsumerApi/v1/Restaurant/{self.restaurant_name}/AvailabilitySearch"
-        response = self.session.post(
-            url,
-            data={
-                "VisitDate": visit_date,
-                "PartySize": party_size,
-                "ChannelCode": "ONLINE",
-            },
+    async def aget_booking_details(self, booking_reference: str, restaurant_name: str | None = None):
+        url = self._booking_url(booking_reference, restaurant_name)
+
+        async def request():
+            return await self._asend("Booking", "get", url, restaurant_name=restaurant_name, retry=True, hedge=True)
+
+        return await self.single_flight.ado(("GET", url), request)
+
+
+    async def aupdate_booking(
+        self,
+        booking_reference: str,
+        visit_date: date | None = None,
+        visit_time: time | None = None,
+        party_size: int | None = None,
+        special_requests: str | None = None,
+        is_leave_time_confirmed: bool | None = None,
+        restaurant_name: str | None = None,
+    ):
+        url, data = self._update_booking_request(
+            booking_reference,
+            visit_date,
+            visit_time,
+            party_size,
+            special_requests,
+            is_leave_time_confirmed,
+            restaurant_name,
         )
+        return await self._asend("UpdateBooking", "patch", url, data, restaurant_name)
+
+
+    async def acancel_booking(
+            self,
+            booking_reference: str,
+            cancellation_reason: CancellationReason,
+            restaurant_name: str | None = None,
+        ):
+        url, data = self._cancel_booking_request(booking_reference, cancellation_reason, restaurant_name)
+        return await self._asend("Cancel", "post", url, data, restaurant_name)
+
+
+    async def awarm(self):
+        # Any response, even an error status, leaves a keep-alive connection in the pool
+        try:
+            await self.async_session.get(self.base_url, timeout=self._httpx_timeouts["Booking"])
+        except httpx.HTTPError as e:
+            logger.debug("Booking API pre-warm failed: %r", e)
+
+
+    async def aclose(self):
+        await self.async_session.aclose()
+        self.session.close()
+
+
+    def circuit_breaker(self, restaurant_name: str | None = None) -> CircuitBreaker:
+        name = restaurant_name or self.restaurant_name
+        breaker = self.circuit_breakers.get(name)
+        if breaker is None:
+            with self._circuit_lock:
+                breaker = self.circuit_breakers.setdefault(name, self.circuit_breaker_factory())
+        return breaker
+
+
+    # Helper Functions
+    def _send(
+            self,
+            endpoint: str,
+            method: str,
+            url: str,
+            data: dict | None = None,
+            restaurant_name: str | None = None,
+            retry: bool = False,
+        ):
+        # Only reads are retried; a retried booking or cancellation could apply twice
+        attempts = self.retry_policy.attempts if retry else 1
+        breaker = self.circuit_breaker(restaurant_name)
+        for attempt in range(attempts):
+            try:
+                return self._send_once(endpoint, method, url, data, breaker)
+            except Exception as e:
+                if attempt + 1 == attempts or not is_transient(e):
+                    raise
+            metrics.BOOKING_API_RETRIES.inc(endpoint=endpoint)
+            timer.sleep(self.retry_policy.delay(attempt))
+
+
+    async def _asend(
+            self,
+            endpoint: str,
+            method: str,
+            url: str,
+            data: dict | None = None,
+            restaurant_name: str | None = None,
+            retry: bool = False,
+            hedge: bool = False,
+        ):
+        attempts = self.retry_policy.attempts if retry else 1
+        breaker = self.circuit_breaker(restaurant_name)
+        for attempt in range(attempts):
+            try:
+                if hedge:
+                    return await self._asend_hedged(endpoint, method, url, data, breaker)
+                return await self._asend_once(endpoint, method, url, data, breaker)
+            except Exception as e:
+                if attempt + 1 == attempts or not is_transient(e):
+                    raise
+            metrics.BOOKING_API_RETRIES.inc(endpoint=endpoint)
+            await asyncio.sleep(self.retry_policy.delay(attempt))
+
+
+    async def _asend_hedged(self, endpoint: str, method: str, url: str, data: dict | None, breaker: CircuitBreaker):
+        hedge_after = None
+        if self.hedge_quantile is not None:
+            hedge_after = self.latencies[endpoint].quantile(self.hedge_quantile)
+        if hedge_after is None:
+            return await self._asend_once(endpoint, method, url, data, breaker)
+
+        first = asyncio.ensure_future(self._asend_once(endpoint, method, url, data, breaker))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                metrics.BOOKING_API_HEDGES.inc(endpoint=endpoint)
+                tasks.add(asyncio.ensure_future(self._asend_once(endpoint, method, url, data, breaker)))
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # A non-transient error such as a 404 is an answer; only a transient one waits for the other
+                    if task.exception() is None or not is_transient(task.exception()):
+                        return task.result()
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+    def _send_once(self, endpoint: str, method: str, url: str, data: dict | None, breaker: CircuitBreaker):
+        kwargs = {} if data is None else {"data": data}
+        validated = self._conditional(method, url, kwargs)
+        with tracing.span(f"booking_api.{endpoint}", method=method.upper()), breaker.call():
+            status = "error"
+            start = timer.perf_counter()
+            try:
+                response = getattr(self.session, method)(url, timeout=self.timeouts[endpoint], **kwargs)
+                status = str(response.status_code)
+                return self._body(method, url, response, validated)
+            finally:
+                tracing.annotate(status=status)
+                self._observe(endpoint, status, timer.perf_counter() - start)
+
+
+    async def _asend_once(self, endpoint: str, method: str, url: str, data: dict | None, breaker: CircuitBreaker):
+        kwargs = {} if data is None else {"data": data}
+        validated = self._conditional(method, url, kwargs)
+        with tracing.span(f"booking_api.{endpoint}", method=method.upper()), breaker.call():
+            status = "error"
+            start = timer.perf_counter()
+            try:
+                response = await getattr(self.async_session, method)(
+                    url, timeout=self._httpx_timeouts[endpoint], **kwargs
+                )
+                status = str(response.status_code)
+                return self._body(method, url, response, validated)
+            finally:
+                tracing.annotate(status=status)
+                self._observe(endpoint, status, timer.perf_counter() - start)
+
+
+    def _conditional(self, method: str, url: str, kwargs: dict) -> tuple[dict, Any] | None:
+        # Revalidates a GET the API has tagged before, so an unchanged resource comes back as a bodiless 304
+        if method != "get":
+            return None
+        with self._validated_lock:
+            validated = self._validated.get(url)
+        if validated is not None:
+            kwargs["headers"] = validated[0]
+        return validated
+
+
+    def _body(self, method: str, url: str, response, validated: tuple[dict, Any] | None = None):
+        if response.status_code == 304:
+            if validated is None:
+                # Its body would be empty; only a conditional request has one to fall back on
+                raise UnexpectedNotModifiedError(
+                    f"304 Not Modified for {method.upper()} {url}, which was not conditional"
+                )
+            self.not_modified += 1
+            return validated[1]
         response.raise_for_status()
-        return response.json()
+        body = response.json()
+        if method == "get":
+            headers = {}
+            if response.headers.get("ETag"):
+                headers["If-None-Match"] = response.headers["ETag"]
+            if response.headers.get("Last-Modified"):
+                headers["If-Modified-Since"] = response.headers["Last-Modified"]
+            with self._validated_lock:
+                if headers:
+                    self._validated[url] = (headers, body)
+                    self._validated.move_to_end(url)
+                    while len(self._validated) > self.max_validated:
+                        self._validated.popitem(last=False)
+                else:
+                    self._validated.pop(url, None)
+        return body
 
 
-    def make_booking(
+    def _observe(self, endpoint: str, status: str, seconds: float):
+        metrics.BOOKING_API_SECONDS.observe(seconds, endpoint=endpoint)
+        metrics.BOOKING_API_REQUESTS.inc(endpoint=endpoint, status=status)
+        if status != "error":
+            self.latencies[endpoint].observe(seconds)
+
+
+    def _restaurant_url(self, restaurant_name: str | None = None) -> str:
+        return f"{self.base_url}/api/ConsumerApi/v1/Restaurant/{restaurant_name or self.restaurant_name}"
+
+
+    def _booking_url(self, booking_reference: str, restaurant_name: str | None = None) -> str:
+        return f"{self._restaurant_url(restaurant_name)}/Booking/{booking_reference}"
+
+
+    def _check_availability_request(
+            self,
+            visit_date: date,
+            party_size: int,
+            restaurant_name: str | None = None,
+        ):
+        url = f"{self._restaurant_url(restaurant_name)}/AvailabilitySearch"
+        data = {
+            "VisitDate": visit_date,
+            "PartySize": party_size,
+            "ChannelCode": "ONLINE",
+        }
+        return url, data
+
+
+    def _make_booking_request(
             self,
             visit_date: date,
             visit_time: time,
@@ -40,8 +433,9 @@ class BookingClient:
             special_requests: str | None = None,
             is_leave_time_confirmed: bool = None,
             customer: Customer | None = None,
+            restaurant_name: str | None = None,
         ):
-        url = f"{self.base_url}/api/ConsumerApi/v1/Restaurant/{self.restaurant_name}/BookingWithStripeToken"
+        url = f"{self._restaurant_url(restaurant_name)}/BookingWithStripeToken"
         data = {
             "VisitDate": visit_date,
             "VisitTime": visit_time,
@@ -54,22 +448,10 @@ class BookingClient:
             data["IsLeaveTimeConfirmed"] = is_leave_time_confirmed
         if customer is not None:
             data |= self._customer_to_dict(customer)
-        response = self.session.post(
-            url,
-            data=data,
-        )
-        response.raise_for_status()
-        return response.json()
+        return url, data
 
 
-    def get_booking_details(self, booking_reference: str):
-        url = f"{self.base_url}/api/ConsumerApi/v1/Restaurant/{self.restaurant_name}/Booking/{booking_reference}"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
-
-
-    def update_booking(
+    def _update_booking_request(
         self,
         booking_reference: str,
         visit_date: date | None = None,
@@ -77,8 +459,9 @@ class BookingClient:
         party_size: int | None = None,
         special_requests: str | None = None,
         is_leave_time_confirmed: bool | None = None,
+        restaurant_name: str | None = None,
     ):
-        url = f"{self.base_url}/api/ConsumerApi/v1/Restaurant/{self.restaurant_name}/Booking/{booking_reference}"
+        url = self._booking_url(booking_reference, restaurant_name)
         data = {}
         if visit_date is not None:
             data["VisitDate"] = visit_date
@@ -90,29 +473,24 @@ class BookingClient:
             data["SpecialRequests"] = special_requests
         if is_leave_time_confirmed is not None:
             data["IsLeaveTimeConfirmed"] = is_leave_time_confirmed
-        response = self.session.patch(
-            url,
-            data=data,
-        )
-        response.raise_for_status()
-        return response.json()
-
-
-    def cancel_booking(self, booking_reference: str, cancellation_reason: CancellationReason):
-        url = f"{self.base_url}/api/ConsumerApi/v1/Restaurant/{self.restaurant_name}/Booking/{booking_reference}/Cancel"
-        response = self.session.post(
-            url,
-            data={
-                "micrositeName": self.restaurant_name,
-                "bookingReference": booking_reference,
-                "cancellationReasonId": cancellation_reason.code,
-                },
-            )
-        response.raise_for_status()
-        return response.json()
+        return url, data
+
+
+    def _cancel_booking_request(
+            self,
+            booking_reference: str,
+            cancellation_reason: CancellationReason,
+            restaurant_name: str | None = None,
+        ):
+        url = f"{self._booking_url(booking_reference, restaurant_name)}/Cancel"
+        data = {
+            "micrositeName": restaurant_name or self.restaurant_name,
+            "bookingReference": booking_reference,
+            "cancellationReasonId": cancellation_reason.code,
+        }
+        return url, data
 
 
-    # Helper Functions
     def _customer_to_dict(self, customer: Customer):
         data = {}
         if customer.title is not None:
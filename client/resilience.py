@@ -0,0 +1,149 @@
+from collections import deque
+from contextlib import contextmanager
+import random
+import threading
+import time
+from typing import Iterator, NamedTuple
+
+import httpx
+import requests
+
+
+# Gateway errors are worth retrying; a 500 usually means the request itself is at fault
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class Timeout(NamedTuple):
+    connect: float
+    read: float
+
+    def httpx(self) -> httpx.Timeout:
+        return httpx.Timeout(connect=self.connect, read=self.read, write=self.read, pool=self.connect)
+
+
+DEFAULT_TIMEOUTS = {
+    "AvailabilitySearch": Timeout(3.05, 10.0),
+    "BookingWithStripeToken": Timeout(3.05, 30.0),
+    "Booking": Timeout(3.05, 10.0),
+    "UpdateBooking": Timeout(3.05, 20.0),
+    "Cancel": Timeout(3.05, 20.0),
+}
+
+
+def http_status(error: BaseException) -> int | None:
+    response = getattr(error, "response", None)
+    return None if response is None else response.status_code
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    return http_status(error) in RETRYABLE_STATUSES
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    # Anything but a 5xx or a dead connection is an answer, so a 404 keeps the circuit closed
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    status = http_status(error)
+    return status is not None and status >= 500
+
+
+class RetryPolicy:
+    def __init__(self, attempts: int = 3, base_delay: float = 0.1, max_delay: float = 2.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter keeps clients that failed together from retrying together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+        self.rejections = 0
+
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        self._before_call()
+        try:
+            yield
+        except Exception as e:
+            self._record(not is_upstream_failure(e))
+            raise
+        except BaseException:
+            # Cancelled, e.g. a hedge that lost the race: no verdict either way
+            self._release()
+            raise
+        else:
+            self._record(True)
+
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            # Once the reset timeout passes, a single probe request decides whether to close again
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return
+            self.rejections += 1
+        raise CircuitOpenError("Booking API circuit is open")
+
+
+    def _record(self, success: bool):
+        with self._lock:
+            self._probing = False
+            if success:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+    def _release(self):
+        with self._lock:
+            self._probing = False
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
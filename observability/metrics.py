@@ -0,0 +1,221 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+from typing import Callable, Iterator
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Label values -> (per-bucket counts, sum, count)
+        self._values: dict[tuple[str, ...], list] = {}
+
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return 0 if series is None else series[2]
+
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Callback(_Metric):
+    # Reads a value owned elsewhere (cache sizes, session counts) at scrape time
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            type: str,
+            read: Callable[[], dict[tuple[str, ...], float]],
+            labelnames: tuple[str, ...] = (),
+        ):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.read = read
+
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self.read().items()
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames))
+
+
+    def callback(
+            self,
+            name: str,
+            documentation: str,
+            type: str,
+            read: Callable[[], dict[tuple[str, ...], float]],
+            labelnames: tuple[str, ...] = (),
+        ) -> Callback:
+        return self.register(Callback(name, documentation, type, read, labelnames))
+
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+NODE_SECONDS = REGISTRY.histogram(
+    "booking_agent_node_seconds", "Latency of booking agent graph nodes.", ("node",)
+)
+NODE_ERRORS = REGISTRY.counter(
+    "booking_agent_node_errors_total", "Booking agent graph nodes that raised.", ("node",)
+)
+INTENTS = REGISTRY.counter(
+    "booking_agent_intents_total", "Parsed user intents.", ("intent",)
+)
+PARSE_PATHS = REGISTRY.counter(
+    "booking_agent_parse_total", "Messages parsed by the local rules, a single-slot LLM prompt or the full LLM prompt.", ("path",)
+)
+BOOKING_API_SECONDS = REGISTRY.histogram(
+    "booking_api_request_seconds", "Latency of booking API requests.", ("endpoint",)
+)
+BOOKING_API_REQUESTS = REGISTRY.counter(
+    "booking_api_requests_total", "Booking API requests by response status.", ("endpoint", "status")
+)
+BOOKING_API_RETRIES = REGISTRY.counter(
+    "booking_api_retries_total", "Booking API reads retried after a transient failure.", ("endpoint",)
+)
+BOOKING_API_HEDGES = REGISTRY.counter(
+    "booking_api_hedged_total", "Slow booking API reads raced with a duplicate request.", ("endpoint",)
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "llm_request_seconds", "Latency of language model calls.", ("model",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Language model tokens used.", ("model", "kind")
+)
+LLM_CASCADE_SECONDS = REGISTRY.histogram(
+    "llm_cascade_seconds", "Latency of cascaded prompts by the tier that answered them.", ("tier",)
+)
+LLM_ESCALATIONS = REGISTRY.counter(
+    "llm_cascade_escalations_total", "Prompts escalated from the small to the large model.", ("reason",)
+)
@@ -0,0 +1,253 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, Token
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from typing import ContextManager, Iterator
+
+
+# perf_counter has the resolution for durations, and this offset places its readings on the wall clock
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+class _Trace:
+    def __init__(self, trace_id: str, session_id: str | None, sampled: bool):
+        self.trace_id = trace_id
+        self.session_id = session_id
+        self.sampled = sampled
+        self.spans: list["Span"] = []
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+
+    def add(self, span: "Span"):
+        with self._lock:
+            # Background work that outlives its request, such as a prefetch, is not exported
+            if not self.closed:
+                self.spans.append(span)
+
+
+    def close(self) -> list["Span"]:
+        with self._lock:
+            self.closed = True
+            return list(self.spans)
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "thread_id", "attributes", "error")
+
+    def __init__(self, trace: _Trace, name: str, parent_id: int | None, attributes: dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = next(trace._ids)
+        self.parent_id = parent_id
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes
+        self.error = None
+
+
+    @property
+    def seconds(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+
+    def finish(self, error: BaseException | None = None):
+        self.end_ns = time.perf_counter_ns()
+        if error is not None:
+            self.error = type(error).__name__
+        self.trace.add(self)
+
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+
+
+def start_span(name: str, **attributes) -> Span | None:
+    # A span that is not made current, for work that yields to its caller, such as a stream
+    parent = _current.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+
+_NOT_TRACED = nullcontext()
+
+
+def span(name: str, **attributes) -> ContextManager[Span | None]:
+    # Outside a recorded trace this costs one context variable lookup, and no generator
+    child = start_span(name, **attributes)
+    if child is None:
+        return _NOT_TRACED
+    return _activate(child)
+
+
+@contextmanager
+def _activate(child: Span) -> Iterator[Span]:
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.finish(e)
+        raise
+    else:
+        child.finish()
+    finally:
+        _reset(token)
+
+
+def annotate(**attributes):
+    current = _current.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+class Tracer:
+    def __init__(self, exporter=None, sample_rate: float = 0.0, slow_seconds: float | None = None):
+        self.configure(exporter, sample_rate, slow_seconds)
+
+        self.exported = 0
+
+
+    def configure(self, exporter=None, sample_rate: float = 0.0, slow_seconds: float | None = None):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        # When set every trace is recorded, and those this slow are exported whether sampled or not
+        self.slow_seconds = slow_seconds
+
+
+    @contextmanager
+    def trace(self, name: str, session_id: str | None = None, **attributes) -> Iterator[Span | None]:
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if self.exporter is None or not (sampled or self.slow_seconds is not None):
+            yield None
+            return
+        root = Span(_Trace(os.urandom(8).hex(), session_id, sampled), name, None, attributes)
+        token = _current.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.finish(e)
+            raise
+        else:
+            root.finish()
+        finally:
+            _reset(token)
+            spans = root.trace.close()
+            if sampled or root.seconds >= self.slow_seconds:
+                self.exported += 1
+                self.exporter.export(spans)
+
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+            self.exporter = None
+
+
+class _FileExporter(ABC):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() == 0:
+            self._file.write(self._header())
+
+
+    def export(self, spans: list[Span]):
+        lines = "".join(self._format(spans))
+        with self._lock:
+            # One write and flush per request, so a crash loses at most the request in flight
+            self._file.write(lines)
+            self._file.flush()
+
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+    def _header(self) -> str:
+        return ""
+
+
+    @abstractmethod
+    def _format(self, spans: list[Span]) -> Iterator[str]:
+        pass
+
+
+class JsonLinesExporter(_FileExporter):
+    def _format(self, spans: list[Span]) -> Iterator[str]:
+        for span in spans:
+            yield json.dumps({
+                "trace_id": span.trace.trace_id,
+                "session_id": span.trace.session_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "start": (span.start_ns + _EPOCH_OFFSET_NS) / 1e9,
+                "seconds": span.seconds,
+                "thread_id": span.thread_id,
+                "attributes": span.attributes,
+                "error": span.error,
+            }, default=str) + "\n"
+
+
+class ChromeTraceExporter(_FileExporter):
+    # Trace Event Format as a JSON array, whose closing bracket is optional, so events can be appended
+    # and the file opened at any time in Perfetto, chrome://tracing or speedscope
+    def _header(self) -> str:
+        return "[\n"
+
+
+    def _format(self, spans: list[Span]) -> Iterator[str]:
+        if not spans:
+            return
+        trace = spans[0].trace
+        root = next((span for span in spans if span.parent_id is None), spans[0])
+        # Each request gets its own row, named after its route, trace and session, and keyed by its trace id
+        # so that rows stay apart when a restarted process appends to the same file
+        pid = os.getpid()
+        lane = int(trace.trace_id[:7], 16)
+        yield json.dumps({
+            "ph": "M", "name": "thread_name", "pid": pid, "tid": lane,
+            "args": {"name": f"{root.name} {trace.trace_id} session={trace.session_id}"},
+        }) + ",\n"
+        for span in spans:
+            args = {"trace_id": trace.trace_id, "session_id": trace.session_id, "span_id": span.span_id, **span.attributes}
+            if span.error is not None:
+                args["error"] = span.error
+            yield json.dumps({
+                "ph": "X",
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ts": (span.start_ns + _EPOCH_OFFSET_NS) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": lane,
+                "args": args,
+            }, default=str) + ",\n"
+
+
+def create_exporter(path: str) -> _FileExporter:
+    if path.endswith(".jsonl"):
+        return JsonLinesExporter(path)
+    return ChromeTraceExporter(path)
+
+
+def _reset(token: Token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # An async generator closed from another context, as when a stream's client disconnects,
+        # cannot reset it; that context is being discarded anyway
+        pass
+
+
+TRACER = Tracer()
@@ -1,19 +1,116 @@
-from datetime import date, time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
 
+from httpx import HTTPStatusError
 from requests.exceptions import HTTPError
 
 from client.booking_client import BookingClient
 from client.model.customer import Customer
 from client.model.cancallation_reason import CancellationReason
 from services import exceptions
+from services.cache import TTLCache
+from services.slot_index import SlotIndex
 
 
 class BookingService:
-    def __init__(self, client: BookingClient):
+    def __init__(
+            self,
+            client: BookingClient,
+            availability_cache: TTLCache | None = None,
+            booking_cache: TTLCache | None = None,
+            slot_index: SlotIndex | None = None,
+            max_concurrency: int = 8,
+            max_range_days: int = 31,
+        ):
         self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_range_days = max_range_days
+        if availability_cache is None:
+            availability_cache = TTLCache(max_size=1024, ttl=30.0)
+        self.availability_cache = availability_cache
+        # (restaurant, booking reference) -> booking details, kept current by this service's own writes
+        if booking_cache is None:
+            booking_cache = TTLCache(max_size=4096, ttl=60.0)
+        self.booking_cache = booking_cache
+        # Every search's slots, for nearest-time and earliest-date questions; as fresh as the cache
+        if slot_index is None:
+            slot_index = SlotIndex(ttl=availability_cache.ttl)
+        self.slot_index = slot_index
+        # Booking reference -> visit date, so updates and cancellations know which date to invalidate
+        self._booking_dates = TTLCache(max_size=4096, ttl=24 * 60 * 60)
     
-    def check_availability(self, visit_date: date, party_size: int):
-        return self.client.check_availability(visit_date, party_size)
+    def check_availability(self, visit_date: date, party_size: int, restaurant_name: str | None = None):
+        key = self._availability_key(visit_date, party_size, restaurant_name)
+        response = self.availability_cache.get(key)
+        if response is None:
+            generation = self.availability_cache.generation
+            index_generation = self.slot_index.generation
+            response = self.client.check_availability(visit_date, party_size, restaurant_name=restaurant_name)
+            self.availability_cache.set(key, response, generation)
+            self.slot_index.record(key[0], visit_date, party_size, response, index_generation)
+        return response
+
+
+    def cached_availability(self, visit_date: date, party_size: int, restaurant_name: str | None = None):
+        # Only what an earlier search left in the cache; never calls the booking API
+        return self.availability_cache.get(self._availability_key(visit_date, party_size, restaurant_name))
+
+
+    def nearest_slots(
+            self,
+            visit_date: date,
+            party_size: int,
+            visit_time: time,
+            limit: int = 3,
+            restaurant_name: str | None = None,
+        ) -> list[time]:
+        if not self.slot_index.has(self._restaurant_name(restaurant_name), visit_date, party_size):
+            generation = self.slot_index.generation
+            response = self.check_availability(visit_date, party_size, restaurant_name)
+            self._index_day(visit_date, party_size, response, generation, restaurant_name)
+        return self.slot_index.nearest(
+            self._restaurant_name(restaurant_name), visit_date, party_size, visit_time, limit
+        ) or []
+
+
+    def earliest_slot(
+            self,
+            start: date,
+            end: date,
+            party_size: int,
+            near: time | None = None,
+            restaurant_name: str | None = None,
+        ) -> tuple[date, time] | None:
+        # Searches a day at a time and stops at the first with room
+        for visit_date in self._visit_dates(start, end):
+            if not self.slot_index.has(self._restaurant_name(restaurant_name), visit_date, party_size):
+                generation = self.slot_index.generation
+                response = self.check_availability(visit_date, party_size, restaurant_name)
+                self._index_day(visit_date, party_size, response, generation, restaurant_name)
+            found = self.slot_index.earliest(self._restaurant_name(restaurant_name), [visit_date], party_size, near)
+            if found is not None:
+                return found
+        return None
+
+
+    def check_availability_range(
+            self,
+            start: date,
+            end: date,
+            party_size: int,
+            time_window: tuple[time, time] | None = None,
+            restaurant_name: str | None = None,
+        ):
+        visit_dates = self._visit_dates(start, end)
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(visit_dates))) as executor:
+            responses = list(executor.map(
+                lambda visit_date: self.check_availability(visit_date, party_size, restaurant_name),
+                visit_dates,
+            ))
+        return self._merge_availability(
+            start, end, party_size, visit_dates, responses, time_window, restaurant_name
+        )
 
 
     def make_booking(
@@ -24,22 +121,36 @@ class BookingService:
             special_requests: str | None = None,
             is_leave_time_confirmed: bool = None,
             customer: Customer | None = None,
+            restaurant_name: str | None = None,
         ):
-        return self.client.make_booking(
-            visit_date,
-            visit_time,
-            party_size,
-            special_requests,
-            is_leave_time_confirmed,
-            customer
-        )
+        try:
+            response = self.client.make_booking(
+                visit_date,
+                visit_time,
+                party_size,
+                special_requests,
+                is_leave_time_confirmed,
+                customer,
+                restaurant_name=restaurant_name,
+            )
+        finally:
+            self._invalidate_availability(restaurant_name, visit_date)
+        self._remember_booking_date(response, restaurant_name)
+        return response
 
 
-    def get_booking_details(self, booking_reference: str):
-        try:
-            return self.client.get_booking_details(booking_reference)
-        except HTTPError as e:
-            raise exceptions.BookingNotFoundError() from e
+    def get_booking_details(self, booking_reference: str, restaurant_name: str | None = None):
+        key = self._booking_key(booking_reference, restaurant_name)
+        response = self.booking_cache.get(key)
+        if response is None:
+            generation = self.booking_cache.generation
+            try:
+                response = self.client.get_booking_details(booking_reference, restaurant_name=restaurant_name)
+            except HTTPError as e:
+                raise exceptions.BookingNotFoundError() from e
+            self.booking_cache.set(key, response, generation)
+            self._remember_booking_date(response, restaurant_name)
+        return response
 
 
     def update_booking(
@@ -50,25 +161,371 @@ class BookingService:
         party_size: int | None = None,
         special_requests: str | None = None,
         is_leave_time_confirmed: bool | None = None,
+        restaurant_name: str | None = None,
     ):
+        key = self._booking_key(booking_reference, restaurant_name)
+        cached = self.booking_cache.pop(key)
         try:
-            return self.client.update_booking(
+            response = self.client.update_booking(
                 booking_reference,
                 visit_date,
                 visit_time,
                 party_size,
                 special_requests,
-                is_leave_time_confirmed
+                is_leave_time_confirmed,
+                restaurant_name=restaurant_name,
             )
         except HTTPError as e:
             raise exceptions.BookingNotFoundError() from e
+        finally:
+            self._invalidate_booking(booking_reference, restaurant_name, visit_date)
+        self._refresh_booking(key, cached, response.get("updates"), restaurant_name)
+        return response
 
 
-    def cancel_booking(self, booking_reference: str, cancellation_reason: CancellationReason):
+    def cancel_booking(
+            self,
+            booking_reference: str,
+            cancellation_reason: CancellationReason,
+            restaurant_name: str | None = None,
+        ):
+        key = self._booking_key(booking_reference, restaurant_name)
+        cached = self.booking_cache.pop(key)
         try:
-            return self.client.cancel_booking(booking_reference, cancellation_reason)
+            response = self.client.cancel_booking(
+                booking_reference, cancellation_reason, restaurant_name=restaurant_name
+            )
         except HTTPError as e:
             raise exceptions.BookingNotFoundError() from e
+        finally:
+            self._invalidate_booking(booking_reference, restaurant_name)
+        self._refresh_booking(key, cached, {"status": response.get("status", "cancelled")}, restaurant_name)
+        return response
+
+
+    # Async API
+    async def acheck_availability(self, visit_date: date, party_size: int, restaurant_name: str | None = None):
+        key = self._availability_key(visit_date, party_size, restaurant_name)
+        response = self.availability_cache.get(key)
+        if response is None:
+            generation = self.availability_cache.generation
+            index_generation = self.slot_index.generation
+            response = await self.client.acheck_availability(visit_date, party_size, restaurant_name=restaurant_name)
+            self.availability_cache.set(key, response, generation)
+            self.slot_index.record(key[0], visit_date, party_size, response, index_generation)
+        return response
+
+
+    async def anearest_slots(
+            self,
+            visit_date: date,
+            party_size: int,
+            visit_time: time,
+            limit: int = 3,
+            restaurant_name: str | None = None,
+        ) -> list[time]:
+        if not self.slot_index.has(self._restaurant_name(restaurant_name), visit_date, party_size):
+            generation = self.slot_index.generation
+            response = await self.acheck_availability(visit_date, party_size, restaurant_name)
+            self._index_day(visit_date, party_size, response, generation, restaurant_name)
+        return self.slot_index.nearest(
+            self._restaurant_name(restaurant_name), visit_date, party_size, visit_time, limit
+        ) or []
+
+
+    async def aearliest_slot(
+            self,
+            start: date,
+            end: date,
+            party_size: int,
+            near: time | None = None,
+            restaurant_name: str | None = None,
+        ) -> tuple[date, time] | None:
+        # Days not yet indexed are searched together, then the index answers in one pass
+        visit_dates = self._visit_dates(start, end)
+        restaurant = self._restaurant_name(restaurant_name)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def index(visit_date: date):
+            async with semaphore:
+                generation = self.slot_index.generation
+                response = await self.acheck_availability(visit_date, party_size, restaurant_name)
+            self._index_day(visit_date, party_size, response, generation, restaurant_name)
+
+        await asyncio.gather(*(
+            index(visit_date) for visit_date in visit_dates
+            if not self.slot_index.has(restaurant, visit_date, party_size)
+        ))
+        return self.slot_index.earliest(restaurant, visit_dates, party_size, near)
+
+
+    async def acheck_availability_range(
+            self,
+            start: date,
+            end: date,
+            party_size: int,
+            time_window: tuple[time, time] | None = None,
+            restaurant_name: str | None = None,
+        ):
+        visit_dates = self._visit_dates(start, end)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def check(visit_date: date):
+            async with semaphore:
+                return await self.acheck_availability(visit_date, party_size, restaurant_name)
+
+        responses = await asyncio.gather(*(check(visit_date) for visit_date in visit_dates))
+        return self._merge_availability(
+            start, end, party_size, visit_dates, responses, time_window, restaurant_name
+        )
+
+
+    async def amake_booking(
+            self,
+            visit_date: date,
+            visit_time: time,
+            party_size: int,
+            special_requests: str | None = None,
+            is_leave_time_confirmed: bool = None,
+            customer: Customer | None = None,
+            restaurant_name: str | None = None,
+        ):
+        try:
+            response = await self.client.amake_booking(
+                visit_date,
+                visit_time,
+                party_size,
+                special_requests,
+                is_leave_time_confirmed,
+                customer,
+                restaurant_name=restaurant_name,
+            )
+        finally:
+            self._invalidate_availability(restaurant_name, visit_date)
+        self._remember_booking_date(response, restaurant_name)
+        return response
+
+
+    async def aget_booking_details(self, booking_reference: str, restaurant_name: str | None = None):
+        key = self._booking_key(booking_reference, restaurant_name)
+        response = self.booking_cache.get(key)
+        if response is None:
+            generation = self.booking_cache.generation
+            try:
+                response = await self.client.aget_booking_details(booking_reference, restaurant_name=restaurant_name)
+            except HTTPStatusError as e:
+                raise exceptions.BookingNotFoundError() from e
+            self.booking_cache.set(key, response, generation)
+            self._remember_booking_date(response, restaurant_name)
+        return response
+
+
+    async def aupdate_booking(
+        self,
+        booking_reference: str,
+        visit_date: date | None = None,
+        visit_time: time | None = None,
+        party_size: int | None = None,
+        special_requests: str | None = None,
+        is_leave_time_confirmed: bool | None = None,
+        restaurant_name: str | None = None,
+    ):
+        key = self._booking_key(booking_reference, restaurant_name)
+        cached = self.booking_cache.pop(key)
+        try:
+            response = await self.client.aupdate_booking(
+                booking_reference,
+                visit_date,
+                visit_time,
+                party_size,
+                special_requests,
+                is_leave_time_confirmed,
+                restaurant_name=restaurant_name,
+            )
+        except HTTPStatusError as e:
+            raise exceptions.BookingNotFoundError() from e
+        finally:
+            self._invalidate_booking(booking_reference, restaurant_name, visit_date)
+        self._refresh_booking(key, cached, response.get("updates"), restaurant_name)
+        return response
+
+
+    async def acancel_booking(
+            self,
+            booking_reference: str,
+            cancellation_reason: CancellationReason,
+            restaurant_name: str | None = None,
+        ):
+        key = self._booking_key(booking_reference, restaurant_name)
+        cached = self.booking_cache.pop(key)
+        try:
+            response = await self.client.acancel_booking(
+                booking_reference, cancellation_reason, restaurant_name=restaurant_name
+            )
+        except HTTPStatusError as e:
+            raise exceptions.BookingNotFoundError() from e
+        finally:
+            self._invalidate_booking(booking_reference, restaurant_name)
+        self._refresh_booking(key, cached, {"status": response.get("status", "cancelled")}, restaurant_name)
+        return response
+
+
+    # Helper Functions
+    def _visit_dates(self, start: date, end: date) -> list[date]:
+        days = (end - start).days + 1
+        if days < 1:
+            raise ValueError("The end date must not be before the start date")
+        if days > self.max_range_days:
+            raise ValueError(f"Date ranges are limited to {self.max_range_days} days")
+        return [start + timedelta(days=offset) for offset in range(days)]
+
+
+    def _merge_availability(
+            self,
+            start: date,
+            end: date,
+            party_size: int,
+            visit_dates: list[date],
+            responses: list[dict],
+            time_window: tuple[time, time] | None = None,
+            restaurant_name: str | None = None,
+        ):
+        available_slots = []
+        for visit_date, response in zip(visit_dates, responses):
+            for slot in response.get("available_slots", []):
+                if time_window is not None:
+                    slot_time = time.fromisoformat(slot.get("time"))
+                    if not time_window[0] <= slot_time <= time_window[1]:
+                        continue
+                available_slots.append({"visit_date": visit_date, **slot})
+        return {
+            "restaurant": restaurant_name or self.client.restaurant_name,
+            "start_date": start,
+            "end_date": end,
+            "party_size": party_size,
+            "available_slots": available_slots,
+            "total_slots": len(available_slots),
+        }
+
+
+    def _restaurant_name(self, restaurant_name: str | None = None) -> str:
+        return restaurant_name or self.client.restaurant_name
+
+
+    def _index_day(
+            self,
+            visit_date: date,
+            party_size: int,
+            response: dict,
+            generation: int,
+            restaurant_name: str | None = None,
+        ):
+        # A search served from the cache was indexed when fetched, unless the index has since let it go or
+        # holds a search for a larger party; the generation keeps out a search that raced a booking write
+        restaurant = self._restaurant_name(restaurant_name)
+        if not self.slot_index.has(restaurant, visit_date, party_size):
+            self.slot_index.record(restaurant, visit_date, party_size, response, generation)
+
+
+    def _availability_key(self, visit_date: date, party_size: int, restaurant_name: str | None = None):
+        return restaurant_name or self.client.restaurant_name, visit_date, party_size
+
+
+    def _booking_key(self, booking_reference: str, restaurant_name: str | None = None):
+        return restaurant_name or self.client.restaurant_name, booking_reference
+
+
+    def _refresh_booking(
+            self,
+            key: tuple[str, str],
+            cached: dict | None,
+            changes: dict | None,
+            restaurant_name: str | None = None,
+        ):
+        # Evicted before the write and again after it, so a lookup that raced the write is never kept;
+        # details already known are patched from the write's response instead of fetched again
+        self.booking_cache.pop(key)
+        if cached is None or not isinstance(changes, dict):
+            return
+        changes = _as_fetched(cached, changes)
+        if changes is None:
+            # The next lookup fetches the booking, revalidated against its ETag
+            return
+        booking = {**cached, **changes}
+        self.booking_cache.set(key, booking)
+        self._remember_booking_date(booking, restaurant_name)
+
+
+    def _invalidate_availability(self, restaurant_name: str | None = None, visit_date: date | None = None):
+        restaurant_name = restaurant_name or self.client.restaurant_name
+        self.slot_index.invalidate(restaurant_name, visit_date)
+        if visit_date is None:
+            self.availability_cache.invalidate(lambda key: key[0] == restaurant_name)
+        else:
+            self.availability_cache.invalidate(
+                lambda key: key[0] == restaurant_name and key[1] == visit_date
+            )
+
+
+    def _invalidate_booking(
+            self,
+            booking_reference: str,
+            restaurant_name: str | None = None,
+            new_visit_date: date | None = None,
+        ):
+        # Without a known date for the booking, drop every cached date for the restaurant
+        restaurant_name = restaurant_name or self.client.restaurant_name
+        old_visit_date = self._booking_dates.pop((restaurant_name, booking_reference))
+        self._invalidate_availability(restaurant_name, old_visit_date)
+        if new_visit_date is not None and old_visit_date is not None:
+            self._invalidate_availability(restaurant_name, new_visit_date)
+
+
+    def _remember_booking_date(self, response: dict, restaurant_name: str | None = None):
+        booking_reference = response.get("booking_reference")
+        visit_date = response.get("visit_date")
+        if booking_reference is None or visit_date is None:
+            return
+        if isinstance(visit_date, str):
+            visit_date = date.fromisoformat(visit_date)
+        restaurant_name = restaurant_name or self.client.restaurant_name
+        self._booking_dates.set((restaurant_name, booking_reference), visit_date)
+
+
+def _as_fetched(cached: dict, changes: dict) -> dict | None:
+    # A write echoes its form-encoded values, such as "4" for a party size; each is given the type and format
+    # the lookup returned for that field, or None if any cannot be, so the cache never serves a body a GET would not
+    fetched = {}
+    for field, value in changes.items():
+        if field not in cached:
+            return None
+        current = cached[field]
+        try:
+            if value is None or current is None or type(value) is type(current):
+                pass
+            elif isinstance(current, bool):
+                value = {"true": True, "false": False}[str(value).lower()]
+            elif isinstance(current, int):
+                value = int(value)
+            else:
+                return None
+            if isinstance(value, str) and isinstance(current, str) and value != current:
+                value = _iso_like(current, value)
+        except (KeyError, ValueError):
+            return None
+        fetched[field] = value
+    return fetched
+
+
+def _iso_like(current: str, value: str) -> str:
+    # Dates and times are written back in the lookup's format, e.g. "20:00" becomes "20:00:00"
+    for parse in (date.fromisoformat, time.fromisoformat):
+        try:
+            parse(current)
+        except ValueError:
+            continue
+        return parse(value).isoformat()
+    return value
 
 
 if __name__ == "__main__":
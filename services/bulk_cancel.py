@@ -0,0 +1,266 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from enum import Enum
+import os
+import threading
+import time
+from typing import Callable, Iterable
+
+from pydantic import BaseModel
+
+from client.model.cancallation_reason import CancellationReason
+from client.resilience import RetryPolicy, http_status, is_transient
+from services import exceptions
+from services.booking_service import BookingService
+from services.rate_limiter import RateLimiter
+
+
+class CancelStatus(Enum):
+    CANCELLED = "cancelled"
+    ALREADY_CANCELLED = "already_cancelled"
+    NOT_FOUND = "not_found"
+    OUT_OF_RANGE = "out_of_range"
+    FAILED = "failed"
+
+
+class CancelOutcome(BaseModel):
+    booking_reference: str
+    status: CancelStatus
+    error: str | None = None
+
+
+class BulkCancelReport(BaseModel):
+    total: int
+    resumed: int = 0
+    counts: dict[str, int] = {}
+    failures: dict[str, str] = {}
+
+
+class _Checkpoint:
+    # One JSON line per finished reference, flushed as it lands, so a killed job resumes where it stopped
+    def __init__(self, path: str | None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+
+    def load(self) -> dict[str, CancelOutcome]:
+        outcomes = {}
+        if self.path is None or not os.path.exists(self.path):
+            return outcomes
+        with open(self.path) as checkpoint:
+            for line in checkpoint:
+                try:
+                    outcome = CancelOutcome.model_validate_json(line)
+                except ValueError:
+                    # A line cut short by the crash being resumed from
+                    continue
+                outcomes[outcome.booking_reference] = outcome
+        return outcomes
+
+
+    def write(self, outcome: CancelOutcome):
+        if self.path is None:
+            return
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a")
+            self._file.write(outcome.model_dump_json() + "\n")
+            self._file.flush()
+
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class BulkCanceller:
+    def __init__(
+            self,
+            booking_service: BookingService,
+            max_workers: int = 8,
+            rate: float = 10.0,
+            retry_policy: RetryPolicy | None = None,
+        ):
+        self.booking_service = booking_service
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate, burst=max_workers)
+        # Cancelling twice is harmless, so unlike a conversational cancellation this job retries it.
+        # Date range lookups are not retried here, as the booking client already retries its reads
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy(attempts=3, base_delay=0.5)
+
+
+    def run(
+            self,
+            booking_references: Iterable[str],
+            cancellation_reason: CancellationReason,
+            visit_dates: tuple[date, date] | None = None,
+            restaurant_name: str | None = None,
+            checkpoint_path: str | None = None,
+            on_progress: Callable[[int, int, CancelOutcome], None] | None = None,
+        ) -> BulkCancelReport:
+        checkpoint = _Checkpoint(checkpoint_path)
+        finished = {
+            reference: outcome for reference, outcome in checkpoint.load().items()
+            if outcome.status != CancelStatus.FAILED
+        }
+        booking_references = list(dict.fromkeys(booking_references))
+        pending = [reference for reference in booking_references if reference not in finished]
+        outcomes = [finished[reference] for reference in booking_references if reference in finished]
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self._cancel, reference, cancellation_reason, visit_dates, restaurant_name
+                    )
+                    for reference in pending
+                ]
+                for future in as_completed(futures):
+                    outcome = future.result()
+                    checkpoint.write(outcome)
+                    outcomes.append(outcome)
+                    if on_progress is not None:
+                        on_progress(len(outcomes), len(booking_references), outcome)
+        finally:
+            checkpoint.close()
+
+        report = BulkCancelReport(total=len(booking_references), resumed=len(booking_references) - len(pending))
+        for outcome in outcomes:
+            report.counts[outcome.status.value] = report.counts.get(outcome.status.value, 0) + 1
+            if outcome.status == CancelStatus.FAILED:
+                report.failures[outcome.booking_reference] = outcome.error
+        return report
+
+
+    # Helper Functions
+    def _cancel(
+            self,
+            booking_reference: str,
+            cancellation_reason: CancellationReason,
+            visit_dates: tuple[date, date] | None = None,
+            restaurant_name: str | None = None,
+        ) -> CancelOutcome:
+        try:
+            status = None
+            if visit_dates is not None:
+                status = self._skip(booking_reference, visit_dates, restaurant_name)
+            if status is None:
+                status = self._cancel_with_retries(booking_reference, cancellation_reason, restaurant_name)
+        except Exception as e:
+            error = _cause(e)
+            if http_status(error) == 404:
+                return CancelOutcome(booking_reference=booking_reference, status=CancelStatus.NOT_FOUND)
+            return CancelOutcome(
+                booking_reference=booking_reference,
+                status=CancelStatus.FAILED,
+                error=str(error) or type(error).__name__,
+            )
+        return CancelOutcome(booking_reference=booking_reference, status=status)
+
+
+    def _skip(
+            self,
+            booking_reference: str,
+            visit_dates: tuple[date, date],
+            restaurant_name: str | None = None,
+        ) -> CancelStatus | None:
+        # The booking API cannot list bookings by date, so a date range filters the given references
+        self.rate_limiter.acquire()
+        booking = self.booking_service.get_booking_details(booking_reference, restaurant_name=restaurant_name)
+        if booking.get("status") == "cancelled":
+            return CancelStatus.ALREADY_CANCELLED
+        visit_date = booking.get("visit_date")
+        if not visit_date:
+            # Without a date the booking cannot be placed in the range, so it is reported rather than cancelled
+            raise ValueError("Booking has no visit date to check against the date range")
+        if isinstance(visit_date, str):
+            visit_date = date.fromisoformat(visit_date)
+        if not visit_dates[0] <= visit_date <= visit_dates[1]:
+            return CancelStatus.OUT_OF_RANGE
+        return None
+
+
+    def _cancel_with_retries(
+            self,
+            booking_reference: str,
+            cancellation_reason: CancellationReason,
+            restaurant_name: str | None = None,
+        ) -> CancelStatus:
+        for attempt in range(self.retry_policy.attempts):
+            try:
+                self.rate_limiter.acquire()
+                self.booking_service.cancel_booking(
+                    booking_reference, cancellation_reason, restaurant_name=restaurant_name
+                )
+                return CancelStatus.CANCELLED
+            except Exception as e:
+                if attempt + 1 == self.retry_policy.attempts or not is_transient(_cause(e)):
+                    raise
+            time.sleep(self.retry_policy.delay(attempt))
+
+
+def _cause(error: Exception) -> BaseException:
+    # The service reports every HTTP error as not found; the cause tells them apart
+    if isinstance(error, exceptions.BookingNotFoundError) and error.__cause__ is not None:
+        return error.__cause__
+    return error
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from dotenv import load_dotenv
+
+    from client.booking_client import BookingClient
+
+    parser = argparse.ArgumentParser(description="Cancel many bookings, e.g. for a closure or bad weather.")
+    parser.add_argument("references", nargs="*", help="booking references to cancel")
+    parser.add_argument("--references-file", help="file with one booking reference per line")
+    parser.add_argument(
+        "--reason",
+        choices=[reason.name for reason in CancellationReason],
+        default=CancellationReason.RESTAURANT_CLOSURE.name,
+    )
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="only cancel visits on or after this date")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="only cancel visits on or before this date")
+    parser.add_argument("--restaurant", help="microsite name, if not the default")
+    parser.add_argument("--checkpoint", help="JSON lines file recording progress; rerun with it to resume")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10.0, help="booking API calls per second")
+    args = parser.parse_args()
+
+    references = list(args.references)
+    if args.references_file:
+        with open(args.references_file) as references_file:
+            references.extend(line.strip() for line in references_file if line.strip())
+    if not references:
+        parser.error("no booking references given")
+    visit_dates = None
+    if args.start or args.end:
+        visit_dates = (args.start or date.min, args.end or date.max)
+
+    load_dotenv()
+    client = BookingClient(
+        base_url=os.environ.get("BOOKING_API_BASE_URL"),
+        bearer_token=os.environ.get("BEARER_TOKEN"),
+        restaurant_name=os.environ.get("DEFAULT_RESTAURANT_NAME", "TheHungryUnicorn"),
+    )
+    canceller = BulkCanceller(BookingService(client), max_workers=args.workers, rate=args.rate)
+
+    def progress(done: int, total: int, outcome: CancelOutcome):
+        print(f"[{done}/{total}] {outcome.booking_reference}: {outcome.status.value}", file=sys.stderr)
+
+    report = canceller.run(
+        references,
+        CancellationReason[args.reason],
+        visit_dates=visit_dates,
+        restaurant_name=args.restaurant,
+        checkpoint_path=args.checkpoint,
+        on_progress=progress,
+    )
+    print(report.model_dump_json(indent=2))
+    sys.exit(1 if report.failures else 0)
@@ -0,0 +1,220 @@
+import asyncio
+import csv
+from datetime import date, time
+from enum import Enum
+import json
+from typing import Callable, Iterable, Iterator
+
+from pydantic import BaseModel, Field, ValidationError
+
+from client.booking_client import RESTAURANT_NAME_PATTERN
+from client.model.customer import Customer
+from client.resilience import http_status
+from services.booking_service import BookingService
+
+
+class BookingRow(BaseModel):
+    visit_date: date
+    visit_time: time
+    party_size: int = Field(gt=0)
+    special_requests: str | None = None
+    is_leave_time_confirmed: bool | None = None
+    customer: Customer | None = None
+    restaurant_name: str | None = Field(None, pattern=RESTAURANT_NAME_PATTERN.pattern)
+
+
+ROW_FIELDS = frozenset(BookingRow.model_fields) - {"customer"}
+CUSTOMER_FIELDS = frozenset(Customer.model_fields)
+
+
+class ImportStatus(Enum):
+    BOOKED = "booked"
+    INVALID = "invalid"
+    FAILED = "failed"
+
+
+class ImportResult(BaseModel):
+    row: int
+    status: ImportStatus
+    booking_reference: str | None = None
+    error: str | None = None
+
+
+class ImportReport(BaseModel):
+    rows: int = 0
+    booked: int = 0
+    invalid: int = 0
+    failed: int = 0
+
+
+def read_rows(path: str) -> Iterator[dict | str]:
+    # Yields one row at a time; NDJSON lines are parsed later so a bad line fails only its own row
+    if path.endswith(".csv"):
+        with open(path, newline="") as rows:
+            yield from csv.DictReader(rows)
+    else:
+        with open(path) as rows:
+            for line in rows:
+                if line.strip():
+                    yield line
+
+
+def parse_row(raw: dict | str) -> BookingRow:
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError("Row is not a JSON object")
+    values = {
+        key.strip(): value.strip() if isinstance(value, str) else value
+        for key, value in raw.items() if key is not None
+    }
+    values = {key: value for key, value in values.items() if value not in ("", None)}
+    # Spreadsheets have flat customer columns; NDJSON may nest them under "customer"
+    customer = values.get("customer") or {key: values[key] for key in CUSTOMER_FIELDS & values.keys()}
+    row = {key: values[key] for key in ROW_FIELDS & values.keys()}
+    return BookingRow.model_validate({**row, "customer": customer or None})
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+        )
+    status = http_status(error)
+    if status is not None:
+        return f"HTTP {status}"
+    return str(error) or type(error).__name__
+
+
+class _ResultsWriter:
+    COLUMNS = ("row", "status", "booking_reference", "error")
+
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="")
+        self._csv = csv.DictWriter(self._file, self.COLUMNS) if path.endswith(".csv") else None
+        if self._csv is not None:
+            self._csv.writeheader()
+
+
+    def write(self, result: ImportResult):
+        if self._csv is not None:
+            self._csv.writerow(result.model_dump(mode="json"))
+        else:
+            self._file.write(result.model_dump_json() + "\n")
+        self._file.flush()
+
+
+    def close(self):
+        self._file.close()
+
+
+class BulkImporter:
+    def __init__(self, booking_service: BookingService, max_in_flight: int = 16):
+        self.booking_service = booking_service
+        self.max_in_flight = max_in_flight
+
+
+    async def run(
+            self,
+            rows: Iterable[dict | str],
+            results_path: str,
+            restaurant_name: str | None = None,
+            on_progress: Callable[[ImportReport, ImportResult], None] | None = None,
+        ) -> ImportReport:
+        report = ImportReport()
+        writer = _ResultsWriter(results_path)
+        # Rows are only read while a slot is free, so memory stays flat however long the file is
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+
+        def record(result: ImportResult):
+            writer.write(result)
+            report.rows += 1
+            setattr(report, result.status.value, getattr(report, result.status.value) + 1)
+            if on_progress is not None:
+                on_progress(report, result)
+
+        async def book(row_number: int, row: BookingRow):
+            try:
+                record(await self._book(row_number, row, restaurant_name))
+            finally:
+                slots.release()
+
+        try:
+            for row_number, raw in enumerate(rows, start=1):
+                try:
+                    row = parse_row(raw)
+                except ValueError as e:
+                    record(ImportResult(row=row_number, status=ImportStatus.INVALID, error=_describe(e)))
+                    continue
+                await slots.acquire()
+                task = asyncio.create_task(book(row_number, row))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            # Bookings already sent must record their reference, or a rerun would book them twice
+            await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+        return report
+
+
+    # Helper Functions
+    async def _book(self, row_number: int, row: BookingRow, restaurant_name: str | None = None) -> ImportResult:
+        # Bookings are not idempotent, so a failed row is reported rather than retried
+        try:
+            response = await self.booking_service.amake_booking(
+                row.visit_date,
+                row.visit_time,
+                row.party_size,
+                row.special_requests,
+                row.is_leave_time_confirmed,
+                row.customer,
+                restaurant_name=row.restaurant_name or restaurant_name,
+            )
+        except Exception as e:
+            return ImportResult(row=row_number, status=ImportStatus.FAILED, error=_describe(e))
+        return ImportResult(
+            row=row_number,
+            status=ImportStatus.BOOKED,
+            booking_reference=response.get("booking_reference"),
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+
+    from dotenv import load_dotenv
+
+    from client.booking_client import BookingClient
+
+    parser = argparse.ArgumentParser(description="Import group and event bookings from a CSV or NDJSON file.")
+    parser.add_argument("path", help="a .csv file with a header row, or one JSON object per line")
+    parser.add_argument("--results", required=True, help="results file, written as CSV if it ends in .csv, else NDJSON")
+    parser.add_argument("--restaurant", help="microsite for rows without a restaurant_name")
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = BookingClient(
+        base_url=os.environ.get("BOOKING_API_BASE_URL"),
+        bearer_token=os.environ.get("BEARER_TOKEN"),
+        restaurant_name=os.environ.get("DEFAULT_RESTAURANT_NAME", "TheHungryUnicorn"),
+    )
+    importer = BulkImporter(BookingService(client), max_in_flight=args.max_in_flight)
+
+    def progress(report: ImportReport, result: ImportResult):
+        if report.rows % 100 == 0 or result.status != ImportStatus.BOOKED:
+            print(f"[{report.rows}] row {result.row}: {result.status.value} {result.error or ''}", file=sys.stderr)
+
+    async def main() -> ImportReport:
+        try:
+            return await importer.run(read_rows(args.path), args.results, args.restaurant, progress)
+        finally:
+            await client.aclose()
+
+    report = asyncio.run(main())
+    print(report.model_dump_json(indent=2))
+    sys.exit(1 if report.invalid or report.failed else 0)
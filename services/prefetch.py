@@ -0,0 +1,214 @@
+import asyncio
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Hashable
+
+from services.booking_service import BookingService
+
+
+class AvailabilityPrefetcher:
+    # Searches availability while the customer is still choosing a time, so the answer is usually cached by then
+    def __init__(
+            self,
+            booking_service: BookingService,
+            max_per_session: int = 2,
+            max_in_flight: int = 256,
+            wait: float = 0.5,
+        ):
+        self.booking_service = booking_service
+        self.max_per_session = max_per_session
+        self.max_in_flight = max_in_flight
+        self.wait = wait
+        # Session id -> in-flight searches by availability key, oldest first
+        self._tasks: dict[str | None, OrderedDict[tuple, asyncio.Task]] = {}
+
+        self.started = 0
+        self.joined = 0
+        self.skipped = 0
+        self.cancelled = 0
+        self.used = 0
+
+
+    def prefetch(
+            self,
+            session_id: str | None,
+            visit_date: date,
+            party_size: int,
+            restaurant_name: str | None = None,
+        ) -> asyncio.Task | None:
+        key = (restaurant_name, visit_date, party_size)
+        tasks = self._tasks.get(session_id, {})
+        if key in tasks:
+            self.joined += 1
+            tasks.move_to_end(key)
+            return tasks[key]
+        if self.booking_service.cached_availability(visit_date, party_size, restaurant_name) is not None:
+            return None
+        if sum(len(tasks) for tasks in self._tasks.values()) >= self.max_in_flight:
+            # Speculative work must never add more than a bounded load to the booking API
+            self.skipped += 1
+            return None
+        # Only sessions with a search in flight have an entry, so skipped and cached requests leave nothing behind
+        tasks = self._tasks.setdefault(session_id, OrderedDict())
+        while len(tasks) >= self.max_per_session:
+            # The customer has moved on to another date or party size
+            _, oldest = tasks.popitem(last=False)
+            self._cancel(oldest)
+
+        task = asyncio.ensure_future(
+            self.booking_service.acheck_availability(visit_date, party_size, restaurant_name=restaurant_name)
+        )
+        task.add_done_callback(lambda task: self._done(session_id, key, task))
+        tasks[key] = task
+        self.started += 1
+        return task
+
+
+    async def availability(
+            self,
+            session_id: str | None,
+            visit_date: date,
+            party_size: int,
+            restaurant_name: str | None = None,
+        ) -> dict | None:
+        # A prefetched or cached search result, waiting briefly for one in flight; None rather than a new search
+        task = self._tasks.get(session_id, {}).get((restaurant_name, visit_date, party_size))
+        if task is not None:
+            done, _ = await asyncio.wait({task}, timeout=self.wait)
+            if task not in done or task.cancelled() or task.exception() is not None:
+                return None
+            self.used += 1
+            return task.result()
+        return self.cached(visit_date, party_size, restaurant_name)
+
+
+    def cached(self, visit_date: date, party_size: int, restaurant_name: str | None = None) -> dict | None:
+        response = self.booking_service.cached_availability(visit_date, party_size, restaurant_name)
+        if response is not None:
+            self.used += 1
+        return response
+
+
+    def cancel(self, session_id: str | None):
+        for task in self._tasks.pop(session_id, {}).values():
+            self._cancel(task)
+
+
+    def close(self):
+        for session_id in list(self._tasks):
+            self.cancel(session_id)
+
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": sum(len(tasks) for tasks in self._tasks.values()),
+            "started": self.started,
+            "joined": self.joined,
+            "skipped": self.skipped,
+            "cancelled": self.cancelled,
+            "used": self.used,
+        }
+
+
+    # Helper Functions
+    def _cancel(self, task: asyncio.Task):
+        if not task.done():
+            task.cancel()
+            self.cancelled += 1
+
+
+    def _done(self, session_id: str | None, key: tuple, task: asyncio.Task):
+        tasks = self._tasks.get(session_id)
+        if tasks is not None and tasks.get(key) is task:
+            del tasks[key]
+            if not tasks:
+                del self._tasks[session_id]
+        if not task.cancelled():
+            # A failed prefetch costs nothing; the booking turn searches or books as usual
+            task.exception()
+
+
+class EarlyReads:
+    # Booking API reads started while a turn is still being parsed, each taken by the node the turn routes to
+    def __init__(self, max_in_flight: int = 256, keep: float = 5.0):
+        self.max_in_flight = max_in_flight
+        # How long a finished read waits to be taken, should the turn have routed elsewhere
+        self.keep = keep
+        # Session id -> the read's key and task; a session has one turn, and so one early read, at a time
+        self._reads: dict[str | None, tuple[Hashable, asyncio.Task]] = {}
+
+        self.started = 0
+        self.skipped = 0
+        self.used = 0
+        self.wasted = 0
+
+
+    def start(
+            self,
+            session_id: str | None,
+            key: Hashable,
+            read: Callable[[], Awaitable[Any]],
+        ) -> asyncio.Task | None:
+        self._discard(session_id)
+        if len(self._reads) >= self.max_in_flight:
+            self.skipped += 1
+            return None
+        task = asyncio.ensure_future(read())
+        task.add_done_callback(lambda task: self._done(session_id, task))
+        self._reads[session_id] = (key, task)
+        self.started += 1
+        return task
+
+
+    def take(self, session_id: str | None, key: Hashable) -> asyncio.Task | None:
+        # The read if it is the one this state needs; a read for a different turn or state is dropped
+        read = self._reads.pop(session_id, None)
+        if read is None:
+            return None
+        if read[0] != key:
+            self._drop(read[1])
+            return None
+        self.used += 1
+        return read[1]
+
+
+    def close(self):
+        for session_id in list(self._reads):
+            self._discard(session_id)
+
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._reads),
+            "started": self.started,
+            "skipped": self.skipped,
+            "used": self.used,
+            "wasted": self.wasted,
+        }
+
+
+    # Helper Functions
+    def _discard(self, session_id: str | None):
+        read = self._reads.pop(session_id, None)
+        if read is not None:
+            self._drop(read[1])
+
+
+    def _drop(self, task: asyncio.Task):
+        self.wasted += 1
+        task.cancel()
+
+
+    def _done(self, session_id: str | None, task: asyncio.Task):
+        if task.cancelled():
+            return
+        # A failed read is raised again to the node that takes it
+        task.exception()
+        asyncio.get_running_loop().call_later(self.keep, self._expire, session_id, task)
+
+
+    def _expire(self, session_id: str | None, task: asyncio.Task):
+        read = self._reads.get(session_id)
+        if read is not None and read[1] is task:
+            del self._reads[session_id]
+            self.wasted += 1
@@ -0,0 +1,190 @@
+from array import array
+from bisect import bisect_left
+from datetime import date, time
+import threading
+import time as timer
+from typing import Iterable
+
+
+class _Day:
+    # One restaurant-date: slot start minutes, sorted, and the largest party each slot can still take
+    __slots__ = ("minutes", "capacity", "best", "party_size", "sized", "expires_at")
+
+    def __init__(self, minutes: array, capacity: bytearray, party_size: int, sized: bool, expires_at: float):
+        self.minutes = minutes
+        self.capacity = capacity
+        self.best = max(capacity, default=0)
+        # The party the search was for; a slot it was turned down for may still take a smaller one
+        self.party_size = party_size
+        # Whether every open slot gave its max_party_size; otherwise only the party searched for is known to fit
+        self.sized = sized
+        self.expires_at = expires_at
+
+
+    def answers(self, party_size: int | None) -> bool:
+        if party_size is None or party_size == self.party_size:
+            return True
+        return party_size > self.party_size and self.sized
+
+
+    def times(self, party_size: int, near: time | None = None, limit: int | None = None) -> list[time]:
+        # Walks outwards from the target, so only the slots returned (and the full ones between) are visited
+        if party_size > self.best:
+            return []
+        if near is None:
+            found = [index for index, capacity in enumerate(self.capacity) if capacity >= party_size]
+            return [_time(self.minutes[index]) for index in found[:limit]]
+        target = near.hour * 60 + near.minute
+        after = bisect_left(self.minutes, target)
+        before = after - 1
+        found = []
+        while (limit is None or len(found) < limit) and (before >= 0 or after < len(self.minutes)):
+            # Ties go to the earlier slot
+            if after >= len(self.minutes) or (
+                before >= 0 and target - self.minutes[before] <= self.minutes[after] - target
+            ):
+                index, before = before, before - 1
+            else:
+                index, after = after, after + 1
+            if self.capacity[index] >= party_size:
+                found.append(self.minutes[index])
+        return [_time(minute) for minute in found]
+
+
+class SlotIndex:
+    def __init__(self, ttl: float = 30.0, max_days: int = 4096):
+        self.ttl = ttl
+        self.max_days = max_days
+        self._days: dict[tuple[str, date], _Day] = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a search that raced a booking write is not indexed
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+
+    def record(
+            self,
+            restaurant_name: str,
+            visit_date: date,
+            party_size: int,
+            response: dict,
+            generation: int | None = None,
+        ):
+        slots = {}
+        sized = True
+        for slot in response.get("available_slots", []):
+            slot_time = slot.get("time")
+            if isinstance(slot_time, str):
+                try:
+                    slot_time = time.fromisoformat(slot_time)
+                except ValueError:
+                    # The search itself is still answered; only this slot goes unindexed
+                    continue
+            if not isinstance(slot_time, time):
+                continue
+            # A slot that turned this search down may be full or merely too small, so it counts as full,
+            # and an open one without a max_party_size is only known to take the party searched for
+            capacity = 0
+            if slot.get("available"):
+                capacity = min(slot.get("max_party_size") or party_size, 255)
+                sized = sized and bool(slot.get("max_party_size"))
+            slots[slot_time.hour * 60 + slot_time.minute] = capacity
+        minutes = sorted(slots)
+        day = _Day(
+            array("H", minutes), bytearray(slots[minute] for minute in minutes), party_size, sized,
+            timer.monotonic() + self.ttl,
+        )
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._days.pop((restaurant_name, visit_date), None)
+            self._days[(restaurant_name, visit_date)] = day
+            while len(self._days) > self.max_days:
+                del self._days[next(iter(self._days))]
+
+
+    def has(self, restaurant_name: str, visit_date: date, party_size: int | None = None) -> bool:
+        # Whether the index can answer for this party, or for any party when none is given
+        return self._day(restaurant_name, visit_date, party_size, count=False) is not None
+
+
+    def nearest(
+            self,
+            restaurant_name: str,
+            visit_date: date,
+            party_size: int,
+            near: time,
+            limit: int = 1,
+        ) -> list[time] | None:
+        # None when the date is not indexed, as opposed to [] when it is fully booked
+        day = self._day(restaurant_name, visit_date, party_size)
+        if day is None:
+            return None
+        return day.times(party_size, near, limit)
+
+
+    def earliest(
+            self,
+            restaurant_name: str,
+            visit_dates: Iterable[date],
+            party_size: int,
+            near: time | None = None,
+        ) -> tuple[date, time] | None:
+        # The first indexed date with room, at its earliest slot or the one nearest to near
+        for visit_date in visit_dates:
+            day = self._day(restaurant_name, visit_date, party_size)
+            if day is None:
+                continue
+            times = day.times(party_size, near, 1)
+            if times:
+                return visit_date, times[0]
+        return None
+
+
+    def invalidate(self, restaurant_name: str, visit_date: date | None = None):
+        with self._lock:
+            self.generation += 1
+            if visit_date is not None:
+                self._days.pop((restaurant_name, visit_date), None)
+                return
+            for key in [key for key in self._days if key[0] == restaurant_name]:
+                del self._days[key]
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "days": len(self._days),
+                "max_days": self.max_days,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+    # Helper Functions
+    def _day(
+            self,
+            restaurant_name: str,
+            visit_date: date,
+            party_size: int | None = None,
+            count: bool = True,
+        ) -> _Day | None:
+        with self._lock:
+            day = self._days.get((restaurant_name, visit_date))
+            if day is not None and day.expires_at <= timer.monotonic():
+                del self._days[(restaurant_name, visit_date)]
+                day = None
+            if day is not None and not day.answers(party_size):
+                day = None
+            if count:
+                if day is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return day
+
+
+def _time(minute: int) -> time:
+    return time(minute // 60, minute % 60)
@@ -0,0 +1,436 @@
+import asyncio
+from datetime import date
+
+import httpx
+from langgraph.errors import NodeCancelledError
+import pytest
+import requests
+
+from agents.booking_agent import BookingAgent
+from agents.utils.nodes import extraction_problem
+from agents.utils.state import BookingState, Intent
+from ai.cascade_llm import CascadingLanguageModel
+from ai.langauge_model import LanguageModel
+from client.resilience import CircuitOpenError
+from observability import metrics
+from services import exceptions
+from services.booking_service import BookingService
+
+
+class FakeLanguageModel(LanguageModel):
+    def __init__(self, response: str):
+        self.response = response
+
+    def chat(self, prompt: str) -> str:
+        return self.response
+
+
+class QueuedLanguageModel(LanguageModel):
+    def __init__(self, *responses: str):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def chat(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+
+class StreamedLanguageModel(LanguageModel):
+    def __init__(self, events: list, *chunks: str):
+        self.events = events
+        self.chunks = chunks
+
+    def chat(self, prompt: str) -> str:
+        return "".join(self.chunks)
+
+    async def astream(self, prompt: str):
+        for index, chunk in enumerate(self.chunks):
+            self.events.append(f"chunk {index}")
+            yield chunk
+            await asyncio.sleep(0)
+
+
+@pytest.fixture
+def fake_service(mocker):
+    service = mocker.Mock()
+    availability = {
+        "available_slots": [
+            {"time": "12:00:00", "available": True},
+            {"time": "12:30:00", "available": False},
+        ]
+    }
+    service.check_availability.return_value = availability
+    service.acheck_availability = mocker.AsyncMock(return_value=availability)
+    return service
+
+
+def test_ainvoke_uses_async_service(fake_service):
+    llm = FakeLanguageModel(
+        '{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-06", "party_size": 2}'
+    )
+    agent = BookingAgent(fake_service, llm)
+
+    state = BookingState(message="Any tables on 6 August for 2?")
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state)))
+
+    assert state.intent == Intent.CHECK_AVAILABILITY
+    assert state.visit_date == date(2025, 8, 6)
+    assert "12:00:00" in state.response
+    assert "12:30:00" not in state.response
+    fake_service.acheck_availability.assert_awaited_once_with(date(2025, 8, 6), 2, restaurant_name=None)
+    fake_service.check_availability.assert_not_called()
+
+
+def test_invoke_uses_sync_service(fake_service):
+    llm = FakeLanguageModel(
+        '{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-06", "party_size": 2}'
+    )
+    agent = BookingAgent(fake_service, llm)
+
+    state = BookingState(**agent.graph.invoke(BookingState(message="Tables?")))
+
+    assert "12:00:00" in state.response
+    fake_service.check_availability.assert_called_once_with(date(2025, 8, 6), 2, restaurant_name=None)
+    fake_service.acheck_availability.assert_not_called()
+
+
+def test_missing_field_is_requested():
+    llm = FakeLanguageModel('{"intent": "MAKE_BOOKING", "party_size": 4}')
+    agent = BookingAgent(None, llm)
+
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(BookingState(message="Book for 4"))))
+
+    assert state.response == "Please provide visit date."
+    assert state.pending_field == "visit_date"
+
+
+def test_reply_to_missing_field_uses_slot_prompt(fake_service):
+    llm = QueuedLanguageModel('{"visit_date": "2025-08-06", "party_size": 9}')
+    agent = BookingAgent(fake_service, llm)
+    state = BookingState(
+        intent=Intent.CHECK_AVAILABILITY,
+        party_size=2,
+        pending_field="visit_date",
+        response="Please provide visit date.",
+        message="The sixth of August, please",
+    )
+
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state)))
+
+    assert len(llm.prompts) == 1
+    assert '"visit_date": "YYYY-MM-DD" | null' in llm.prompts[0]
+    assert '"customer"' not in llm.prompts[0]
+    assert state.visit_date == date(2025, 8, 6)
+    assert state.party_size == 2
+    assert state.pending_field is None
+    assert "12:00:00" in state.response
+
+
+def test_reply_that_does_not_answer_falls_back_to_full_prompt(fake_service):
+    llm = QueuedLanguageModel("{}", '{"customer": {"first_name": "John", "surname": "Smith"}}')
+    agent = BookingAgent(fake_service, llm)
+    state = BookingState(
+        intent=Intent.MAKE_BOOKING,
+        pending_field="visit_date",
+        response="Please provide visit date.",
+        message="It's under John Smith",
+    )
+
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state)))
+
+    assert len(llm.prompts) == 2
+    assert "Possible intents" in llm.prompts[1]
+    assert state.customer.first_name == "John"
+    assert state.response == "Please provide visit date."
+    assert state.pending_field == "visit_date"
+
+
+def test_date_range_uses_range_search(mocker):
+    service = mocker.Mock()
+    service.acheck_availability_range = mocker.AsyncMock(return_value={
+        "available_slots": [
+            {"visit_date": date(2025, 8, 9), "time": "19:00:00", "available": True},
+            {"visit_date": date(2025, 8, 10), "time": "18:00:00", "available": True},
+        ]
+    })
+    llm = FakeLanguageModel(
+        '{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-09",'
+        ' "visit_date_end": "2025-08-10", "party_size": 6}'
+    )
+    agent = BookingAgent(service, llm)
+
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(BookingState(message="This weekend for 6?"))))
+
+    service.acheck_availability_range.assert_awaited_once_with(
+        date(2025, 8, 9), date(2025, 8, 10), 6, restaurant_name=None
+    )
+    assert state.response == (
+        "The restaurant has availability on 2025-08-09 at 19:00:00; on 2025-08-10 at 18:00:00."
+    )
+
+
+def test_trivial_message_skips_llm(mocker, fake_service):
+    llm = FakeLanguageModel("{}")
+    chat = mocker.spy(llm, "chat")
+    fake_service.acancel_booking = mocker.AsyncMock(return_value={"status": "cancelled"})
+    agent = BookingAgent(fake_service, llm)
+
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(BookingState(message="cancel booking 32P21VR"))))
+
+    chat.assert_not_called()
+    assert state.intent == Intent.CANCEL_BOOKING
+    assert state.booking_reference == "32P21VR"
+    assert agent.preparser.stats()["fast_path"] == 1
+
+
+def test_astream_reports_node_progress(fake_service):
+    llm = FakeLanguageModel(
+        '{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-06", "party_size": 2}'
+    )
+    agent = BookingAgent(fake_service, llm)
+
+    async def collect():
+        return [
+            chunk["progress"]
+            async for chunk in agent.graph.astream(BookingState(message="Tables?"), stream_mode="custom")
+        ]
+
+    assert asyncio.run(collect()) == ["Reading your message…", "Checking availability…"]
+
+
+def test_nodes_and_intents_are_measured(fake_service):
+    llm = FakeLanguageModel(
+        '{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-06", "party_size": 2}'
+    )
+    agent = BookingAgent(fake_service, llm)
+    node_count = metrics.NODE_SECONDS.count(node="check_availability")
+    intent_count = metrics.INTENTS.value(intent="CHECK_AVAILABILITY")
+
+    asyncio.run(agent.graph.ainvoke(BookingState(message="Tables?")))
+
+    assert metrics.NODE_SECONDS.count(node="check_availability") == node_count + 1
+    assert metrics.INTENTS.value(intent="CHECK_AVAILABILITY") == intent_count + 1
+
+
+def test_time_question_lists_prefetched_availability_and_booking_reuses_it(mocker):
+    client = mocker.Mock()
+    client.restaurant_name = "fake-restaurant"
+    client.acheck_availability = mocker.AsyncMock(return_value={
+        "available_slots": [
+            {"time": "18:00:00", "available": True},
+            {"time": "19:00:00", "available": False},
+            {"time": "20:00:00", "available": True},
+        ]
+    })
+    client.amake_booking = mocker.AsyncMock(return_value={"status": "confirmed", "booking_reference": "ABC1234"})
+    llm = QueuedLanguageModel('{"visit_time": "19:00:00"}', '{"visit_time": "20:00:00"}')
+    agent = BookingAgent(BookingService(client), llm)
+    config = {"configurable": {"session_id": "session"}}
+
+    async def turns():
+        state = BookingState(
+            intent=Intent.MAKE_BOOKING, visit_date=date(2025, 8, 6), party_size=2, message="Book it"
+        )
+        states = [BookingState(**await agent.graph.ainvoke(state, config=config))]
+        for message in ("Seven in the evening", "Eight then"):
+            state = states[-1].model_copy(update={"message": message})
+            states.append(BookingState(**await agent.graph.ainvoke(state, config=config)))
+        return states
+
+    asked, rejected, booked = asyncio.run(turns())
+
+    assert asked.response == "Please provide visit time. Available times on 2025-08-06 are: 18:00:00, 20:00:00."
+    assert rejected.response.startswith("Sorry, 19:00:00 is not available on 2025-08-06.")
+    assert rejected.pending_field == "visit_time"
+    assert "ABC1234" in booked.response
+    client.acheck_availability.assert_awaited_once()
+    client.amake_booking.assert_awaited_once()
+
+
+def test_nearest_slot_question_is_answered_from_index(mocker):
+    client = mocker.Mock()
+    client.restaurant_name = "fake-restaurant"
+    client.acheck_availability = mocker.AsyncMock(return_value={"available_slots": [
+        {"time": "19:00:00", "available": True, "max_party_size": 8},
+        {"time": "20:00:00", "available": False, "max_party_size": 8},
+        {"time": "20:30:00", "available": True, "max_party_size": 8},
+    ]})
+    llm = FakeLanguageModel(
+        '{"intent": "FIND_NEAREST_SLOT", "visit_date": "2025-08-06", "visit_time": "20:00:00", "party_size": 4}'
+    )
+    agent = BookingAgent(BookingService(client), llm)
+
+    state = BookingState(message="What's the closest time to 8pm on the 6th for 4 of us?")
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state)))
+
+    assert state.response == "The closest times to 20:00:00 on 2025-08-06 for 4 are: 20:30:00, 19:00:00."
+
+
+def test_booking_lookup_starts_while_the_completion_is_still_streaming(mocker):
+    events = []
+
+    async def aget_booking_details(booking_reference, restaurant_name=None):
+        events.append("lookup")
+        return {"booking_reference": booking_reference, "status": "confirmed"}
+
+    service = mocker.Mock()
+    service.aget_booking_details = mocker.AsyncMock(side_effect=aget_booking_details)
+    llm = StreamedLanguageModel(
+        events,
+        '{"intent": "GET_BOOKING_DETAILS", ',
+        '"booking_reference": "ABC1234", ',
+        '"visit_date": null, "party_size": null, ',
+        '"customer": null}',
+    )
+    agent = BookingAgent(service, llm)
+
+    state = BookingState(message="Can you show me booking ABC1234 please")
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state, config={"configurable": {"session_id": "s"}})))
+
+    assert events == ["chunk 0", "chunk 1", "lookup", "chunk 2", "chunk 3"]
+    assert "ABC1234" in state.response
+    # The node took over the read started during parsing rather than repeating it
+    service.aget_booking_details.assert_awaited_once_with("ABC1234", restaurant_name=None)
+    assert agent.early_reads.stats()["used"] == 1
+
+
+def test_booking_lookup_starts_while_a_cascade_judges_the_small_answer(mocker):
+    events = []
+
+    async def aget_booking_details(booking_reference, restaurant_name=None):
+        events.append("lookup")
+        return {"booking_reference": booking_reference, "status": "confirmed"}
+
+    service = mocker.Mock()
+    service.aget_booking_details = mocker.AsyncMock(side_effect=aget_booking_details)
+    small = StreamedLanguageModel(
+        events,
+        '{"intent": "GET_BOOKING_DETAILS", ',
+        '"booking_reference": "ABC1234", ',
+        '"customer": null}',
+    )
+    llm = CascadingLanguageModel(small, FakeLanguageModel("{}"), extraction_problem)
+    agent = BookingAgent(service, llm)
+
+    state = BookingState(message="Can you show me booking ABC1234 please")
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state, config={"configurable": {"session_id": "s"}})))
+
+    assert events == ["chunk 0", "chunk 1", "lookup", "chunk 2"]
+    assert "ABC1234" in state.response
+    service.aget_booking_details.assert_awaited_once_with("ABC1234", restaurant_name=None)
+    assert agent.early_reads.stats()["used"] == 1
+
+
+def test_escalated_answer_replaces_a_read_started_on_the_draft(mocker):
+    service = mocker.Mock()
+    service.aget_booking_details = mocker.AsyncMock(
+        side_effect=lambda booking_reference, restaurant_name=None: {"booking_reference": booking_reference}
+    )
+    # The small model misreads the reference and then breaks off, so the cascade asks the large one
+    small = StreamedLanguageModel([], '{"intent": "GET_BOOKING_DETAILS", ', '"booking_reference": "ABC1284", "vis')
+    large = FakeLanguageModel('{"intent": "GET_BOOKING_DETAILS", "booking_reference": "ABC1234"}')
+    llm = CascadingLanguageModel(small, large, extraction_problem)
+    agent = BookingAgent(service, llm)
+
+    state = BookingState(message="Can you show me booking ABC1234 please")
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state, config={"configurable": {"session_id": "s"}})))
+
+    assert "ABC1234" in state.response
+    assert [call.args[0] for call in service.aget_booking_details.await_args_list] == ["ABC1284", "ABC1234"]
+    assert agent.early_reads.stats()["used"] == 1
+
+
+def test_failed_availability_search_apologises(fake_service):
+    fake_service.acheck_availability.side_effect = RuntimeError("boom")
+    fake_service.check_availability.side_effect = RuntimeError("boom")
+    llm = FakeLanguageModel('{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-06", "party_size": 2}')
+    agent = BookingAgent(fake_service, llm)
+
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(BookingState(message="Tables on 6 August for 2?"))))
+    sync_state = BookingState(**agent.graph.invoke(BookingState(message="Tables on 6 August for 2?")))
+
+    assert state.response == sync_state.response == "Sorry, I could not check availability just now. Please try again."
+
+
+def test_booking_api_error_that_is_not_transient_is_not_hidden(mocker):
+    service = mocker.Mock()
+    service.amake_booking = mocker.AsyncMock(side_effect=ValueError("bad form"))
+    service.cached_availability.return_value = None
+    llm = FakeLanguageModel('{"intent": "MAKE_BOOKING", "visit_date": "2025-08-06", "visit_time": "19:00:00", "party_size": 2}')
+    agent = BookingAgent(service, llm)
+
+    with pytest.raises(ValueError):
+        asyncio.run(agent.graph.ainvoke(BookingState(message="Please do it")))
+
+
+def test_cancelled_availability_search_cancels_the_turn(fake_service):
+    fake_service.acheck_availability.side_effect = asyncio.CancelledError()
+    llm = FakeLanguageModel('{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-06", "party_size": 2}')
+    agent = BookingAgent(fake_service, llm)
+
+    # The graph reports the cancelled node rather than reply to a turn nobody is waiting for
+    with pytest.raises((asyncio.CancelledError, NodeCancelledError)):
+        asyncio.run(agent.graph.ainvoke(BookingState(message="Tables on 6 August for 2?")))
+
+
+def _bad_gateway() -> exceptions.BookingNotFoundError:
+    # As the service reports it: every HTTP error on a reference becomes not found
+    request = httpx.Request("GET", "https://api.example/Booking/ABC1234")
+    error = exceptions.BookingNotFoundError()
+    error.__cause__ = httpx.HTTPStatusError("502", request=request, response=httpx.Response(502, request=request))
+    return error
+
+
+@pytest.mark.parametrize("response, method", [
+    ('{"intent": "GET_BOOKING_DETAILS", "booking_reference": "ABC1234"}', "aget_booking_details"),
+    ('{"intent": "CANCEL_BOOKING", "booking_reference": "ABC1234"}', "acancel_booking"),
+    ('{"intent": "MAKE_BOOKING", "visit_date": "2025-08-06", "visit_time": "19:00:00", "party_size": 2}', "amake_booking"),
+])
+@pytest.mark.parametrize("error", [
+    CircuitOpenError,
+    lambda: httpx.ReadTimeout("timed out"),
+    requests.ConnectionError,
+    _bad_gateway,
+])
+def test_unavailable_booking_api_asks_the_customer_to_try_again(mocker, response, method, error):
+    service = mocker.Mock()
+    service.cached_availability.return_value = None
+    setattr(service, method, mocker.AsyncMock(side_effect=error()))
+    agent = BookingAgent(service, FakeLanguageModel(response))
+
+    state = BookingState(message="Please do it")
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state)))
+
+    assert "try again shortly" in state.response
+
+
+def test_malformed_field_is_asked_for_again(fake_service):
+    llm = FakeLanguageModel('{"intent": "CHECK_AVAILABILITY", "visit_date": "next Friday", "party_size": 2, "visit_time": 7pm}')
+    agent = BookingAgent(fake_service, llm)
+
+    state = BookingState(message="Any tables next Friday for 2?")
+    state = BookingState(**asyncio.run(agent.graph.ainvoke(state)))
+
+    assert state.intent == Intent.CHECK_AVAILABILITY
+    assert state.party_size == 2
+    assert state.response == "Please provide visit date."
+    fake_service.acheck_availability.assert_not_awaited()
+
+
+@pytest.mark.parametrize("response, problem", [
+    ('{"intent": "MAKE_BOOKING", "visit_date": "2025-08-06", "party_size": 2}', None),
+    ('{"visit_time": "19:00:00"}', None),
+    ("{}", None),
+    ('{"intent": "GET_BOOKING_DETAILS", "booking_reference": "ABC1234",\n}', None),
+    ('```json\n{"intent": "CHECK_AVAILABILITY", "party_size": 2}\n```', None),
+    ("I could not find a date", "invalid_json"),
+    ('{"intent": "MAKE_BOOKING", "party_size": 2', "invalid_json"),
+    ('{"intent": "MAKE_BOOKING", "party_size": }', "invalid_json"),
+    ('{"intent": null, "party_size": 2}', "no_intent"),
+    ('{"intent": "BOOK_TABLE"}', "invalid_fields"),
+    ('{"intent": "MAKE_BOOKING", "visit_date": "6th August"}', "invalid_fields"),
+    ('{"visit_time": "7pm"}', "invalid_fields"),
+    ('{"intent": "MAKE_BOOKING", "customer": {"email": "john at example"}}', "invalid_fields"),
+])
+def test_extraction_problem(response, problem):
+    assert extraction_problem(response) == problem
@@ -0,0 +1,44 @@
+import pytest
+
+from agents.utils.json_stream import JsonFieldStream
+
+
+def test_fields_complete_as_their_values_end():
+    stream = JsonFieldStream()
+    text = '```json\n{"intent": "GET_BOOKING_DETAILS", "booking_reference": "ABC1234", "party_size": 4}\n```'
+
+    completed = [stream.feed(text[index:index + 5]) for index in range(0, len(text), 5)]
+
+    assert [fields for fields in completed if fields] == [
+        {"intent": "GET_BOOKING_DETAILS"}, {"booking_reference": "ABC1234"}, {"party_size": 4},
+    ]
+    assert stream.complete
+
+
+def test_nested_values_and_strings_may_hold_delimiters():
+    stream = JsonFieldStream()
+
+    stream.feed('{"special_requests": "window, {quiet} \\"please\\"", ')
+    stream.feed('"customer": {"first_name": "Ada", "tags": [1, {"a": "}"}]},\n}')
+
+    assert stream.fields == {
+        "special_requests": 'window, {quiet} "please"',
+        "customer": {"first_name": "Ada", "tags": [1, {"a": "}"}]},
+    }
+    assert stream.complete
+
+
+@pytest.mark.parametrize("text, fields, invalid, complete", [
+    ('{"intent": "MAKE_BOOKING", "party_size": four, "visit_time": "19:00:00"}',
+     {"intent": "MAKE_BOOKING", "visit_time": "19:00:00"}, ["party_size"], True),
+    ('{"intent": "MAKE_BOOKING", "party_size": 4', {"intent": "MAKE_BOOKING", "party_size": 4}, [], False),
+    ('{"intent": "MAKE_BOOKING", "visit_date": "2025-', {"intent": "MAKE_BOOKING"}, [], False),
+    ("Sorry, I can't help with that.", {}, [], False),
+])
+def test_partial_objects_keep_the_fields_that_decoded(text, fields, invalid, complete):
+    stream = JsonFieldStream()
+    stream.feed(text)
+
+    assert stream.close() == fields
+    assert stream.invalid == invalid
+    assert stream.complete == complete
@@ -0,0 +1,86 @@
+from datetime import date
+
+import pytest
+
+from agents.utils.preparser import PreParser
+from agents.utils.state import Intent
+
+
+TODAY = date(2025, 8, 6)  # A Wednesday
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("cancel booking 32P21VR", {"intent": "CANCEL_BOOKING", "booking_reference": "32P21VR"}),
+    ("Show my booking details for ABC1234 please", {
+        "intent": "GET_BOOKING_DETAILS", "booking_reference": "ABC1234",
+    }),
+    ("I want to book a table for 4 tomorrow at 7pm", {
+        "intent": "MAKE_BOOKING", "party_size": 4, "visit_date": "2025-08-07", "visit_time": "19:00:00",
+    }),
+    ("Any availability next Wednesday for two?", {
+        "intent": "CHECK_AVAILABILITY", "party_size": 2, "visit_date": "2025-08-13",
+    }),
+    ("is there a table free on friday for 6 people", {
+        "intent": "CHECK_AVAILABILITY", "party_size": 6, "visit_date": "2025-08-08",
+    }),
+    ("book 2025-08-20 at 19:30 for 3", {
+        "intent": "MAKE_BOOKING", "party_size": 3, "visit_date": "2025-08-20", "visit_time": "19:30:00",
+    }),
+    ("earliest table for 4 tomorrow", {
+        "intent": "FIND_NEAREST_SLOT", "party_size": 4, "visit_date": "2025-08-07",
+    }),
+    ("hello!", {}),
+])
+def test_confident_messages(message, expected):
+    assert PreParser().parse(message, today=TODAY) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "I'd like to book for John Smith, window seat",
+    "what do you recommend?",
+    "tomorrow",
+    "3",
+])
+def test_unsure_messages_fall_back_to_llm(message):
+    assert PreParser().parse(message, today=TODAY) is None
+
+
+def test_follow_up_answers_use_conversation_intent():
+    preparser = PreParser()
+
+    assert preparser.parse("tomorrow at noon", Intent.MAKE_BOOKING, today=TODAY) == {
+        "visit_date": "2025-08-07", "visit_time": "12:00:00",
+    }
+    assert preparser.parse("2", Intent.MAKE_BOOKING, "party_size", today=TODAY) == {"party_size": 2}
+    assert preparser.parse("2", Intent.MAKE_BOOKING, "visit_time", today=TODAY) is None
+
+
+def test_bare_reference_is_taken_only_when_asked_for():
+    preparser = PreParser()
+
+    assert preparser.parse("32p21vr", Intent.CANCEL_BOOKING, "booking_reference", today=TODAY) == {
+        "booking_reference": "32P21VR",
+    }
+    assert preparser.parse("32p21vr", Intent.MAKE_BOOKING, "visit_date", today=TODAY) is None
+
+
+def test_party_size_does_not_swallow_times():
+    assert PreParser().parse("book for 19:00 tomorrow", today=TODAY) == {
+        "intent": "MAKE_BOOKING", "visit_date": "2025-08-07", "visit_time": "19:00:00",
+    }
+
+
+def test_stats_report_hit_rates_and_savings():
+    preparser = PreParser()
+    preparser.parse("cancel booking 32P21VR", today=TODAY)
+    preparser.parse("what do you recommend?", today=TODAY)
+    preparser.record_llm_call(2.0)
+
+    stats = preparser.stats()
+
+    assert stats["messages"] == 2
+    assert stats["fast_path"] == 1
+    assert stats["rule_hit_rates"]["booking_reference"] == 0.5
+    assert stats["estimated_seconds_saved"] == 2.0
+    # Each rule in a message answered without the LLM is credited with the call it saved
+    assert stats["rule_seconds_saved"] == {"intent_cancel": 2.0, "booking_reference": 2.0}
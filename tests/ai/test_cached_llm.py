@@ -0,0 +1,128 @@
+import asyncio
+from datetime import date
+
+from ai.cached_llm import CachedLanguageModel
+from ai.langauge_model import LanguageModel
+
+
+class CountingLanguageModel(LanguageModel):
+    def __init__(self):
+        self.prompts = []
+
+    def chat(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return f"response {len(self.prompts)}"
+
+
+def test_identical_prompts_are_served_from_memory():
+    llm = CountingLanguageModel()
+    cached = CachedLanguageModel(llm)
+
+    first = cached.chat("check   availability\n")
+    second = asyncio.run(cached.achat("check availability"))
+
+    assert first == second == "response 1"
+    assert len(llm.prompts) == 1
+    assert cached.stats()["hits"] == 1
+
+
+def test_least_recently_used_prompt_is_evicted():
+    llm = CountingLanguageModel()
+    cached = CachedLanguageModel(llm, max_size=2)
+
+    cached.chat("a")
+    cached.chat("b")
+    cached.chat("a")
+    cached.chat("c")
+    cached.chat("b")
+
+    assert llm.prompts == ["a", "b", "c", "b"]
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "llm.sqlite")
+    llm = CountingLanguageModel()
+    CachedLanguageModel(llm, db_path=db_path).chat("hi")
+
+    restarted = CachedLanguageModel(llm, db_path=db_path)
+
+    assert restarted.chat("hi") == "response 1"
+    assert restarted.stats()["disk_hits"] == 1
+    assert len(llm.prompts) == 1
+
+
+def test_cached_answers_expire_with_the_day(mocker, tmp_path):
+    today = mocker.patch("ai.cached_llm.date")
+    today.today.return_value = date(2025, 8, 6)
+    llm = CountingLanguageModel()
+    cached = CachedLanguageModel(llm, db_path=str(tmp_path / "llm.sqlite"))
+    cached.chat("book for tomorrow")
+
+    today.today.return_value = date(2025, 8, 7)
+
+    assert cached.chat("book for tomorrow") == "response 2"
+    assert cached.stats()["size"] == 1
+
+
+class StreamingLanguageModel(CountingLanguageModel):
+    def stream(self, prompt: str):
+        self.prompts.append(prompt)
+        yield from ["{", '"intent": null', "}"]
+
+
+def test_streamed_completion_is_cached_whole():
+    llm = StreamingLanguageModel()
+    cached = CachedLanguageModel(llm)
+
+    assert list(cached.stream("hi")) == ["{", '"intent": null', "}"]
+    assert list(cached.stream("hi")) == ['{"intent": null}']
+    assert cached.chat("hi") == '{"intent": null}'
+    assert len(llm.prompts) == 1
+
+
+def test_default_astream_yields_whole_completion():
+    llm = CountingLanguageModel()
+
+    async def collect():
+        return [chunk async for chunk in llm.astream("hi")]
+
+    assert asyncio.run(collect()) == ["response 1"]
+
+
+def test_async_disk_lookups_run_off_the_event_loop(mocker, tmp_path):
+    db_path = str(tmp_path / "llm.sqlite")
+    llm = CountingLanguageModel()
+    CachedLanguageModel(llm, db_path=db_path).chat("hi")
+    restarted = CachedLanguageModel(llm, db_path=db_path)
+    from_disk = mocker.spy(restarted, "_from_disk")
+    to_thread = mocker.spy(asyncio, "to_thread")
+
+    assert asyncio.run(restarted.achat("hi")) == "response 1"
+
+    to_thread.assert_called_once_with(from_disk, restarted._key("hi"))
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_database_errors_count_as_misses(tmp_path):
+    llm = CountingLanguageModel()
+    cached = CachedLanguageModel(llm, db_path=str(tmp_path / "llm.sqlite"))
+    # A table dropped by another process fails every query, as a locked or corrupt file would
+    cached._db.execute("DROP TABLE completions")
+
+    assert asyncio.run(cached.achat("hi")) == "response 1"
+    assert cached.chat("hi") == "response 1"
+    assert cached.stats()["disk_errors"] == 2
+    assert cached.stats()["misses"] == 1
+
+
+def test_close_releases_the_database_and_the_wrapped_model(mocker, tmp_path):
+    llm = CountingLanguageModel()
+    close = mocker.spy(llm, "close")
+    cached = CachedLanguageModel(llm, db_path=str(tmp_path / "llm.sqlite"))
+
+    cached.close()
+
+    assert cached._db is None
+    close.assert_called_once()
+    # Lookups after shutdown fall through to the model
+    assert cached.chat("hi") == "response 1"
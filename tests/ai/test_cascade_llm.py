@@ -0,0 +1,83 @@
+import asyncio
+
+from ai.cascade_llm import CascadingLanguageModel, drafts
+from ai.langauge_model import LanguageModel
+
+
+class FixedLanguageModel(LanguageModel):
+    def __init__(self, response: str):
+        self.response = response
+        self.prompts = []
+
+    def chat(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+def _problem(response: str) -> str | None:
+    return None if response.startswith("{") else "invalid_json"
+
+
+def test_good_small_answer_is_not_escalated():
+    small, large = FixedLanguageModel("{}"), FixedLanguageModel('{"large": true}')
+    cascade = CascadingLanguageModel(small, large, _problem)
+
+    assert asyncio.run(cascade.achat("prompt")) == "{}"
+    assert large.prompts == []
+    assert cascade.stats()["served"] == {"small": 1, "large": 0}
+
+
+def test_bad_small_answer_is_escalated_with_its_reason():
+    small, large = FixedLanguageModel("Sure! Here is the JSON"), FixedLanguageModel('{"large": true}')
+    cascade = CascadingLanguageModel(small, large, _problem)
+
+    assert cascade.chat("prompt") == '{"large": true}'
+    assert asyncio.run(cascade.achat("prompt")) == '{"large": true}'
+    stats = cascade.stats()
+    assert stats["escalations"] == {"invalid_json": 2}
+    assert stats["escalation_rate"] == 1.0
+
+
+def test_small_model_error_is_escalated():
+    small, large = FixedLanguageModel(RuntimeError("rate limited")), FixedLanguageModel("{}")
+    cascade = CascadingLanguageModel(small, large, _problem)
+
+    assert cascade.chat("prompt") == "{}"
+    assert cascade.stats()["escalations"] == {"error": 1}
+
+
+def test_astream_checks_the_small_answer_before_yielding():
+    small, large = FixedLanguageModel("not json"), FixedLanguageModel('{"large": true}')
+    cascade = CascadingLanguageModel(small, large, _problem)
+
+    async def collect():
+        return [chunk async for chunk in cascade.astream("prompt")]
+
+    assert asyncio.run(collect()) == ['{"large": true}']
+
+
+class ChunkedLanguageModel(FixedLanguageModel):
+    async def astream(self, prompt: str):
+        self.prompts.append(prompt)
+        for chunk in self.response:
+            yield chunk
+
+
+def test_drafts_see_the_small_answer_as_it_streams():
+    small, large = ChunkedLanguageModel(["{", "}"]), ChunkedLanguageModel(["{", '"large": true', "}"])
+    cascade = CascadingLanguageModel(small, large, _problem)
+    seen = []
+
+    async def collect():
+        with drafts(seen.append):
+            return [chunk async for chunk in cascade.astream("prompt")]
+
+    # The caller still only gets an answer once it has been judged
+    assert asyncio.run(collect()) == ["{}"]
+    assert seen == ["{", "}"]
+    # Escalated answers are passed on as they stream, and are not drafts
+    small.response = ["Sure! ", "{}"]
+    assert asyncio.run(collect()) == ["{", '"large": true', "}"]
+    assert seen == ["{", "}", "Sure! ", "{}"]
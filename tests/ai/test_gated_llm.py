@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ai.gated_llm import GatedLanguageModel, LLMBusyError, Priority, llm_priority
+from ai.langauge_model import LanguageModel
+
+
+class BlockingLanguageModel(LanguageModel):
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.prompts = []
+
+    def chat(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return prompt
+
+    async def achat(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        await self.release.wait()
+        return prompt
+
+
+async def _call(gate: GatedLanguageModel, prompt: str, priority: Priority = Priority.NORMAL) -> str:
+    with llm_priority(priority):
+        return await gate.achat(prompt)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        llm = BlockingLanguageModel()
+        gate = GatedLanguageModel(llm, max_in_flight=1, max_queue=3)
+        tasks = [asyncio.create_task(_call(gate, "first"))]
+        await _settle()
+        for prompt, priority in (("new a", Priority.NORMAL), ("mid-booking", Priority.HIGH), ("new b", Priority.NORMAL)):
+            tasks.append(asyncio.create_task(_call(gate, prompt, priority)))
+            await _settle()
+
+        assert gate.stats()["in_flight"] == 1
+        assert gate.stats()["waiting"] == 3
+        llm.release.set()
+        await asyncio.gather(*tasks)
+        return llm.prompts, gate.stats()
+
+    prompts, stats = asyncio.run(scenario())
+
+    assert prompts == ["first", "mid-booking", "new a", "new b"]
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 4
+
+
+def test_full_queue_sheds_new_sessions_before_mid_booking_ones():
+    async def scenario():
+        llm = BlockingLanguageModel()
+        gate = GatedLanguageModel(llm, max_in_flight=1, max_queue=1)
+        running = asyncio.create_task(_call(gate, "first"))
+        await _settle()
+        queued = asyncio.create_task(_call(gate, "new"))
+        await _settle()
+
+        with pytest.raises(LLMBusyError):
+            await _call(gate, "another new")
+        urgent = asyncio.create_task(_call(gate, "mid-booking", Priority.HIGH))
+        await _settle()
+        with pytest.raises(LLMBusyError):
+            await queued
+
+        llm.release.set()
+        await asyncio.gather(running, urgent)
+        return llm.prompts, gate.stats()
+
+    prompts, stats = asyncio.run(scenario())
+
+    assert prompts == ["first", "mid-booking"]
+    assert stats["rejections"] == {"queue_full": 1, "evicted": 1, "timeout": 0}
+    assert stats["in_flight"] == 0
+
+
+def test_waiter_gives_up_after_max_wait():
+    async def scenario():
+        llm = BlockingLanguageModel()
+        gate = GatedLanguageModel(llm, max_in_flight=1, max_queue=4, max_wait=0.01)
+        running = asyncio.create_task(_call(gate, "first"))
+        await _settle()
+
+        with pytest.raises(LLMBusyError):
+            await _call(gate, "second")
+        llm.release.set()
+        await running
+        return gate.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["rejections"]["timeout"] == 1
+    assert stats["waiting"] == 0
+    assert stats["in_flight"] == 0
+
+
+class ConcurrencyLanguageModel(LanguageModel):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def chat(self, prompt: str) -> str:
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        time.sleep(0.01)
+        with self.lock:
+            self.current -= 1
+        return prompt
+
+
+def test_sync_callers_share_the_limit():
+    llm = ConcurrencyLanguageModel()
+    gate = GatedLanguageModel(llm, max_in_flight=2)
+    results = []
+
+    threads = [threading.Thread(target=lambda i=i: results.append(gate.chat(f"prompt {i}"))) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [f"prompt {i}" for i in range(8)]
+    assert llm.peak == 2
+    assert gate.stats()["admitted"] == 8
+    assert gate.stats()["in_flight"] == 0
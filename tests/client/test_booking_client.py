@@ -1,8 +1,11 @@
+import asyncio
 from datetime import date, time
 
 import pytest
+import requests
 
-from client.booking_client import BookingClient
+from client.booking_client import BookingClient, UnexpectedNotModifiedError
+from client.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
 from client.model.cancallation_reason import CancellationReason
 from client.model.customer import Customer
 
@@ -144,6 +147,7 @@ def test_get_booking_details(mocker, fake_client: BookingClient):
     mock_response = mocker.Mock()
     mock_response.json.return_value = expected_response
     mock_response.raise_for_status.return_value = None
+    mock_response.headers = {}
     mock_get.return_value = mock_response
 
     result = fake_client.get_booking_details(booking_reference)
@@ -237,3 +241,190 @@ def test_cancel_booking(mocker, fake_client: BookingClient):
     assert called_data["micrositeName"] == fake_client.restaurant_name
     assert called_data["bookingReference"] == booking_reference
     assert called_data["cancellationReasonId"] == cancellation_reason.code
+
+
+def test_acheck_availability(mocker, fake_client: BookingClient):
+    mock_post = mocker.patch("httpx.AsyncClient.post", new_callable=mocker.AsyncMock)
+
+    visit_date = date(2025, 8, 6)
+    expected_response = {"available_slots": [], "total_slots": 0}
+
+    mock_response = mocker.Mock()
+    mock_response.json.return_value = expected_response
+    mock_response.raise_for_status.return_value = None
+    mock_post.return_value = mock_response
+
+    result = asyncio.run(fake_client.acheck_availability(visit_date, 2))
+
+    assert result == expected_response
+    mock_post.assert_awaited_once()
+
+    called_url = mock_post.call_args[0][0]
+    assert "AvailabilitySearch" in called_url
+    assert fake_client.restaurant_name in called_url
+
+    called_data = mock_post.call_args[1]["data"]
+    assert called_data["VisitDate"] == visit_date
+    assert called_data["PartySize"] == 2
+
+
+def test_aget_booking_details(mocker, fake_client: BookingClient):
+    mock_get = mocker.patch("httpx.AsyncClient.get", new_callable=mocker.AsyncMock)
+
+    booking_reference = "ABC1234"
+    expected_response = {"booking_reference": booking_reference}
+
+    mock_response = mocker.Mock()
+    mock_response.json.return_value = expected_response
+    mock_response.raise_for_status.return_value = None
+    mock_response.headers = {}
+    mock_get.return_value = mock_response
+
+    result = asyncio.run(fake_client.aget_booking_details(booking_reference))
+
+    assert result == expected_response
+    called_url = mock_get.call_args[0][0]
+    assert called_url.endswith(f"{fake_client.restaurant_name}/Booking/{booking_reference}")
+
+
+def test_restaurant_name_override_shares_session(mocker, fake_client: BookingClient):
+    mock_post = mocker.patch("requests.Session.post")
+    mock_post.return_value.json.return_value = {}
+
+    session = fake_client.session
+    fake_client.cancel_booking("ABC1234", CancellationReason.WEATHER, restaurant_name="other-restaurant")
+
+    assert fake_client.session is session
+    called_url = mock_post.call_args[0][0]
+    assert "/Restaurant/other-restaurant/Booking/ABC1234/Cancel" in called_url
+    assert mock_post.call_args[1]["data"]["micrositeName"] == "other-restaurant"
+
+
+def _response(mocker, status_code: int, body: dict | None = None, headers: dict | None = None):
+    response = mocker.Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = body
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(response=response)
+    else:
+        response.raise_for_status.return_value = None
+    return response
+
+
+def _resilient_client() -> BookingClient:
+    return BookingClient(
+        base_url="fake-url",
+        bearer_token="fake-bearer-token",
+        restaurant_name="fake-restaurant",
+        retry_policy=RetryPolicy(attempts=3, base_delay=0),
+        circuit_breaker_factory=lambda: CircuitBreaker(failure_threshold=2, reset_timeout=60),
+    )
+
+
+def test_reads_retry_transient_failures_with_a_timeout(mocker):
+    client = _resilient_client()
+    mock_get = mocker.patch("requests.Session.get", side_effect=[
+        _response(mocker, 502),
+        _response(mocker, 200, {"booking_reference": "ABC1234"}),
+    ])
+
+    assert client.get_booking_details("ABC1234") == {"booking_reference": "ABC1234"}
+    assert mock_get.call_count == 2
+    assert mock_get.call_args[1]["timeout"] == client.timeouts["Booking"]
+
+
+def test_writes_are_not_retried(mocker):
+    client = _resilient_client()
+    mock_post = mocker.patch("requests.Session.post", return_value=_response(mocker, 503))
+
+    with pytest.raises(requests.HTTPError):
+        client.make_booking(date(2025, 8, 6), time(19, 0), 2)
+
+    mock_post.assert_called_once()
+
+
+def test_not_found_is_not_retried_and_keeps_the_circuit_closed(mocker):
+    client = _resilient_client()
+    mock_get = mocker.patch("requests.Session.get", return_value=_response(mocker, 404))
+
+    for _ in range(3):
+        with pytest.raises(requests.HTTPError):
+            client.get_booking_details("MISSING")
+
+    assert mock_get.call_count == 3
+    assert client.circuit_breaker().state == "closed"
+
+
+def test_open_circuit_fails_fast(mocker):
+    client = _resilient_client()
+    mock_post = mocker.patch("requests.Session.post", side_effect=requests.ConnectionError())
+
+    with pytest.raises(CircuitOpenError):
+        client.check_availability(date(2025, 8, 6), 2)
+
+    # The second failed attempt opens the circuit, and the third is rejected without a request
+    assert mock_post.call_count == 2
+    assert client.circuit_breaker().state == "open"
+
+
+def test_open_circuit_only_fails_its_own_restaurant(mocker):
+    client = _resilient_client()
+
+    def post(url, **kwargs):
+        if "/Restaurant/Down/" in url:
+            raise requests.ConnectionError()
+        return _response(mocker, 200, {"available_slots": []})
+
+    mocker.patch("requests.Session.post", side_effect=post)
+
+    with pytest.raises(CircuitOpenError):
+        client.check_availability(date(2025, 8, 6), 2, restaurant_name="Down")
+
+    assert client.check_availability(date(2025, 8, 6), 2) == {"available_slots": []}
+    assert client.circuit_breaker("Down").state == "open"
+    assert client.circuit_breaker().state == "closed"
+    assert set(client.circuit_breakers) == {"Down", "fake-restaurant"}
+
+
+def test_slow_async_get_is_hedged(mocker):
+    client = _resilient_client()
+    for _ in range(20):
+        client.latencies["Booking"].observe(0.01)
+    responses = iter([(1.0, "slow"), (0.0, "fast")])
+
+    async def get(url, **kwargs):
+        delay, body = next(responses)
+        await asyncio.sleep(delay)
+        return _response(mocker, 200, {"source": body})
+
+    mocker.patch("httpx.AsyncClient.get", side_effect=get)
+
+    result = asyncio.run(client.aget_booking_details("ABC1234"))
+
+    assert result == {"source": "fast"}
+    assert client.circuit_breaker().state == "closed"
+
+
+def test_tagged_get_is_revalidated(mocker):
+    client = _resilient_client()
+    details = {"booking_reference": "ABC1234", "status": "confirmed"}
+    mock_get = mocker.patch("requests.Session.get", side_effect=[
+        _response(mocker, 200, details, {"ETag": '"v1"'}),
+        _response(mocker, 304),
+    ])
+
+    assert client.get_booking_details("ABC1234") == details
+    assert client.get_booking_details("ABC1234") == details
+
+    assert "headers" not in mock_get.call_args_list[0].kwargs
+    assert mock_get.call_args_list[1].kwargs["headers"] == {"If-None-Match": '"v1"'}
+    assert client.not_modified == 1
+
+
+def test_unconditional_not_modified_is_an_error(mocker):
+    client = _resilient_client()
+    mocker.patch("requests.Session.get", return_value=_response(mocker, 304))
+
+    with pytest.raises(UnexpectedNotModifiedError, match="was not conditional"):
+        client.get_booking_details("ABC1234")
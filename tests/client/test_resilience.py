@@ -0,0 +1,101 @@
+import httpx
+import pytest
+import requests
+
+from client.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    RetryPolicy,
+    is_transient,
+    is_upstream_failure,
+)
+
+
+def _http_error(status_code: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+
+def _fail(breaker: CircuitBreaker, error: Exception):
+    with pytest.raises(type(error)):
+        with breaker.call():
+            raise error
+
+
+def test_transient_errors():
+    assert is_transient(requests.ConnectionError())
+    assert is_transient(requests.ReadTimeout())
+    assert is_transient(httpx.ConnectTimeout("timed out"))
+    assert is_transient(_http_error(503))
+    assert not is_transient(_http_error(500))
+    assert not is_transient(_http_error(404))
+    assert not is_transient(CircuitOpenError())
+
+
+def test_upstream_failures():
+    assert is_upstream_failure(_http_error(500))
+    assert is_upstream_failure(requests.ConnectionError())
+    assert not is_upstream_failure(_http_error(404))
+    assert not is_upstream_failure(ValueError())
+
+
+def test_retry_delay_is_jittered_and_capped():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.3)
+    delays = [policy.delay(attempt) for attempt in range(5) for _ in range(50)]
+    assert all(0 <= delay <= 0.3 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_circuit_opens_after_consecutive_failures(mocker):
+    clock = mocker.patch("client.resilience.time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    _fail(breaker, requests.ConnectionError())
+    assert breaker.state == "closed"
+    _fail(breaker, _http_error(502))
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        with breaker.call():
+            pass
+    assert breaker.rejections == 1
+
+    # After the reset timeout one probe goes through, and its success closes the circuit
+    clock.return_value = 131.0
+    with breaker.call():
+        pass
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_circuit(mocker):
+    clock = mocker.patch("client.resilience.time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _fail(breaker, requests.ConnectionError())
+
+    clock.return_value = 131.0
+    _fail(breaker, requests.ConnectionError())
+
+    assert breaker.state == "open"
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    _fail(breaker, requests.ConnectionError())
+    with breaker.call():
+        pass
+    _fail(breaker, requests.ConnectionError())
+
+    assert breaker.state == "closed"
+
+
+def test_latency_quantile_needs_enough_samples():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for sample in range(9):
+        tracker.observe(sample)
+    assert tracker.quantile(0.95) is None
+
+    for sample in range(9, 100):
+        tracker.observe(sample)
+    assert tracker.quantile(0.95) == 95
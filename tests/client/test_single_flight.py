@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from client.single_flight import SingleFlight
+
+
+def test_do_shares_one_call_between_threads():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def request():
+        calls.append(1)
+        release.wait(timeout=5)
+        return {"ok": True}
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(single_flight.do, "key", request) for _ in range(8)]
+        while single_flight.leaders + single_flight.followers < 8:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert single_flight.in_flight() == 0
+
+
+def test_do_propagates_exception_to_every_caller():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def request():
+        release.wait(timeout=5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(single_flight.do, "key", request) for _ in range(4)]
+        while single_flight.leaders + single_flight.followers < 4:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_ado_shares_one_call_between_tasks():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def request():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    async def main():
+        return await asyncio.gather(*[single_flight.ado("key", request) for _ in range(10)])
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert single_flight.stats() == {"leaders": 1, "followers": 9, "in_flight": 0}
+
+
+def test_ado_propagates_exception_and_survives_cancelled_waiter():
+    single_flight = SingleFlight()
+
+    async def request():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        cancelled = asyncio.ensure_future(single_flight.ado("key", request))
+        waiter = asyncio.ensure_future(single_flight.ado("key", request))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(RuntimeError):
+            await waiter
+
+    asyncio.run(main())
+
+
+def test_ado_cancels_the_request_once_every_waiter_is_cancelled():
+    single_flight = SingleFlight()
+    started = []
+    stopped = []
+
+    async def request():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            stopped.append(1)
+            raise
+
+    async def main():
+        waiters = [asyncio.ensure_future(single_flight.ado("key", request)) for _ in range(2)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        # Someone is still waiting, so the request runs on
+        assert stopped == []
+        waiters[1].cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+
+    assert started == stopped == [1]
+    assert single_flight.in_flight() == 0
+
+
+def test_distinct_keys_do_not_share():
+    single_flight = SingleFlight()
+
+    async def main():
+        return await asyncio.gather(
+            single_flight.ado("a", lambda: asyncio.sleep(0, result="a")),
+            single_flight.ado("b", lambda: asyncio.sleep(0, result="b")),
+        )
+
+    assert asyncio.run(main()) == ["a", "b"]
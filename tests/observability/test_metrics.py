@@ -0,0 +1,43 @@
+from observability.metrics import Registry
+
+
+def test_counter_renders_labelled_series():
+    registry = Registry()
+    counter = registry.counter("requests_total", "Requests.", ("endpoint", "status"))
+
+    counter.inc(endpoint="Booking", status="200")
+    counter.inc(2, endpoint="Booking", status="200")
+    counter.inc(endpoint='Odd"name', status="500")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{endpoint="Booking",status="200"} 3.0',
+        'requests_total{endpoint="Odd\\"name",status="500"} 1.0',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("node",))
+    histogram.buckets = (0.1, 1.0)
+
+    histogram.observe(0.05, node="a")
+    histogram.observe(0.1, node="a")
+    histogram.observe(3.0, node="a")
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{node="a",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{node="a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{node="a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{node="a"} 3' in lines
+
+
+def test_callback_reads_value_at_render_time():
+    registry = Registry()
+    sessions = {"count": 1}
+    registry.callback("sessions", "Sessions.", "gauge", lambda: {(): sessions["count"]})
+
+    sessions["count"] = 5
+
+    assert registry.render().splitlines()[-1] == "sessions 5"
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+from observability import tracing
+from observability.tracing import ChromeTraceExporter, JsonLinesExporter, Tracer
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+    def close(self):
+        pass
+
+
+def test_spans_nest_under_the_request_trace():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=1.0)
+
+    with tracer.trace("web/routes.chat", session_id="s1"):
+        with tracing.span("node.parse_intent"):
+            with tracing.span("llm.chat", model="small"):
+                tracing.annotate(prompt_tokens=12)
+        with tracing.span("node.check_availability"):
+            pass
+
+    [spans] = exporter.traces
+    by_name = {span.name: span for span in spans}
+    assert set(by_name) == {"web/routes.chat", "node.parse_intent", "llm.chat", "node.check_availability"}
+    assert {span.trace.trace_id for span in spans} == {by_name["web/routes.chat"].trace.trace_id}
+    assert by_name["web/routes.chat"].trace.session_id == "s1"
+    assert by_name["llm.chat"].parent_id == by_name["node.parse_intent"].span_id
+    assert by_name["node.check_availability"].parent_id == by_name["web/routes.chat"].span_id
+    assert by_name["llm.chat"].attributes == {"model": "small", "prompt_tokens": 12}
+
+
+def test_spans_outside_a_sampled_trace_are_not_recorded():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=0.0)
+
+    with tracing.span("node.parse_intent") as untraced:
+        pass
+    with tracer.trace("web/routes.chat") as root:
+        with tracing.span("node.parse_intent") as child:
+            pass
+
+    assert untraced is None and root is None and child is None
+    assert exporter.traces == []
+
+
+def test_slow_traces_are_exported_without_being_sampled():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=0.0, slow_seconds=0.01)
+
+    with tracer.trace("web/routes.chat", session_id="fast"):
+        pass
+    with tracer.trace("web/routes.chat", session_id="slow"):
+        asyncio.run(asyncio.sleep(0.02))
+
+    assert [spans[0].trace.session_id for spans in exporter.traces] == ["slow"]
+    assert tracer.exported == 1
+
+
+def test_concurrent_tasks_keep_their_own_parents_and_errors():
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_rate=1.0)
+
+    async def call(endpoint: str, fail: bool):
+        with tracing.span(f"booking_api.{endpoint}"):
+            await asyncio.sleep(0)
+            if fail:
+                raise RuntimeError(endpoint)
+
+    async def scenario():
+        with tracer.trace("web/routes.chat_turn"):
+            with tracing.span("node.find_nearest_slot"):
+                await asyncio.gather(call("a", False), call("b", True), return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    by_name = {span.name: span for span in exporter.traces[0]}
+    node = by_name["node.find_nearest_slot"]
+    assert by_name["booking_api.a"].parent_id == node.span_id
+    assert by_name["booking_api.b"].parent_id == node.span_id
+    assert by_name["booking_api.a"].error is None
+    assert by_name["booking_api.b"].error == "RuntimeError"
+
+
+def test_chrome_trace_file_loads_as_json(tmp_path):
+    path = tmp_path / "trace.json"
+    for _ in range(2):
+        # Reopening appends to the same array rather than starting another
+        tracer = Tracer(ChromeTraceExporter(str(path)), sample_rate=1.0)
+        with tracer.trace("web/routes.chat", session_id="s1"):
+            with tracing.span("node.parse_intent"):
+                pass
+        tracer.close()
+
+    events = json.loads(path.read_text().rstrip().rstrip(",") + "]")
+
+    complete = [event for event in events if event["ph"] == "X"]
+    assert [event["name"] for event in complete] == ["node.parse_intent", "web/routes.chat"] * 2
+    assert all(event["args"]["session_id"] == "s1" and event["dur"] >= 0 for event in complete)
+    assert len({event["tid"] for event in complete}) == 2
+
+
+def test_json_lines_exporter_writes_one_span_per_line(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer(JsonLinesExporter(str(path)), sample_rate=1.0)
+
+    with tracer.trace("web/routes.chat", session_id="s1"):
+        with tracing.span("session.save"):
+            pass
+    tracer.close()
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(span["name"], span["parent_id"]) for span in spans] == [("session.save", 1), ("web/routes.chat", None)]
+    assert spans[0]["trace_id"] == spans[1]["trace_id"]
@@ -0,0 +1,370 @@
+import asyncio
+from datetime import date, time
+
+import pytest
+from requests.exceptions import HTTPError
+
+from client.model.cancallation_reason import CancellationReason
+from services import exceptions
+from services.booking_service import BookingService
+from services.cache import TTLCache
+
+
+@pytest.fixture
+def fake_client(mocker):
+    client = mocker.Mock()
+    client.restaurant_name = "fake-restaurant"
+    client.check_availability.side_effect = lambda visit_date, party_size, restaurant_name=None: {
+        "visit_date": visit_date,
+        "party_size": party_size,
+        "available_slots": [],
+    }
+    return client
+
+
+def test_check_availability_is_cached(fake_client):
+    service = BookingService(fake_client)
+
+    first = service.check_availability(date(2025, 8, 6), 2)
+    second = service.check_availability(date(2025, 8, 6), 2)
+    service.check_availability(date(2025, 8, 6), 4)
+
+    assert first is second
+    assert fake_client.check_availability.call_count == 2
+    stats = service.availability_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_acheck_availability_shares_cache(mocker, fake_client):
+    fake_client.acheck_availability = mocker.AsyncMock(return_value={"available_slots": []})
+    service = BookingService(fake_client)
+
+    asyncio.run(service.acheck_availability(date(2025, 8, 6), 2))
+    service.check_availability(date(2025, 8, 6), 2)
+
+    fake_client.acheck_availability.assert_awaited_once()
+    fake_client.check_availability.assert_not_called()
+
+
+def test_make_booking_invalidates_date(fake_client):
+    fake_client.make_booking.return_value = {
+        "booking_reference": "ABC1234",
+        "visit_date": "2025-08-06",
+        "status": "confirmed",
+    }
+    service = BookingService(fake_client)
+    service.check_availability(date(2025, 8, 6), 2)
+    service.check_availability(date(2025, 8, 7), 2)
+
+    service.make_booking(date(2025, 8, 6), time(12, 30), 4)
+    service.check_availability(date(2025, 8, 6), 2)
+    service.check_availability(date(2025, 8, 7), 2)
+
+    assert fake_client.check_availability.call_count == 3
+
+
+def test_cancel_known_booking_invalidates_only_its_date(fake_client):
+    fake_client.get_booking_details.return_value = {
+        "booking_reference": "ABC1234",
+        "visit_date": "2025-08-06",
+    }
+    service = BookingService(fake_client)
+    service.get_booking_details("ABC1234")
+    service.check_availability(date(2025, 8, 6), 2)
+    service.check_availability(date(2025, 8, 7), 2)
+
+    service.cancel_booking("ABC1234", CancellationReason.CUSTOMER_REQUEST)
+    service.check_availability(date(2025, 8, 6), 2)
+    service.check_availability(date(2025, 8, 7), 2)
+
+    assert fake_client.check_availability.call_count == 3
+
+
+def test_cancel_unknown_booking_invalidates_restaurant(fake_client):
+    service = BookingService(fake_client)
+    service.check_availability(date(2025, 8, 6), 2)
+    service.check_availability(date(2025, 8, 7), 2)
+
+    service.cancel_booking("ABC1234", CancellationReason.CUSTOMER_REQUEST)
+
+    assert len(service.availability_cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_expires_entries(mocker):
+    monotonic = mocker.patch("services.cache.time.monotonic", return_value=100.0)
+    cache = TTLCache(max_size=2, ttl=30)
+    cache.set("a", 1)
+
+    monotonic.return_value = 131.0
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_drops_write_that_raced_invalidation():
+    cache = TTLCache()
+    generation = cache.generation
+    cache.invalidate(lambda key: True)
+    cache.set("a", 1, generation)
+
+    assert cache.get("a") is None
+
+
+def test_check_availability_range_merges_days(fake_client):
+    fake_client.check_availability.side_effect = lambda visit_date, party_size, restaurant_name=None: {
+        "available_slots": [
+            {"time": "12:00:00", "available": True},
+            {"time": "19:00:00", "available": visit_date.day == 7},
+        ],
+    }
+    service = BookingService(fake_client)
+
+    result = service.check_availability_range(
+        date(2025, 8, 6), date(2025, 8, 8), 6, time_window=(time(18), time(22))
+    )
+
+    assert fake_client.check_availability.call_count == 3
+    assert result["party_size"] == 6
+    assert [(slot["visit_date"], slot["available"]) for slot in result["available_slots"]] == [
+        (date(2025, 8, 6), False),
+        (date(2025, 8, 7), True),
+        (date(2025, 8, 8), False),
+    ]
+
+
+def test_acheck_availability_range_caps_concurrency(fake_client):
+    in_flight = 0
+    peak = 0
+
+    async def acheck_availability(visit_date, party_size, restaurant_name=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"available_slots": [{"time": "12:00:00", "available": True}]}
+
+    fake_client.acheck_availability = acheck_availability
+    service = BookingService(fake_client, max_concurrency=2)
+
+    result = asyncio.run(service.acheck_availability_range(date(2025, 8, 1), date(2025, 8, 7), 2))
+
+    assert peak == 2
+    assert result["total_slots"] == 7
+    assert result["available_slots"][-1]["visit_date"] == date(2025, 8, 7)
+
+
+def test_check_availability_range_rejects_bad_ranges(fake_client):
+    service = BookingService(fake_client, max_range_days=7)
+
+    with pytest.raises(ValueError):
+        service.check_availability_range(date(2025, 8, 6), date(2025, 8, 5), 2)
+    with pytest.raises(ValueError):
+        service.check_availability_range(date(2025, 8, 1), date(2025, 8, 8), 2)
+
+
+def test_availability_cache_is_keyed_by_restaurant(fake_client):
+    service = BookingService(fake_client)
+
+    service.check_availability(date(2025, 8, 6), 2)
+    service.check_availability(date(2025, 8, 6), 2, restaurant_name="other-restaurant")
+    service.cancel_booking("ABC1234", CancellationReason.WEATHER, restaurant_name="other-restaurant")
+    service.check_availability(date(2025, 8, 6), 2)
+
+    assert fake_client.check_availability.call_count == 2
+    fake_client.check_availability.assert_called_with(
+        date(2025, 8, 6), 2, restaurant_name="other-restaurant"
+    )
+
+
+def _booking(reference: str = "ABC1234", **fields) -> dict:
+    return {
+        "booking_reference": reference,
+        "visit_date": "2025-08-06",
+        "visit_time": "19:00:00",
+        "party_size": 2,
+        "status": "confirmed",
+        **fields,
+    }
+
+
+def test_booking_details_are_cached_per_reference(fake_client):
+    fake_client.get_booking_details.side_effect = lambda reference, restaurant_name=None: _booking(reference)
+    service = BookingService(fake_client)
+
+    first = service.get_booking_details("ABC1234")
+    second = service.get_booking_details("ABC1234")
+    service.get_booking_details("ABC1234", restaurant_name="other-restaurant")
+
+    assert first is second
+    assert fake_client.get_booking_details.call_count == 2
+
+
+def test_update_refreshes_cached_booking_from_response(fake_client):
+    fake_client.get_booking_details.return_value = _booking()
+    fake_client.update_booking.return_value = {
+        "booking_reference": "ABC1234",
+        "updates": {"party_size": 4},
+        "status": "updated",
+    }
+    service = BookingService(fake_client)
+
+    service.get_booking_details("ABC1234")
+    service.update_booking("ABC1234", party_size=4)
+    details = service.get_booking_details("ABC1234")
+
+    assert details["party_size"] == 4
+    assert details["status"] == "confirmed"
+    fake_client.get_booking_details.assert_called_once()
+
+
+def test_update_echoing_form_values_is_cached_as_a_lookup_returns_it(fake_client):
+    fake_client.get_booking_details.return_value = _booking()
+    fake_client.update_booking.return_value = {"updates": {"party_size": "4", "visit_time": "20:00"}}
+    service = BookingService(fake_client)
+
+    service.get_booking_details("ABC1234")
+    service.update_booking("ABC1234", party_size=4, visit_time=time(20, 0))
+    details = service.get_booking_details("ABC1234")
+
+    assert details["party_size"] == 4
+    assert details["visit_time"] == "20:00:00"
+    fake_client.get_booking_details.assert_called_once()
+
+
+def test_update_with_fields_a_lookup_lacks_is_fetched_again(fake_client):
+    fake_client.get_booking_details.return_value = _booking()
+    fake_client.update_booking.return_value = {"updates": {"PartySize": "4"}}
+    service = BookingService(fake_client)
+
+    service.get_booking_details("ABC1234")
+    service.update_booking("ABC1234", party_size=4)
+    service.get_booking_details("ABC1234")
+
+    assert fake_client.get_booking_details.call_count == 2
+
+
+def test_cancel_marks_cached_booking(fake_client):
+    fake_client.get_booking_details.return_value = _booking()
+    fake_client.cancel_booking.return_value = {"booking_reference": "ABC1234", "status": "cancelled"}
+    service = BookingService(fake_client)
+
+    service.get_booking_details("ABC1234")
+    service.cancel_booking("ABC1234", CancellationReason.CUSTOMER_REQUEST)
+
+    assert service.get_booking_details("ABC1234")["status"] == "cancelled"
+    fake_client.get_booking_details.assert_called_once()
+
+
+def test_failed_write_evicts_cached_booking(fake_client):
+    fake_client.get_booking_details.return_value = _booking()
+    fake_client.cancel_booking.side_effect = HTTPError()
+    service = BookingService(fake_client)
+
+    service.get_booking_details("ABC1234")
+    with pytest.raises(exceptions.BookingNotFoundError):
+        service.cancel_booking("ABC1234", CancellationReason.CUSTOMER_REQUEST)
+    service.get_booking_details("ABC1234")
+
+    assert fake_client.get_booking_details.call_count == 2
+
+
+def test_async_update_shares_booking_cache(mocker, fake_client):
+    fake_client.aget_booking_details = mocker.AsyncMock(return_value=_booking())
+    fake_client.aupdate_booking = mocker.AsyncMock(return_value={"updates": {"visit_time": "20:00:00"}})
+    service = BookingService(fake_client)
+
+    async def run():
+        await service.aget_booking_details("ABC1234")
+        await service.aupdate_booking("ABC1234", visit_time=time(20, 0))
+        return service.get_booking_details("ABC1234")
+
+    assert asyncio.run(run())["visit_time"] == "20:00:00"
+    fake_client.aget_booking_details.assert_awaited_once()
+
+
+def _slots_for(visit_date, party_size, restaurant_name=None):
+    # Only the 7th and later have a free table, at 19:00 and 20:30
+    free = visit_date >= date(2025, 8, 7)
+    return {"available_slots": [
+        {"time": "19:00:00", "available": free, "max_party_size": 6},
+        {"time": "20:00:00", "available": False, "max_party_size": 6},
+        {"time": "20:30:00", "available": free, "max_party_size": 6},
+    ]}
+
+
+def test_earliest_slot_stops_at_first_day_with_room(fake_client):
+    fake_client.check_availability.side_effect = _slots_for
+    service = BookingService(fake_client)
+
+    found = service.earliest_slot(date(2025, 8, 5), date(2025, 8, 11), 4)
+
+    assert found == (date(2025, 8, 7), time(19, 0))
+    assert fake_client.check_availability.call_count == 3
+
+
+def test_aearliest_slot_searches_unindexed_days_once(mocker, fake_client):
+    fake_client.acheck_availability = mocker.AsyncMock(side_effect=_slots_for)
+    service = BookingService(fake_client)
+
+    first = asyncio.run(service.aearliest_slot(date(2025, 8, 5), date(2025, 8, 8), 4, near=time(20, 15)))
+    nearest = asyncio.run(service.anearest_slots(date(2025, 8, 8), 4, time(20, 0), limit=2))
+
+    assert first == (date(2025, 8, 7), time(20, 30))
+    assert nearest == [time(20, 30), time(19, 0)]
+    assert fake_client.acheck_availability.await_count == 4
+
+
+def test_booking_drops_its_date_from_slot_index(fake_client):
+    fake_client.check_availability.side_effect = _slots_for
+    fake_client.make_booking.return_value = {"booking_reference": "ABC1234", "status": "confirmed"}
+    service = BookingService(fake_client)
+    service.nearest_slots(date(2025, 8, 7), 2, time(19, 0))
+    service.nearest_slots(date(2025, 8, 8), 2, time(19, 0))
+
+    service.make_booking(date(2025, 8, 7), time(19, 0), 2)
+
+    assert not service.slot_index.has("fake-restaurant", date(2025, 8, 7))
+    assert service.slot_index.has("fake-restaurant", date(2025, 8, 8))
+
+
+def test_full_day_for_a_large_party_is_searched_again_for_a_smaller_one(fake_client):
+    def check_availability(visit_date, party_size, restaurant_name=None):
+        return {"available_slots": [{"time": "20:00:00", "available": party_size <= 4, "max_party_size": 4}]}
+
+    fake_client.check_availability.side_effect = check_availability
+    service = BookingService(fake_client)
+
+    assert service.earliest_slot(date(2025, 8, 6), date(2025, 8, 6), 10) is None
+    assert service.nearest_slots(date(2025, 8, 6), 2, time(20, 0)) == [time(20, 0)]
+    # The smaller party's search answers larger parties too
+    assert service.nearest_slots(date(2025, 8, 6), 3, time(20, 0)) == [time(20, 0)]
+    assert fake_client.check_availability.call_count == 2
+
+
+def test_search_that_raced_a_booking_is_not_indexed(fake_client):
+    service = BookingService(fake_client)
+
+    def check_availability(visit_date, party_size, restaurant_name=None):
+        # A booking lands while this search is in flight
+        service.slot_index.invalidate("fake-restaurant", visit_date)
+        return _slots_for(visit_date, party_size)
+
+    fake_client.check_availability.side_effect = check_availability
+
+    service.nearest_slots(date(2025, 8, 8), 2, time(19, 0))
+
+    assert not service.slot_index.has("fake-restaurant", date(2025, 8, 8))
@@ -0,0 +1,143 @@
+from datetime import date
+
+import pytest
+import requests
+
+from client.model.cancallation_reason import CancellationReason
+from client.resilience import RetryPolicy
+from services import exceptions
+from services.bulk_cancel import BulkCanceller, CancelOutcome, CancelStatus
+from services.rate_limiter import RateLimiter
+
+
+def _not_found(status_code: int) -> exceptions.BookingNotFoundError:
+    response = requests.Response()
+    response.status_code = status_code
+    error = exceptions.BookingNotFoundError()
+    error.__cause__ = requests.HTTPError(response=response)
+    return error
+
+
+@pytest.fixture
+def fake_service(mocker):
+    return mocker.Mock()
+
+
+def _canceller(service) -> BulkCanceller:
+    return BulkCanceller(service, max_workers=4, rate=1000.0, retry_policy=RetryPolicy(attempts=3, base_delay=0))
+
+
+def test_cancels_each_reference_once(fake_service):
+    progress = []
+
+    report = _canceller(fake_service).run(
+        ["A", "B", "A", "C"],
+        CancellationReason.WEATHER,
+        on_progress=lambda done, total, outcome: progress.append((done, total)),
+    )
+
+    assert report.total == 3
+    assert report.counts == {"cancelled": 3}
+    assert fake_service.cancel_booking.call_count == 3
+    fake_service.cancel_booking.assert_any_call("A", CancellationReason.WEATHER, restaurant_name=None)
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_reports_failures_per_reference(fake_service):
+    def cancel(reference, reason, restaurant_name=None):
+        if reference == "MISSING":
+            raise _not_found(404)
+        if reference == "BROKEN":
+            raise _not_found(500)
+
+    fake_service.cancel_booking.side_effect = cancel
+
+    report = _canceller(fake_service).run(["OK", "MISSING", "BROKEN"], CancellationReason.RESTAURANT_CLOSURE)
+
+    assert report.counts == {"cancelled": 1, "not_found": 1, "failed": 1}
+    assert list(report.failures) == ["BROKEN"]
+
+
+def test_retries_transient_failures(fake_service):
+    fake_service.cancel_booking.side_effect = [_not_found(503), requests.ConnectionError(), None]
+
+    report = _canceller(fake_service).run(["A"], CancellationReason.WEATHER)
+
+    assert report.counts == {"cancelled": 1}
+    assert fake_service.cancel_booking.call_count == 3
+
+
+def test_date_range_filters_references(fake_service):
+    bookings = {
+        "IN": {"visit_date": "2025-08-06", "status": "confirmed"},
+        "OUT": {"visit_date": "2025-08-10", "status": "confirmed"},
+        "DONE": {"visit_date": "2025-08-06", "status": "cancelled"},
+    }
+    fake_service.get_booking_details.side_effect = lambda reference, restaurant_name=None: bookings[reference]
+
+    report = _canceller(fake_service).run(
+        ["IN", "OUT", "DONE"],
+        CancellationReason.WEATHER,
+        visit_dates=(date(2025, 8, 5), date(2025, 8, 7)),
+    )
+
+    assert report.counts == {"cancelled": 1, "out_of_range": 1, "already_cancelled": 1}
+    fake_service.cancel_booking.assert_called_once_with("IN", CancellationReason.WEATHER, restaurant_name=None)
+
+
+def test_date_range_reports_bookings_without_a_visit_date(fake_service):
+    fake_service.get_booking_details.return_value = {"status": "confirmed"}
+
+    report = _canceller(fake_service).run(
+        ["A"], CancellationReason.WEATHER, visit_dates=(date(2025, 8, 5), date(2025, 8, 7))
+    )
+
+    assert report.counts == {"failed": 1}
+    assert "no visit date" in report.failures["A"]
+    fake_service.cancel_booking.assert_not_called()
+
+
+def test_date_range_lookups_are_left_to_the_client_to_retry(fake_service):
+    fake_service.get_booking_details.side_effect = _not_found(503)
+
+    report = _canceller(fake_service).run(
+        ["A"], CancellationReason.WEATHER, visit_dates=(date(2025, 8, 5), date(2025, 8, 7))
+    )
+
+    assert report.counts == {"failed": 1}
+    fake_service.get_booking_details.assert_called_once()
+    fake_service.cancel_booking.assert_not_called()
+
+
+def test_resumes_from_checkpoint(fake_service, tmp_path):
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    checkpoint.write_text(
+        CancelOutcome(booking_reference="A", status=CancelStatus.CANCELLED).model_dump_json() + "\n"
+        + CancelOutcome(booking_reference="B", status=CancelStatus.FAILED, error="503").model_dump_json() + "\n"
+        + '{"booking_reference": "C", "sta'
+    )
+
+    report = _canceller(fake_service).run(
+        ["A", "B", "C"], CancellationReason.WEATHER, checkpoint_path=str(checkpoint)
+    )
+
+    assert report.resumed == 1
+    assert report.counts == {"cancelled": 3}
+    cancelled = sorted(call.args[0] for call in fake_service.cancel_booking.call_args_list)
+    assert cancelled == ["B", "C"]
+    assert checkpoint.read_text().count('"cancelled"') == 3
+
+
+def test_rate_limiter_spaces_calls(mocker):
+    clock = mocker.patch("services.rate_limiter.time.monotonic", return_value=0.0)
+    sleep = mocker.patch(
+        "services.rate_limiter.time.sleep",
+        side_effect=lambda seconds: setattr(clock, "return_value", clock.return_value + seconds),
+    )
+    limiter = RateLimiter(rate=2.0, burst=2)
+
+    for _ in range(4):
+        limiter.acquire()
+
+    assert clock.return_value == pytest.approx(1.0)
+    assert sleep.call_count == 2
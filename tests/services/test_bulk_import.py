@@ -0,0 +1,133 @@
+import asyncio
+from datetime import date, time
+import json
+
+import httpx
+import pytest
+
+from services.bulk_import import BulkImporter, ImportStatus, parse_row, read_rows
+
+
+def test_parse_csv_row_with_flat_customer_columns():
+    row = parse_row({
+        "visit_date": "2025-08-06",
+        "visit_time": "19:30",
+        "party_size": " 12 ",
+        "special_requests": "",
+        "first_name": "Ada",
+        "email": "ada@example.com",
+        "notes": "ignored",
+    })
+
+    assert row.visit_date == date(2025, 8, 6)
+    assert row.visit_time == time(19, 30)
+    assert row.party_size == 12
+    assert row.special_requests is None
+    assert row.customer.first_name == "Ada"
+
+
+def test_parse_ndjson_row_with_nested_customer():
+    row = parse_row(json.dumps({
+        "visit_date": "2025-08-06",
+        "visit_time": "12:00:00",
+        "party_size": 4,
+        "customer": {"surname": "Lovelace"},
+    }))
+
+    assert row.customer.surname == "Lovelace"
+    assert parse_row({"visit_date": "2025-08-06", "visit_time": "12:00", "party_size": "2"}).customer is None
+
+
+@pytest.mark.parametrize("raw", [
+    {"visit_date": "2025-13-01", "visit_time": "12:00", "party_size": "2"},
+    {"visit_date": "2025-08-06", "visit_time": "12:00", "party_size": "0"},
+    {"visit_date": "2025-08-06", "visit_time": "12:00", "party_size": "2", "email": "not-an-email"},
+    {"visit_date": "2025-08-06", "visit_time": "12:00", "party_size": "2", "restaurant_name": "../admin"},
+    {"visit_date": "2025-08-06", "visit_time": "12:00", "party_size": "2", "restaurant_name": "Hungry Unicorn"},
+    '{"visit_date": "2025-08-06",',
+    "[1, 2]",
+])
+def test_parse_row_rejects_invalid_rows(raw):
+    with pytest.raises(ValueError):
+        parse_row(raw)
+
+
+def test_read_rows_streams_csv_and_ndjson(tmp_path):
+    csv_path = tmp_path / "bookings.csv"
+    csv_path.write_text("visit_date,visit_time,party_size\n2025-08-06,12:00,2\n2025-08-07,13:00,3\n")
+    ndjson_path = tmp_path / "bookings.ndjson"
+    ndjson_path.write_text('{"party_size": 2}\n\n{"party_size": 3}\n')
+
+    assert [row["party_size"] for row in read_rows(str(csv_path))] == ["2", "3"]
+    assert [json.loads(row)["party_size"] for row in read_rows(str(ndjson_path))] == [2, 3]
+
+
+def test_import_bounds_in_flight_bookings_and_streams_results(mocker, tmp_path):
+    in_flight = 0
+    peak = 0
+
+    async def make_booking(visit_date, visit_time, party_size, *args, restaurant_name=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        if party_size == 13:
+            request = httpx.Request("POST", "fake-url")
+            raise httpx.HTTPStatusError("", request=request, response=httpx.Response(503, request=request))
+        return {"booking_reference": f"REF{party_size:04d}", "status": "confirmed"}
+
+    service = mocker.Mock()
+    service.amake_booking = mocker.AsyncMock(side_effect=make_booking)
+    rows = [
+        {"visit_date": "2025-08-06", "visit_time": "19:00", "party_size": str(party_size)}
+        for party_size in range(1, 51)
+    ]
+    rows.insert(10, {"visit_date": "tomorrow", "visit_time": "19:00", "party_size": "2"})
+    results_path = tmp_path / "results.ndjson"
+
+    report = asyncio.run(BulkImporter(service, max_in_flight=4).run(iter(rows), str(results_path)))
+
+    assert peak == 4
+    assert (report.rows, report.booked, report.invalid, report.failed) == (51, 49, 1, 1)
+    results = {result["row"]: result for result in map(json.loads, results_path.read_text().splitlines())}
+    assert len(results) == 51
+    assert results[1]["booking_reference"] == "REF0001"
+    assert results[11]["status"] == ImportStatus.INVALID.value
+    assert results[11]["error"].startswith("visit_date")
+    assert results[14] == {"row": 14, "status": "failed", "booking_reference": None, "error": "HTTP 503"}
+
+
+def test_import_writes_csv_results(mocker, tmp_path):
+    service = mocker.Mock()
+    service.amake_booking = mocker.AsyncMock(return_value={"booking_reference": "ABC1234"})
+    results_path = tmp_path / "results.csv"
+
+    asyncio.run(BulkImporter(service).run(
+        [{"visit_date": "2025-08-06", "visit_time": "19:00", "party_size": "2"}],
+        str(results_path),
+        restaurant_name="other-restaurant",
+    ))
+
+    assert results_path.read_text().splitlines() == ["row,status,booking_reference,error", "1,booked,ABC1234,"]
+    assert service.amake_booking.call_args.kwargs["restaurant_name"] == "other-restaurant"
+
+
+def test_failed_read_waits_for_bookings_in_flight(mocker, tmp_path):
+    async def make_booking(visit_date, visit_time, party_size, *args, restaurant_name=None):
+        await asyncio.sleep(0.01)
+        return {"booking_reference": f"REF{party_size:04d}"}
+
+    def rows():
+        yield '{"visit_date": "2025-08-06", "visit_time": "19:00", "party_size": 2}'
+        raise OSError("disk went away")
+
+    service = mocker.Mock()
+    service.amake_booking = mocker.AsyncMock(side_effect=make_booking)
+    results_path = tmp_path / "results.ndjson"
+
+    with pytest.raises(OSError):
+        asyncio.run(BulkImporter(service).run(rows(), str(results_path)))
+
+    # The booking sent before the failure still has its reference on record
+    assert json.loads(results_path.read_text())["booking_reference"] == "REF0002"
@@ -0,0 +1,169 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from client.booking_client import BookingClient
+from services.booking_service import BookingService
+from services.prefetch import AvailabilityPrefetcher, EarlyReads
+
+
+AVAILABILITY = {"available_slots": [{"time": "19:00:00", "available": True}]}
+
+
+@pytest.fixture
+def slow_client(mocker):
+    client = mocker.Mock()
+    client.restaurant_name = "fake-restaurant"
+    release = asyncio.Event()
+
+    async def acheck_availability(visit_date, party_size, restaurant_name=None):
+        await release.wait()
+        return AVAILABILITY
+
+    client.acheck_availability = mocker.AsyncMock(side_effect=acheck_availability)
+    client.release = release
+    return client
+
+
+def test_prefetch_is_cached_for_the_next_turn(slow_client):
+    async def scenario():
+        prefetcher = AvailabilityPrefetcher(BookingService(slow_client))
+        task = prefetcher.prefetch("session", date(2025, 8, 6), 2)
+        assert prefetcher.prefetch("session", date(2025, 8, 6), 2) is task
+        slow_client.release.set()
+        await task
+        return prefetcher
+
+    prefetcher = asyncio.run(scenario())
+
+    assert prefetcher.cached(date(2025, 8, 6), 2) == AVAILABILITY
+    assert prefetcher.stats()["in_flight"] == 0
+    slow_client.acheck_availability.assert_awaited_once()
+
+
+def test_session_keeps_only_its_latest_prefetches(slow_client):
+    async def scenario():
+        prefetcher = AvailabilityPrefetcher(BookingService(slow_client), max_per_session=2)
+        tasks = [prefetcher.prefetch("session", date(2025, 8, day), 2) for day in (6, 7, 8)]
+        await asyncio.sleep(0)
+        return prefetcher, tasks
+
+    prefetcher, tasks = asyncio.run(scenario())
+
+    assert tasks[0].cancelled()
+    assert prefetcher.stats()["cancelled"] == 1
+
+
+def test_prefetches_are_bounded_in_total_and_cancellable(slow_client):
+    async def scenario():
+        prefetcher = AvailabilityPrefetcher(BookingService(slow_client), max_in_flight=2)
+        tasks = [prefetcher.prefetch(f"session {index}", date(2025, 8, 6), 2) for index in range(3)]
+        prefetcher.cancel("session 0")
+        await asyncio.sleep(0)
+        return prefetcher.stats(), tasks
+
+    stats, tasks = asyncio.run(scenario())
+
+    assert tasks[2] is None
+    assert tasks[0].cancelled()
+    assert stats["skipped"] == 1
+    assert stats["in_flight"] == 1
+
+
+def test_sessions_that_start_nothing_leave_nothing_behind(slow_client):
+    async def scenario():
+        service = BookingService(slow_client)
+        prefetcher = AvailabilityPrefetcher(service, max_in_flight=1)
+        slow_client.release.set()
+        await prefetcher.prefetch("first", date(2025, 8, 6), 2)
+        blocker = prefetcher.prefetch("blocker", date(2025, 8, 7), 2)
+        for index in range(1000):
+            # Already cached, or over the cap while the blocker is in flight
+            prefetcher.prefetch(f"session {index}", date(2025, 8, 6 + index % 2), 2)
+        await blocker
+        return prefetcher
+
+    prefetcher = asyncio.run(scenario())
+
+    assert prefetcher._tasks == {}
+    assert prefetcher.stats()["skipped"] == 500
+
+
+def test_slow_prefetch_is_not_waited_for_beyond_the_budget(slow_client):
+    async def scenario():
+        prefetcher = AvailabilityPrefetcher(BookingService(slow_client), wait=0.01)
+        task = prefetcher.prefetch("session", date(2025, 8, 6), 2)
+        availability = await prefetcher.availability("session", date(2025, 8, 6), 2)
+        return availability, task.done()
+
+    availability, done = asyncio.run(scenario())
+
+    assert availability is None
+    # Still running, so a later turn can use it
+    assert not done
+
+
+def test_early_read_is_taken_by_the_state_it_was_started_for(slow_client):
+    async def scenario():
+        service = BookingService(slow_client)
+        early_reads = EarlyReads()
+        started = early_reads.start("session", ("availability", 6), lambda: service.acheck_availability(date(2025, 8, 6), 2))
+        early_reads.start("other", ("availability", 7), lambda: service.acheck_availability(date(2025, 8, 7), 2))
+        slow_client.release.set()
+        taken = early_reads.take("session", ("availability", 6))
+        assert taken is started and await taken == AVAILABILITY
+        # A read for another state is dropped rather than handed over
+        assert early_reads.take("other", ("availability", 8)) is None
+        await asyncio.sleep(0)
+        return early_reads
+
+    early_reads = asyncio.run(scenario())
+
+    assert early_reads.stats() == {"in_flight": 0, "started": 2, "skipped": 0, "used": 1, "wasted": 1}
+    assert slow_client.acheck_availability.await_count == 2
+
+
+def test_untaken_early_read_expires(slow_client):
+    async def scenario():
+        early_reads = EarlyReads(keep=0.01)
+        slow_client.release.set()
+        task = early_reads.start("session", "key", lambda: slow_client.acheck_availability(date(2025, 8, 6), 2))
+        await task
+        await asyncio.sleep(0.05)
+        return early_reads
+
+    early_reads = asyncio.run(scenario())
+
+    assert early_reads.stats()["in_flight"] == 0
+    assert early_reads.stats()["wasted"] == 1
+
+
+def test_superseded_prefetch_stops_its_booking_api_search(mocker):
+    client = BookingClient("https://api.example", "token", "fake-restaurant")
+    searches = []
+
+    async def post(url, **kwargs):
+        searches.append("started")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            searches.append("stopped")
+            raise
+
+    mocker.patch.object(client.async_session, "post", side_effect=post)
+
+    async def scenario():
+        prefetcher = AvailabilityPrefetcher(BookingService(client), max_per_session=1)
+        prefetcher.prefetch("session", date(2025, 8, 6), 2)
+        await asyncio.sleep(0.01)
+        prefetcher.prefetch("session", date(2025, 8, 7), 2)
+        await asyncio.sleep(0.01)
+        in_flight = client.single_flight.in_flight()
+        prefetcher.close()
+        await asyncio.sleep(0.01)
+        return in_flight
+
+    # The superseded search is cancelled upstream, not just left running unwatched
+    assert asyncio.run(scenario()) == 1
+    assert searches == ["started", "stopped", "started", "stopped"]
@@ -0,0 +1,98 @@
+from datetime import date, time
+import time as timer
+
+from services.slot_index import SlotIndex
+
+
+def _response(*slots: tuple[str, bool]) -> dict:
+    return {
+        "available_slots": [
+            {"time": slot_time, "available": available, "max_party_size": 6} for slot_time, available in slots
+        ]
+    }
+
+
+DAY = _response(
+    ("18:00:00", True), ("18:30:00", False), ("19:00:00", True),
+    ("19:30:00", False), ("20:00:00", False), ("20:30:00", True), ("21:00:00", True),
+)
+
+
+def test_nearest_walks_outwards_from_the_target():
+    index = SlotIndex()
+    index.record("unicorn", date(2025, 8, 6), 2, DAY)
+
+    assert index.nearest("unicorn", date(2025, 8, 6), 4, time(20, 0)) == [time(20, 30)]
+    assert index.nearest("unicorn", date(2025, 8, 6), 4, time(20, 0), limit=3) == [
+        time(20, 30), time(19, 0), time(21, 0),
+    ]
+    # Equally near, so the earlier slot comes first
+    assert index.nearest("unicorn", date(2025, 8, 6), 4, time(19, 45)) == [time(19, 0)]
+
+
+def test_party_larger_than_any_slot_finds_nothing():
+    index = SlotIndex()
+    index.record("unicorn", date(2025, 8, 6), 2, DAY)
+
+    assert index.nearest("unicorn", date(2025, 8, 6), 7, time(20, 0)) == []
+    assert index.nearest("unicorn", date(2025, 8, 7), 2, time(20, 0)) is None
+
+
+def test_slot_without_a_size_only_answers_the_party_searched_for():
+    index = SlotIndex()
+    index.record("unicorn", date(2025, 8, 6), 2, {"available_slots": [{"time": "19:00:00", "available": True}]})
+
+    assert index.nearest("unicorn", date(2025, 8, 6), 2, time(19, 0)) == [time(19, 0)]
+    # The API only confirmed a table for 2, so a party of 10 is searched for rather than offered it
+    assert not index.has("unicorn", date(2025, 8, 6), 10)
+    assert index.nearest("unicorn", date(2025, 8, 6), 10, time(19, 0)) is None
+
+
+def test_earliest_skips_full_and_unknown_dates():
+    index = SlotIndex()
+    index.record("unicorn", date(2025, 8, 6), 2, _response(("18:00:00", False)))
+    index.record("unicorn", date(2025, 8, 8), 2, DAY)
+    dates = [date(2025, 8, 6), date(2025, 8, 7), date(2025, 8, 8)]
+
+    assert index.earliest("unicorn", dates, 2) == (date(2025, 8, 8), time(18, 0))
+    assert index.earliest("unicorn", dates, 2, near=time(21, 0)) == (date(2025, 8, 8), time(21, 0))
+
+
+def test_invalidation_drops_dates_and_racing_searches():
+    index = SlotIndex()
+    index.record("unicorn", date(2025, 8, 6), 2, DAY)
+    index.record("unicorn", date(2025, 8, 7), 2, DAY)
+    generation = index.generation
+
+    index.invalidate("unicorn", date(2025, 8, 6))
+    index.record("unicorn", date(2025, 8, 6), 2, DAY, generation)
+
+    assert not index.has("unicorn", date(2025, 8, 6))
+    assert index.has("unicorn", date(2025, 8, 7))
+    index.invalidate("unicorn")
+    assert not index.has("unicorn", date(2025, 8, 7))
+
+
+def test_entries_expire(mocker):
+    index = SlotIndex(ttl=30.0)
+    index.record("unicorn", date(2025, 8, 6), 2, DAY)
+
+    mocker.patch("services.slot_index.timer.monotonic", return_value=timer.monotonic() + 31)
+
+    assert not index.has("unicorn", date(2025, 8, 6))
+
+
+def test_queries_are_fast():
+    index = SlotIndex()
+    slots = [(f"{minute // 60:02d}:{minute % 60:02d}:00", minute % 45 == 0) for minute in range(0, 24 * 60, 15)]
+    dates = [date(2025, 8, day) for day in range(1, 32)]
+    for visit_date in dates:
+        index.record("unicorn", visit_date, 2, _response(*slots))
+
+    start = timer.perf_counter()
+    for _ in range(1000):
+        index.nearest("unicorn", date(2025, 8, 20), 4, time(20, 10), limit=3)
+        index.earliest("unicorn", dates, 4, near=time(13, 0))
+    seconds = (timer.perf_counter() - start) / 2000
+
+    assert seconds < 0.001
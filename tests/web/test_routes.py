@@ -0,0 +1,134 @@
+import json
+import threading
+
+from fastapi.testclient import TestClient
+import pytest
+
+from agents.booking_agent import BookingAgent
+from ai.gated_llm import LLMBusyError
+from ai.langauge_model import LanguageModel
+from client.resilience import CircuitOpenError
+from observability import tracing
+from web.main import create_app
+from web.session_store import InMemorySessionStore
+
+
+class FakeLanguageModel(LanguageModel):
+    def __init__(self, response: str):
+        self.response = response
+
+    def chat(self, prompt: str) -> str:
+        return self.response
+
+
+@pytest.fixture
+def agent(mocker):
+    service = mocker.Mock()
+    service.acheck_availability = mocker.AsyncMock(return_value={
+        "available_slots": [{"time": "12:00:00", "available": True}]
+    })
+    llm = FakeLanguageModel('{"intent": "CHECK_AVAILABILITY", "visit_date": "2025-08-06", "party_size": 2}')
+    return BookingAgent(service, llm)
+
+
+def test_chat_turn_uses_injected_agent_and_sessions(agent):
+    sessions = InMemorySessionStore()
+    with TestClient(create_app(agent=agent, sessions=sessions, prewarm=False)) as client:
+        response = client.post("/chat/turn", data={"message": "Any tables on 6 August for 2?"})
+
+        assert response.status_code == 200
+        assert "12:00:00" in response.json()["agent"]
+        session_id = response.cookies["session_id"]
+        _, chat_log = sessions.load(session_id)
+        assert [speaker for speaker, _ in chat_log] == ["User", "Agent"]
+        assert client.get("/sessions/stats").json()["sessions"] == 1
+        assert "Any tables on 6 August for 2?" in client.get("/").text
+
+
+def test_healthz_reports_ready_once_agent_is_built(agent, mocker):
+    built = threading.Event()
+
+    def create_agent():
+        built.wait(5)
+        return agent
+
+    agent.booking_service.client.aclose = mocker.AsyncMock()
+    mocker.patch("web.main.create_agent", side_effect=create_agent)
+    with TestClient(create_app(sessions=InMemorySessionStore(), prewarm=False)) as client:
+        assert client.get("/healthz").status_code == 503
+
+        built.set()
+        # Requests arriving during the build wait for it instead of failing
+        response = client.post("/chat/turn", data={"message": "Any tables on 6 August for 2?"})
+
+        assert "12:00:00" in response.json()["agent"]
+        assert client.get("/healthz").json() == {"ready": True}
+
+    # The app built this agent, so it also closes its connections
+    agent.booking_service.client.aclose.assert_awaited_once()
+
+
+def test_prewarm_opens_client_and_llm_connections(agent, mocker):
+    agent.booking_service.client.awarm = mocker.AsyncMock()
+    agent.llm.awarm = mocker.AsyncMock(side_effect=RuntimeError("offline"))
+
+    with TestClient(create_app(agent=agent, sessions=InMemorySessionStore(), prewarm=True)) as client:
+        assert client.get("/healthz").status_code == 200
+
+    agent.booking_service.client.awarm.assert_awaited_once()
+    agent.llm.awarm.assert_awaited_once()
+
+
+def test_busy_llm_sheds_the_turn_without_saving_it(mocker):
+    service = mocker.Mock()
+    llm = FakeLanguageModel("{}")
+    llm.achat = mocker.AsyncMock(side_effect=LLMBusyError("The language model queue is full"))
+    sessions = InMemorySessionStore()
+
+    with TestClient(create_app(agent=BookingAgent(service, llm), sessions=sessions, prewarm=False)) as client:
+        response = client.post("/chat/turn", data={"message": "What do you recommend?"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["busy"] is True
+    assert sessions.stats()["sessions"] == 0
+
+
+def test_busy_llm_answers_the_form_post_with_the_page(mocker):
+    service = mocker.Mock()
+    llm = FakeLanguageModel("{}")
+    llm.achat = mocker.AsyncMock(side_effect=LLMBusyError("The language model queue is full"))
+    sessions = InMemorySessionStore()
+
+    with TestClient(create_app(agent=BookingAgent(service, llm), sessions=sessions, prewarm=False)) as client:
+        response = client.post("/chat", data={"message": "What do you recommend?"}, follow_redirects=False)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.headers["content-type"].startswith("text/html")
+    assert "very busy right now" in response.text
+    assert sessions.stats()["sessions"] == 0
+
+
+def test_open_circuit_asks_the_customer_to_try_again(agent):
+    agent.booking_service.acheck_availability.side_effect = CircuitOpenError()
+    with TestClient(create_app(agent=agent, sessions=InMemorySessionStore(), prewarm=False)) as client:
+        response = client.post("/chat/turn", data={"message": "Any tables on 6 August for 2?"})
+
+        assert response.status_code == 200
+        assert "try again shortly" in response.json()["agent"]
+
+
+def test_sampled_chat_turn_is_traced_from_route_to_nodes(agent, mocker, tmp_path):
+    path = tmp_path / "trace.jsonl"
+    mocker.patch.dict("os.environ", {"TRACE_PATH": str(path), "TRACE_SAMPLE_RATE": "1"})
+    mocker.patch.object(tracing, "TRACER", tracing.Tracer())
+
+    with TestClient(create_app(agent=agent, sessions=InMemorySessionStore(), prewarm=False)) as client:
+        client.post("/chat/turn", data={"message": "Any tables on 6 August for 2?"})
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    names = {span["name"] for span in spans}
+    assert {"web/routes.chat_turn", "session.load", "graph", "node.parse_intent", "session.save"} <= names
+    assert len({span["trace_id"] for span in spans}) == 1
+    assert len({span["session_id"] for span in spans}) == 1
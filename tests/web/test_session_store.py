@@ -0,0 +1,154 @@
+import asyncio
+from datetime import date
+import threading
+
+from agents.utils.state import BookingState, Intent
+from client.model.customer import Customer
+from web.session_store import InMemorySessionStore, SqliteSessionStore
+
+
+def test_state_round_trips_through_serialized_form():
+    store = InMemorySessionStore()
+    state = BookingState(
+        intent=Intent.MAKE_BOOKING,
+        visit_date=date(2025, 8, 6),
+        customer=Customer(first_name="John", email="john@example.com"),
+    )
+
+    store.save("session", state, [("User", "hi"), ("Agent", "How can I help?")])
+    loaded_state, chat_log = store.load("session")
+
+    assert loaded_state == state
+    assert chat_log == [("User", "hi"), ("Agent", "How can I help?")]
+
+
+def test_unknown_session_starts_empty():
+    state, chat_log = InMemorySessionStore().load("missing")
+
+    assert state == BookingState()
+    assert chat_log == []
+
+
+def test_chat_log_is_capped():
+    store = InMemorySessionStore(max_chat_log=2)
+
+    store.save("session", BookingState(), [("User", str(i)) for i in range(5)])
+
+    assert store.load("session")[1] == [("User", "3"), ("User", "4")]
+
+
+def test_least_recently_saved_session_is_evicted():
+    store = InMemorySessionStore(max_sessions=2)
+
+    store.save("a", BookingState(), [])
+    store.save("b", BookingState(), [])
+    store.save("a", BookingState(party_size=2), [])
+    store.save("c", BookingState(), [])
+
+    assert store.load("a")[0].party_size == 2
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire(mocker):
+    monotonic = mocker.patch("web.session_store.time.monotonic", return_value=0.0)
+    store = InMemorySessionStore(idle_ttl=60)
+    store.save("session", BookingState(party_size=2), [("User", "hi")])
+
+    monotonic.return_value = 61.0
+
+    assert store.load("session")[0] == BookingState()
+    assert store.stats() == {
+        "sessions": 0, "max_sessions": 10_000, "bytes": 0, "evictions": 0, "expirations": 1,
+    }
+
+
+def test_loading_a_session_keeps_it_alive(mocker):
+    monotonic = mocker.patch("web.session_store.time.monotonic", return_value=0.0)
+    store = InMemorySessionStore(max_sessions=2, idle_ttl=60)
+    store.save("a", BookingState(party_size=2), [])
+    store.save("b", BookingState(), [])
+
+    monotonic.return_value = 50.0
+    store.load("a")
+    monotonic.return_value = 100.0
+    store.save("c", BookingState(), [])
+
+    assert store.load("a")[0].party_size == 2
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evictions"] == 0
+    assert store.stats()["expirations"] == 1
+
+
+def test_sqlite_sessions_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    worker_a = SqliteSessionStore(path)
+    worker_b = SqliteSessionStore(path)
+    state = BookingState(intent=Intent.CHECK_AVAILABILITY, party_size=4)
+
+    worker_a.save("session", state, [("User", "table for 4")])
+
+    assert worker_b.load("session") == (state, [("User", "table for 4")])
+    assert worker_b.stats()["sessions"] == 1
+
+
+def test_sqlite_idle_sessions_expire(mocker, tmp_path):
+    clock = mocker.patch("web.session_store.time.time", return_value=1000.0)
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite"), idle_ttl=60, prune_interval=1)
+    store.save("old", BookingState(party_size=2), [])
+
+    clock.return_value = 1061.0
+
+    assert store.load("old")[0] == BookingState()
+    store.save("new", BookingState(), [])
+    assert store.stats()["sessions"] == 1
+    assert store.stats()["expirations"] == 1
+
+
+def test_sqlite_prunes_least_recently_used_sessions(mocker, tmp_path):
+    clock = mocker.patch("web.session_store.time.time", return_value=1000.0)
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite"), max_sessions=2, prune_interval=3)
+
+    for session_id in ["a", "b", "c"]:
+        clock.return_value += 1
+        store.save(session_id, BookingState(), [])
+
+    assert store.load("a")[0] == BookingState()
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evictions"] == 1
+
+
+def test_sqlite_store_runs_off_the_event_loop(mocker, tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite"))
+    state = BookingState(party_size=2)
+    threads = []
+    load = store.load
+
+    def recording_load(session_id):
+        threads.append(threading.get_ident())
+        return load(session_id)
+
+    mocker.patch.object(store, "load", side_effect=recording_load)
+
+    async def turn():
+        await store.asave("session", state, [("User", "hi")])
+        return threading.get_ident(), await store.aload("session")
+
+    loop_thread, loaded = asyncio.run(turn())
+
+    assert loaded == (state, [("User", "hi")])
+    assert threads and threads[0] != loop_thread
+
+
+def test_sqlite_stats_count_once_per_interval(mocker, tmp_path):
+    clock = mocker.patch("web.session_store.time.monotonic", return_value=1000.0)
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite"), stats_ttl=5)
+    store.save("a", BookingState(), [])
+
+    # Both session gauges in one scrape share a count
+    assert store.stats()["sessions"] == 1
+    store.save("b", BookingState(), [])
+    assert store.stats()["sessions"] == 1
+
+    clock.return_value += 5
+    assert store.stats()["sessions"] == 2
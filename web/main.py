@@ -1,9 +1,220 @@
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+import os
+
+from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from web.routes import router
 
+from ai.gated_llm import LLMBusyError
+from observability import metrics, tracing
+from web.routes import DEFAULT_RESTAURANT_NAME, llm_busy, router
+from web.session_store import SessionStore, create_session_store
+
+
+logger = logging.getLogger(__name__)
+
+# DEBUG logs full states and booking API payloads; keep it off the hot path in production
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper())
+
+
+def create_agent():
+    # langgraph, langchain and the OpenAI SDK are imported here, after uvicorn has bound its socket
+    from agents.booking_agent import BookingAgent
+    from agents.utils.nodes import extraction_problem
+    from ai.cached_llm import CachedLanguageModel
+    from ai.cascade_llm import CascadingLanguageModel
+    from ai.gated_llm import GatedLanguageModel
+    from ai.openai_llm import OpenAILanguageModel
+    from client.booking_client import BookingClient
+    from services.booking_service import BookingService
+
+    # One client, and so one connection pool, serves every microsite
+    client = BookingClient(
+        os.environ.get("BOOKING_API_BASE_URL"),
+        os.environ.get("BEARER_TOKEN"),
+        os.environ.get("DEFAULT_RESTAURANT_NAME", DEFAULT_RESTAURANT_NAME),
+    )
+    service = BookingService(client)
+    model = OpenAILanguageModel(os.environ.get("LLM_MODEL", "gpt-4o"))
+    small_model = os.environ.get("LLM_SMALL_MODEL", "gpt-4o-mini")
+    if small_model:
+        # Extraction is short and formulaic, so the large model only sees what the small one gets wrong
+        model = CascadingLanguageModel(OpenAILanguageModel(small_model), model, extraction_problem)
+    # Cache hits return without queueing; only calls that reach OpenAI take a slot
+    gate = GatedLanguageModel(
+        model,
+        max_in_flight=int(os.environ.get("LLM_MAX_IN_FLIGHT", 16)),
+        max_queue=int(os.environ.get("LLM_MAX_QUEUE", 64)),
+    )
+    llm = CachedLanguageModel(gate, db_path=os.environ.get("LLM_CACHE_PATH"))
+    agent = BookingAgent(service, llm)
+
+    metrics.REGISTRY.callback(
+        "availability_cache_events_total", "Availability cache lookups and removals.", "counter",
+        lambda: {
+            (event,): service.availability_cache.stats()[event]
+            for event in ("hits", "misses", "evictions", "expirations")
+        },
+        ("event",),
+    )
+    metrics.REGISTRY.callback(
+        "booking_details_cache_events_total", "Booking details cache lookups and removals.", "counter",
+        lambda: {
+            (event,): service.booking_cache.stats()[event]
+            for event in ("hits", "misses", "evictions", "expirations")
+        },
+        ("event",),
+    )
+    metrics.REGISTRY.callback(
+        "booking_api_not_modified_total", "Booking lookups revalidated with a 304 Not Modified.", "counter",
+        lambda: {(): client.not_modified},
+    )
+    metrics.REGISTRY.callback(
+        "booking_api_coalesced_total", "Reads that joined an identical in-flight request.", "counter",
+        lambda: {(): client.single_flight.followers},
+    )
+    metrics.REGISTRY.callback(
+        "booking_api_circuit_open", "Whether a restaurant's booking API calls are failing fast (1) or not (0).", "gauge",
+        lambda: {(name,): int(breaker.state == "open") for name, breaker in list(client.circuit_breakers.items())},
+        ("restaurant",),
+    )
+    metrics.REGISTRY.callback(
+        "booking_api_circuit_rejections_total", "Booking API calls rejected by a restaurant's open circuit.", "counter",
+        lambda: {(name,): breaker.rejections for name, breaker in list(client.circuit_breakers.items())},
+        ("restaurant",),
+    )
+    metrics.REGISTRY.callback(
+        "availability_prefetch_total", "Speculative availability searches started, reused, skipped, cancelled and used.", "counter",
+        lambda: {
+            (event,): agent.prefetcher.stats()[event]
+            for event in ("started", "joined", "skipped", "cancelled", "used")
+        },
+        ("event",),
+    )
+    metrics.REGISTRY.callback(
+        "early_reads_total", "Booking API reads started while the message was still being parsed, and their fate.", "counter",
+        lambda: {(event,): agent.early_reads.stats()[event] for event in ("started", "skipped", "used", "wasted")},
+        ("event",),
+    )
+    metrics.REGISTRY.callback(
+        "preparser_rule_hit_rate", "Share of messages each pre-parser rule matched.", "gauge",
+        lambda: {(rule,): rate for rule, rate in agent.preparser.stats()["rule_hit_rates"].items()},
+        ("rule",),
+    )
+    metrics.REGISTRY.callback(
+        "preparser_estimated_seconds_saved", "LLM time saved by messages each pre-parser rule helped answer.", "gauge",
+        lambda: {(rule,): seconds for rule, seconds in agent.preparser.stats()["rule_seconds_saved"].items()},
+        ("rule",),
+    )
+    metrics.REGISTRY.callback(
+        "slot_index_lookups_total", "Nearest-slot lookups answered from, or missing in, the slot index.", "counter",
+        lambda: {(event,): agent.booking_service.slot_index.stats()[event] for event in ("hits", "misses")},
+        ("event",),
+    )
+    metrics.REGISTRY.callback(
+        "llm_cache_events_total", "Language model cache lookups.", "counter",
+        lambda: {(event,): llm.stats()[event] for event in ("hits", "disk_hits", "disk_errors", "misses")},
+        ("event",),
+    )
+    metrics.REGISTRY.callback(
+        "llm_gateway_in_flight", "Language model calls in progress.", "gauge",
+        lambda: {(): gate.stats()["in_flight"]},
+    )
+    metrics.REGISTRY.callback(
+        "llm_gateway_waiting", "Language model calls queued for a free slot.", "gauge",
+        lambda: {(): gate.stats()["waiting"]},
+    )
+    metrics.REGISTRY.callback(
+        "llm_gateway_rejections_total", "Language model calls shed because the queue was full or slow.", "counter",
+        lambda: {(reason,): count for reason, count in gate.stats()["rejections"].items()},
+        ("reason",),
+    )
+    metrics.REGISTRY.callback(
+        "llm_gateway_wait_seconds_total", "Time queued language model calls spent waiting.", "counter",
+        lambda: {(): gate.stats()["wait_seconds"]},
+    )
+    return agent
+
+
+async def _prewarm(agent_task: asyncio.Future):
+    # Opens the booking API and LLM connection pools so the first user does not pay for the handshakes
+    try:
+        agent = await asyncio.shield(agent_task)
+    except Exception:
+        # A failed build already surfaces on every request and on /healthz
+        return
+    results = await asyncio.gather(
+        agent.booking_service.client.awarm(), agent.llm.awarm(), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Pre-warming failed: %r", result)
+
+
+def create_app(
+        agent=None,
+        sessions: SessionStore | None = None,
+        prewarm: bool | None = None,
+    ) -> FastAPI:
+    load_dotenv()
+    if prewarm is None:
+        prewarm = os.environ.get("PREWARM", "1") != "0"
+    if os.environ.get("TRACE_PATH"):
+        # Sampled so that tracing stays cheap under load; slow turns can be kept regardless
+        slow_seconds = os.environ.get("TRACE_SLOW_SECONDS")
+        tracing.TRACER.configure(
+            tracing.create_exporter(os.environ["TRACE_PATH"]),
+            sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", 0.01)),
+            slow_seconds=float(slow_seconds) if slow_seconds else None,
+        )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if agent is None:
+            # uvicorn only binds once startup returns, so the agent is built off the event loop meanwhile
+            app.state.agent_task = asyncio.ensure_future(asyncio.to_thread(create_agent))
+        else:
+            app.state.agent_task = asyncio.get_running_loop().create_future()
+            app.state.agent_task.set_result(agent)
+        prewarm_task = asyncio.ensure_future(_prewarm(app.state.agent_task)) if prewarm else None
+        try:
+            yield
+        finally:
+            if prewarm_task is not None:
+                prewarm_task.cancel()
+            # An injected agent belongs to the caller, who closes it
+            task = app.state.agent_task
+            if agent is None and task.done() and not task.cancelled() and task.exception() is None:
+                task.result().prefetcher.close()
+                task.result().early_reads.close()
+                await task.result().booking_service.client.aclose()
+                task.result().llm.close()
+            tracing.TRACER.close()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.sessions = sessions if sessions is not None else create_session_store()
+    app.state.default_restaurant_name = os.environ.get("DEFAULT_RESTAURANT_NAME", DEFAULT_RESTAURANT_NAME)
+
+    metrics.REGISTRY.callback(
+        "sessions", "Stored conversation sessions.", "gauge",
+        lambda: {(): app.state.sessions.stats()["sessions"]},
+    )
+    metrics.REGISTRY.callback(
+        "traces_exported_total", "Request traces written to TRACE_PATH.", "counter",
+        lambda: {(): tracing.TRACER.exported},
+    )
+    metrics.REGISTRY.callback(
+        "sessions_bytes", "Encoded size of stored conversation sessions.", "gauge",
+        lambda: {(): app.state.sessions.stats()["bytes"]},
+    )
+
+    app.add_exception_handler(LLMBusyError, llm_busy)
+    if os.path.isdir("web/static"):
+        app.mount("/static", StaticFiles(directory="web/static"), name="static")
+    app.include_router(router)
+    return app
 
-app = FastAPI()
 
-app.mount("/static", StaticFiles(directory="web/static"), name="static")
-app.include_router(router)
+app = create_app()
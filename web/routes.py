@@ -1,78 +1,242 @@
-from collections import defaultdict
+import asyncio
+import json
+import logging
 
-from fastapi import APIRouter, Request, Form, Response
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Depends, Request, Form
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from uuid import uuid4
 
-from client.booking_client import BookingClient
-from services.booking_service import BookingService
-from agents.booking_agent import BookingAgent
+# Only light modules at import time: the agent, and langgraph/langchain with it, is injected per request
 from agents.utils.state import BookingState
-from ai.openai_llm import OpenAILanguageModel
-from dotenv import load_dotenv
-import os
+from ai.gated_llm import LLMBusyError, Priority, llm_priority
+from client.booking_client import RESTAURANT_NAME_PATTERN
+from observability import metrics, tracing
+from web.session_store import ChatLog, SessionStore
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 templates = Jinja2Templates(directory="web/templates")
 
+DEFAULT_RESTAURANT_NAME = "TheHungryUnicorn"
 
-@router.get("/", response_class=HTMLResponse)
-async def index(request: Request):
-    session_id = request.cookies.get("session_id")
-    if not session_id:
-        session_id = str(uuid4())
-        response = RedirectResponse(url="/chat")
-        response.set_cookie("session_id", session_id)
-        return response
-    return templates.TemplateResponse("index.html", {"request": request})
+BUSY_MESSAGE = "Sorry, we are very busy right now. Please send your message again in a moment."
+BUSY_RETRY_AFTER_SECONDS = 2
 
 
-def create_agent():
-    load_dotenv()
-    client = BookingClient(
-        os.environ.get("BOOKING_API_BASE_URL"),
-        os.environ.get("BEARER_TOKEN"),
-        "TheHungryUnicorn"
-    )
-    service = BookingService(client)
-    llm = OpenAILanguageModel()
-    agent = BookingAgent(service, llm)
-    return agent
+def _restaurant_name(restaurant_name: str | None) -> str | None:
+    if restaurant_name and RESTAURANT_NAME_PATTERN.fullmatch(restaurant_name):
+        return restaurant_name
+    return None
 
-agent = create_agent()
-chat_logs = defaultdict(list)
-booking_states = defaultdict(BookingState)
 
-@router.post("/chat", response_class=HTMLResponse)
-async def chat(request: Request, message: str = Form(...)):
-    session_id = request.cookies.get("session_id")
-    response = Response()
+async def get_agent(request: Request):
+    # Built in the background at startup; early requests wait here rather than the whole app
+    return await asyncio.shield(request.app.state.agent_task)
+
+
+def get_sessions(request: Request) -> SessionStore:
+    return request.app.state.sessions
+
+
+def _default_restaurant_name(request: Request) -> str:
+    return request.app.state.default_restaurant_name
+
+
+def _priority(state: BookingState) -> Priority:
+    # A customer answering a follow-up question is mid-booking, and is served before new conversations
+    return Priority.HIGH if state.pending_field is not None else Priority.NORMAL
 
-    if not session_id:
-        session_id = str(uuid4())
-        response.set_cookie("session_id", session_id)
 
-    chat_log = chat_logs[session_id]
-    state = booking_states[session_id]
+async def llm_busy(request: Request, exc: LLMBusyError) -> Response:
+    # Shed load fast rather than queue without bound; the turn is not saved, so resending is safe
+    logger.info("Shedding chat turn: %s", exc)
+    headers = {"Retry-After": str(BUSY_RETRY_AFTER_SECONDS)}
+    if request.url.path == "/chat":
+        # The form post expects a page, so show the conversation so far with the busy reply after it
+        state, chat_log = await get_sessions(request).aload(_session_id(request)[0])
+        return templates.TemplateResponse(request, "index.html", {
+            "chat_log": [*chat_log, ("Agent", BUSY_MESSAGE)],
+            "restaurant_name": state.restaurant_name or _default_restaurant_name(request),
+        }, status_code=503, headers=headers)
+    return JSONResponse({"agent": BUSY_MESSAGE, "busy": True}, status_code=503, headers=headers)
+
+
+async def _start_turn(
+        request: Request,
+        sessions: SessionStore,
+        session_id: str,
+        message: str,
+        restaurant_name: str | None,
+    ) -> tuple[BookingState, ChatLog]:
+    with tracing.span("session.load"):
+        state, chat_log = await sessions.aload(session_id)
+
+    restaurant_name = _restaurant_name(restaurant_name) or state.restaurant_name or _default_restaurant_name(request)
+    if state.restaurant_name != restaurant_name:
+        # A booking in progress belongs to one venue, so switching starts afresh
+        state = BookingState(restaurant_name=restaurant_name)
 
     chat_log.append(("User", message))
     state.message = message
-    state = BookingState(**agent.graph.invoke(state))
-    print(f"State: {state}")
-    print(f"Agent: {state.response}")
+    return state, chat_log
+
+
+async def _finish_turn(sessions: SessionStore, session_id: str, state: BookingState, chat_log: ChatLog) -> BookingState:
+    logger.debug("Session %s state: %s", session_id, state)
     chat_log.append(("Agent", state.response))
     state.message = None
-    booking_states[session_id] = state
+    with tracing.span("session.save"):
+        await sessions.asave(session_id, state, chat_log)
+    return state
+
+
+def _graph_config(session_id: str) -> dict:
+    # Lets nodes keep per-session work, such as availability prefetches, apart
+    return {"configurable": {"session_id": session_id}}
+
+
+def _session_id(request: Request) -> tuple[str, bool]:
+    session_id = request.cookies.get("session_id")
+    if session_id:
+        return session_id, False
+    return str(uuid4()), True
+
+
+async def _run_turn(
+        request: Request,
+        agent,
+        sessions: SessionStore,
+        session_id: str,
+        message: str,
+        restaurant_name: str | None,
+    ) -> BookingState:
+    state, chat_log = await _start_turn(request, sessions, session_id, message, restaurant_name)
+    with llm_priority(_priority(state)), tracing.span("graph"):
+        state = BookingState(**await agent.graph.ainvoke(state, config=_graph_config(session_id)))
+    return await _finish_turn(sessions, session_id, state, chat_log)
 
-    template_response = templates.TemplateResponse("index.html", {
-        "request": request, 
-        "chat_log": chat_log,
-    })
 
-    response.body = template_response.body
-    response.status_code = template_response.status_code
-    response.headers.update(template_response.headers)
-    
+@router.get("/", response_class=HTMLResponse)
+async def index(
+        request: Request,
+        restaurant: str | None = None,
+        sessions: SessionStore = Depends(get_sessions),
+    ):
+    # The only full render: the conversation so far, after which turns are appended client side
+    session_id, is_new = _session_id(request)
+    with tracing.TRACER.trace("web/routes.index", session_id=session_id):
+        with tracing.span("session.load"):
+            state, chat_log = await sessions.aload(session_id)
+        # TemplateResponse renders as it is built
+        with tracing.span("template.render"):
+            response = templates.TemplateResponse(request, "index.html", {
+                "chat_log": chat_log,
+                "restaurant_name": _restaurant_name(restaurant) or state.restaurant_name or _default_restaurant_name(request),
+            })
+    if is_new:
+        response.set_cookie("session_id", session_id)
     return response
+
+
+@router.post("/chat")
+async def chat(
+        request: Request,
+        message: str = Form(...),
+        restaurant_name: str | None = Form(None),
+        agent=Depends(get_agent),
+        sessions: SessionStore = Depends(get_sessions),
+    ):
+    # Form posts without scripts; redirecting keeps refreshes from resubmitting the message
+    session_id, is_new = _session_id(request)
+    with tracing.TRACER.trace("web/routes.chat", session_id=session_id):
+        await _run_turn(request, agent, sessions, session_id, message, restaurant_name)
+    response = RedirectResponse(url="/", status_code=303)
+    if is_new:
+        response.set_cookie("session_id", session_id)
+    return response
+
+
+@router.post("/chat/turn")
+async def chat_turn(
+        request: Request,
+        message: str = Form(...),
+        restaurant_name: str | None = Form(None),
+        agent=Depends(get_agent),
+        sessions: SessionStore = Depends(get_sessions),
+    ):
+    session_id, is_new = _session_id(request)
+    with tracing.TRACER.trace("web/routes.chat_turn", session_id=session_id):
+        state = await _run_turn(request, agent, sessions, session_id, message, restaurant_name)
+    response = JSONResponse({"user": message, "agent": state.response})
+    if is_new:
+        response.set_cookie("session_id", session_id)
+    return response
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+        request: Request,
+        message: str = Form(...),
+        restaurant_name: str | None = Form(None),
+        agent=Depends(get_agent),
+        sessions: SessionStore = Depends(get_sessions),
+    ):
+    session_id, is_new = _session_id(request)
+    state, chat_log = await _start_turn(request, sessions, session_id, message, restaurant_name)
+
+    async def events():
+        # Traced from the first chunk to the last, which is what the customer waits for
+        with tracing.TRACER.trace("web/routes.chat_stream", session_id=session_id):
+            final_state = state
+            try:
+                with llm_priority(_priority(state)), tracing.span("graph"):
+                    async for mode, chunk in agent.graph.astream(
+                        state, config=_graph_config(session_id), stream_mode=["custom", "values"]
+                    ):
+                        if mode == "custom" and "progress" in chunk:
+                            yield _sse("progress", {"message": chunk["progress"]})
+                        elif mode == "values":
+                            final_state = BookingState(**chunk)
+            except LLMBusyError as e:
+                # Headers are already sent, so the busy reply arrives as the turn's response
+                logger.info("Shedding chat turn: %s", e)
+                yield _sse("response", {"message": BUSY_MESSAGE, "busy": True})
+                return
+            final_state = await _finish_turn(sessions, session_id, final_state, chat_log)
+            yield _sse("response", {"message": final_state.response})
+
+    response = StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    if is_new:
+        response.set_cookie("session_id", session_id)
+    return response
+
+
+@router.get("/sessions/stats")
+async def session_stats(sessions: SessionStore = Depends(get_sessions)):
+    return await sessions.astats()
+
+
+@router.get("/healthz")
+async def healthz(request: Request):
+    # Readiness for load balancers and autoscalers: 503 until the agent is built
+    task = request.app.state.agent_task
+    ready = task.done() and not task.cancelled() and task.exception() is None
+    return JSONResponse({"ready": ready}, status_code=200 if ready else 503)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(sessions: SessionStore = Depends(get_sessions)):
+    # Counts the sessions off the event loop; the session gauges then read that count while rendering
+    await sessions.astats()
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,254 @@
+from abc import ABC, abstractmethod
+import asyncio
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from agents.utils.state import BookingState
+
+
+ChatLog = list[tuple[str, str]]
+
+
+class SessionStore(ABC):
+    @abstractmethod
+    def load(self, session_id: str) -> tuple[BookingState, ChatLog]:
+        pass
+
+    @abstractmethod
+    def save(self, session_id: str, state: BookingState, chat_log: ChatLog):
+        pass
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        pass
+
+    @abstractmethod
+    def stats(self) -> dict:
+        pass
+
+    # Stores backed by a file or a server block, so the web routes call them off the event loop
+    async def aload(self, session_id: str) -> tuple[BookingState, ChatLog]:
+        return await asyncio.to_thread(self.load, session_id)
+
+    async def asave(self, session_id: str, state: BookingState, chat_log: ChatLog):
+        await asyncio.to_thread(self.save, session_id, state, chat_log)
+
+    async def astats(self) -> dict:
+        return await asyncio.to_thread(self.stats)
+
+
+def encode_state(state: BookingState) -> bytes:
+    return state.model_dump_json(exclude_defaults=True).encode()
+
+
+def decode_state(data: bytes) -> BookingState:
+    return BookingState.model_validate_json(data)
+
+
+def encode_chat_log(chat_log: ChatLog) -> bytes:
+    return zlib.compress(json.dumps(chat_log, separators=(",", ":")).encode(), 1)
+
+
+def decode_chat_log(data: bytes) -> ChatLog:
+    return [tuple(line) for line in json.loads(zlib.decompress(data))]
+
+
+class InMemorySessionStore(SessionStore):
+    def __init__(self, max_sessions: int = 10_000, idle_ttl: float = 30 * 60, max_chat_log: int = 50):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_chat_log = max_chat_log
+        # Session id -> (last access, encoded state, encoded chat log), least recently used first
+        self._sessions: OrderedDict[str, tuple[float, bytes, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+
+
+    def load(self, session_id: str) -> tuple[BookingState, ChatLog]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                # Reading a session counts as access, so a customer who only reloads the page keeps it
+                entry = self._sessions[session_id] = (now, *entry[1:])
+                self._sessions.move_to_end(session_id)
+        if entry is None:
+            return BookingState(), []
+        _, state, chat_log = entry
+        return decode_state(state), decode_chat_log(chat_log)
+
+
+    def save(self, session_id: str, state: BookingState, chat_log: ChatLog):
+        entry = (time.monotonic(), encode_state(state), encode_chat_log(chat_log[-self.max_chat_log:]))
+        with self._lock:
+            self._discard(session_id)
+            self._sessions[session_id] = entry
+            self._bytes += len(entry[1]) + len(entry[2])
+            self._expire(entry[0])
+            while len(self._sessions) > self.max_sessions:
+                self._discard(next(iter(self._sessions)))
+                self.evictions += 1
+
+
+    async def aload(self, session_id: str) -> tuple[BookingState, ChatLog]:
+        # Memory only, so cheaper than the hop to a worker thread
+        return self.load(session_id)
+
+
+    async def asave(self, session_id: str, state: BookingState, chat_log: ChatLog):
+        self.save(session_id, state, chat_log)
+
+
+    async def astats(self) -> dict:
+        return self.stats()
+
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._discard(session_id)
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+    def _expire(self, now: float):
+        # Entries are ordered by last access, so expired sessions are always at the front
+        while self._sessions:
+            session_id, (touched, _, _) = next(iter(self._sessions.items()))
+            if now - touched < self.idle_ttl:
+                break
+            self._discard(session_id)
+            self.expirations += 1
+
+
+    def _discard(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= len(entry[1]) + len(entry[2])
+
+
+class SqliteSessionStore(SessionStore):
+    # WAL mode lets every uvicorn worker and replica on the host share one database file
+    def __init__(
+            self,
+            path: str,
+            max_sessions: int = 100_000,
+            idle_ttl: float = 30 * 60,
+            max_chat_log: int = 50,
+            prune_interval: int = 100,
+            stats_ttl: float = 5.0,
+        ):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_chat_log = max_chat_log
+        self.prune_interval = prune_interval
+        # Counting sessions scans the table, so one count serves every gauge read within this long
+        self.stats_ttl = stats_ttl
+        self._counted = (float("-inf"), 0, 0)
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                touched REAL NOT NULL,
+                state BLOB NOT NULL,
+                chat_log BLOB NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched)")
+
+        self.evictions = 0
+        self.expirations = 0
+
+
+    def load(self, session_id: str) -> tuple[BookingState, ChatLog]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state, chat_log FROM sessions WHERE session_id = ? AND touched > ?",
+                (session_id, time.time() - self.idle_ttl),
+            ).fetchone()
+        if row is None:
+            return BookingState(), []
+        return decode_state(row[0]), decode_chat_log(row[1])
+
+
+    def save(self, session_id: str, state: BookingState, chat_log: ChatLog):
+        state_data = encode_state(state)
+        chat_log_data = encode_chat_log(chat_log[-self.max_chat_log:])
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, touched, state, chat_log) VALUES (?, ?, ?, ?)",
+                (session_id, time.time(), state_data, chat_log_data),
+            )
+            self._saves += 1
+            if self._saves % self.prune_interval == 0:
+                self._prune()
+
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            counted_at, sessions, size = self._counted
+            if time.monotonic() - counted_at >= self.stats_ttl:
+                sessions, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(state) + LENGTH(chat_log)), 0) FROM sessions"
+                ).fetchone()
+                self._counted = (time.monotonic(), sessions, size)
+        return {
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "bytes": size,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+    def _prune(self):
+        expired = self._db.execute(
+            "DELETE FROM sessions WHERE touched <= ?", (time.time() - self.idle_ttl,)
+        ).rowcount
+        self.expirations += expired
+        evicted = self._db.execute(
+            """DELETE FROM sessions WHERE session_id IN (
+                SELECT session_id FROM sessions ORDER BY touched DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_sessions,),
+        ).rowcount
+        self.evictions += evicted
+
+
+def create_session_store() -> SessionStore:
+    path = os.environ.get("SESSION_DB_PATH")
+    if path:
+        return SqliteSessionStore(path)
+    return InMemorySessionStore()